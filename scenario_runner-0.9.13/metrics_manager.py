@@ -16,6 +16,7 @@ It is responsible of parsing all the information and executing
 the metric specified by the user.
 """
 
+import glob
 import os
 import sys
 import importlib
@@ -25,6 +26,7 @@ import argparse
 from argparse import RawTextHelpFormatter
 
 import carla
+from srunner.metrics.tools.metrics_cache import MetricsCache
 from srunner.metrics.tools.metrics_log import MetricsLog
 
 
@@ -40,30 +42,32 @@ class MetricsManager(object):
         the information from the recorder, extract the metrics class, and runs it
         """
         self._args = args
+        self._client = carla.Client(self._args.host, int(self._args.port))
+        self._cache = None if self._args.noCache else MetricsCache(self._args.cacheDir)
+
+        if self._args.buildCache:
+            self._build_cache(self._args.buildCache)
+            return
 
         # Parse the arguments
-        recorder_str = self._get_recorder(self._args.log)
+        recorder_file = self._get_recorder_file(self._args.log)
         criteria_dict = self._get_criteria(self._args.criteria)
 
+        # Instanciate the MetricsLog, used to querry the needed information
+        log = self._get_log(recorder_file)
+
         # Get the correct world and load it
-        map_name = self._get_recorder_map(recorder_str)
-        world = self._client.load_world(map_name)
+        world = self._client.load_world(log.get_map_name())
         town_map = world.get_map()
 
-        # Instanciate the MetricsLog, used to querry the needed information
-        log = MetricsLog(recorder_str)
-
         # Read and run the metric class
         metric_class = self._get_metric_class(self._args.metric)
         metric_class(town_map, log, criteria_dict)
 
-    def _get_recorder(self, log):
+    def _get_recorder_file(self, log):
         """
-        Parses the log argument into readable information
+        Returns the path to the recorder file given by the log argument
         """
-
-        # Get the log information.
-        self._client = carla.Client(self._args.host, int(self._args.port))
         recorder_file = "{}/{}".format(os.getenv('SCENARIO_RUNNER_ROOT', "./"), log)
 
         # Check that the file is correct
@@ -74,10 +78,54 @@ class MetricsManager(object):
             print("ERROR: The specified log file does not exist")
             sys.exit(-1)
 
+        return recorder_file
+
+    def _get_recorder(self, recorder_file):
+        """
+        Parses the log argument into readable information
+        """
         recorder_str = self._client.show_recorder_file_info(recorder_file, True)
 
         return recorder_str
 
+    def _get_log(self, recorder_file):
+        """
+        Returns the MetricsLog of the recorder file, from the cache if it is there.
+        Otherwise, the recorder is parsed and added to the cache
+        """
+        if self._cache is not None:
+            log = self._cache.load(recorder_file)
+            if log is not None:
+                return log
+
+        log = MetricsLog(self._get_recorder(recorder_file))
+        if self._cache is not None:
+            self._cache.save(recorder_file, log)
+
+        return log
+
+    def _build_cache(self, log_dir):
+        """
+        Parses all the recorder files of a directory into the cache
+        """
+        if self._cache is None:
+            print("ERROR: Building the cache is not compatible with --noCache")
+            sys.exit(-1)
+
+        recorder_dir = "{}/{}".format(os.getenv('SCENARIO_RUNNER_ROOT', "./"), log_dir)
+        recorder_files = sorted(glob.glob(os.path.join(recorder_dir, "*.log")))
+        if not recorder_files:
+            print("ERROR: No .log files found at {}".format(recorder_dir))
+            sys.exit(-1)
+
+        for recorder_file in recorder_files:
+            if self._cache.is_valid(recorder_file):
+                print("{} is already cached".format(recorder_file))
+                continue
+
+            print("Caching {}".format(recorder_file))
+            self._cache.save(recorder_file, MetricsLog(self._get_recorder(recorder_file)))
+
     def _get_criteria(self, criteria_file):
         """
         Parses the criteria argument into a dictionary
@@ -113,16 +161,6 @@ class MetricsManager(object):
         print("No child class of BasicMetric was found ... Exiting")
         sys.exit(-1)
 
-    def _get_recorder_map(self, recorder_str):
-        """
-        Returns the name of the map the simulation took place in
-        """
-
-        header = recorder_str.split("\n")
-        sim_map = header[1][5:]
-
-        return sim_map
-
 
 def main():
     """
@@ -138,16 +176,25 @@ def main():
                         help='IP of the host server (default: localhost)')
     parser.add_argument('--port', '-p', default=2000,
                         help='TCP port to listen to (default: 2000)')
-    parser.add_argument('--log', required=True,
+    parser.add_argument('--log',
                         help='Path to the CARLA recorder .log file (relative to SCENARIO_RUNNER_ROOT).\nThis file is created by the record functionality at ScenarioRunner')
-    parser.add_argument('--metric', required=True,
+    parser.add_argument('--metric',
                         help='Path to the .py file defining the used metric.\nSome examples at srunner/metrics')
     parser.add_argument('--criteria', default="",
                         help='Path to the .json file with the criteria information.\nThis file is created by the record functionality at ScenarioRunner')
+    parser.add_argument('--cacheDir', default=".metrics_cache",
+                        help='Directory where the parsed logs are cached, to be memory-mapped by later runs (default: .metrics_cache)')
+    parser.add_argument('--noCache', action="store_true",
+                        help='Always parse the log, without reading or writing the cache')
+    parser.add_argument('--buildCache',
+                        help='Path to a directory (relative to SCENARIO_RUNNER_ROOT) whose .log files are parsed into the cache, without running any metric')
     # pylint: enable=line-too-long
 
     args = parser.parse_args()
 
+    if not args.buildCache and (not args.log or not args.metric):
+        parser.error("the --log and --metric arguments are required, unless --buildCache is used")
+
     MetricsManager(args)
 
 if __name__ == "__main__":
@@ -992,10 +992,11 @@ class ModuleWorld(object):
         info_text = []
         if self.hero_actor is not None and len(vehicles) > 1:
             location = self.hero_transform.location
-            vehicle_list = [x[0] for x in vehicles if x[0].id != self.hero_actor.id]
+            vehicle_list = [x for x in vehicles if x[0].id != self.hero_actor.id]
 
-            def distance(v): return location.distance(v.get_location())
-            for n, vehicle in enumerate(sorted(vehicle_list, key=distance)):
+            # Use the transforms of this tick instead of querying the location of every vehicle
+            def distance(v): return location.distance(v[1].location)
+            for n, (vehicle, _) in enumerate(sorted(vehicle_list, key=distance)):
                 if n > 15:
                     break
                 vehicle_type = get_actor_display_name(vehicle, truncate=22)
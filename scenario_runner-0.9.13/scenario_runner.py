@@ -15,7 +15,9 @@ and finally triggers the scenario execution.
 
 from __future__ import print_function
 
+import copy
 import glob
+import multiprocessing
 import traceback
 import argparse
 from argparse import RawTextHelpFormatter
@@ -29,16 +31,23 @@ import sys
 import time
 import json
 import pkg_resources
+from six.moves.queue import Empty   # pylint: disable=relative-import,bad-option-value
 
 import carla
 
+from srunner.autoagents.agent_host import AgentHost
 from srunner.scenarioconfigs.openscenario_configuration import OpenScenarioConfiguration
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.scenario_manager import ScenarioManager
+from srunner.scenariomanager.tick_telemetry import get_worker_target
 from srunner.scenarios.open_scenario import OpenScenario
 from srunner.scenarios.route_scenario import RouteScenario
 from srunner.tools.scenario_parser import ScenarioConfigurationParser
 from srunner.tools.route_parser import RouteParser
+from srunner.tools.route_checkpoint import RouteCheckpoint
+from srunner.tools.openscenario_schema import OpenScenarioSchema, VALIDATE_ONCE, VALIDATE_SKIP
+from srunner.tools.route_planner_cache import RoutePlannerCache
+from srunner.tools.route_tracer import add_traced_routes, get_traced_routes, pre_trace_routes
 
 # Version of scenario_runner
 VERSION = '0.9.13'
@@ -74,6 +83,14 @@ class ScenarioRunner(object):
     agent_instance = None
     module_agent = None
 
+    # Outcome of the last analyzed scenario, as gathered by _analyze_scenario
+    scenario_summary = None
+
+    # World loaded by the last call to load_world, which can be reused by scenarios in the same town
+    _loaded_town = None
+    _loaded_world_id = None
+    _initial_weather = None
+
     def __init__(self, args):
         """
         Setup CARLA client and world
@@ -96,13 +113,27 @@ class ScenarioRunner(object):
 
         # Load agent if requested via command line args
         # If something goes wrong an exception will be thrown by importlib (ok here)
-        if self._args.agent is not None:
+        # Agents running in their own process are only loaded there
+        if self._args.agent is not None and not self._args.agentProcess:
             module_name = os.path.basename(args.agent).split('.')[0]
             sys.path.insert(0, os.path.dirname(args.agent))
             self.module_agent = importlib.import_module(module_name)
 
+        # The route planners of each town are kept on disk, if requested
+        if self._args.routePlannerCache:
+            RoutePlannerCache.set_cache_dir(self._args.routePlannerCache)
+
+        # The compiled OpenSCENARIO schema and the validated files are kept on disk, if requested
+        if self._args.schemaCache:
+            OpenScenarioSchema.set_cache_dir(self._args.schemaCache)
+        if self._args.skipValidation:
+            OpenScenarioSchema.set_validation_mode(VALIDATE_SKIP)
+        elif self._args.validateOnce:
+            OpenScenarioSchema.set_validation_mode(VALIDATE_ONCE)
+
         # Create the ScenarioManager
-        self.manager = ScenarioManager(self._args.debug, self._args.sync, self._args.timeout)
+        self.manager = ScenarioManager(self._args.debug, self._args.sync, self._args.timeout,
+                                       self._args.profile, self._args.telemetry, self._args.agentMode)
 
         # Create signal handler for SIGINT
         self._shutdown_requested = False
@@ -120,6 +151,8 @@ class ScenarioRunner(object):
 
         self._cleanup()
         if self.manager is not None:
+            if self.manager.telemetry is not None:
+                self.manager.telemetry.close()
             del self.manager
         if self.world is not None:
             del self.world
@@ -258,14 +291,43 @@ class ScenarioRunner(object):
         filename = None
         if self._args.file:
             filename = config_name + current_time + ".txt"
+        profile_filename = None
+        if self._args.profile:
+            profile_filename = config_name + current_time + "_profile.json"
 
-        if not self.manager.analyze_scenario(self._args.output, filename, junit_filename, json_filename):
+        failed = self.manager.analyze_scenario(self._args.output, filename, junit_filename, json_filename,
+                                               profile_filename)
+        self.scenario_summary = self._get_scenario_summary(failed)
+
+        if not failed:
             print("All scenario tests were passed successfully!")
         else:
             print("Not all scenario tests were successful")
             if not (self._args.output or filename or junit_filename):
                 print("Please run with --output for further information")
 
+    def _get_scenario_summary(self, failed):
+        """
+        Gather the outcome of the scenario that has just been analyzed, in a JSON
+        serializable form that can be aggregated with the results of other routes
+        """
+        criteria = []
+        for criterion in self.manager.scenario.get_criteria():
+            criteria.append({
+                "name": criterion.name,
+                "optional": criterion.optional,
+                "expected": criterion.expected_value_success,
+                "actual": criterion.actual_value,
+                "status": criterion.test_status
+            })
+
+        return {
+            "success": not failed,
+            "duration_system": self.manager.scenario_duration_system,
+            "duration_game": self.manager.scenario_duration_game,
+            "criteria": criteria
+        }
+
     def _record_criteria(self, criteria, name):
         """
         Filter the JSON serializable attributes of the criterias and
@@ -298,13 +360,46 @@ class ScenarioRunner(object):
         with open(file_name, 'w', encoding='utf-8') as fp:
             json.dump(criteria_dict, fp, sort_keys=False, indent=4)
 
+    def _is_town_loaded(self, town):
+        """
+        Returns whether the CARLA server still runs the world loaded for that town
+        """
+        if self._loaded_town != town:
+            return False
+        return self.client.get_world().id == self._loaded_world_id
+
+    def _reset_world(self):
+        """
+        Bring the loaded world back to its initial state, destroying the actors left behind
+        and resetting the traffic lights and the weather, instead of loading it again
+        """
+        world = self.client.get_world()
+
+        DestroyActor = carla.command.DestroyActor       # pylint: disable=invalid-name
+        batch = []
+        for actor in world.get_actors():
+            if actor.type_id.startswith(('vehicle.', 'walker.', 'sensor.', 'controller.')):
+                batch.append(DestroyActor(actor))
+        self.client.apply_batch_sync(batch)
+
+        world.reset_all_traffic_lights()
+        world.freeze_all_traffic_lights(False)
+        world.set_weather(self._initial_weather)
+
     def _load_and_wait_for_world(self, town, ego_vehicles=None):
         """
         Load a new CARLA world and provide data to CarlaDataProvider
         """
 
         if self._args.reloadWorld:
-            self.world = self.client.load_world(town)
+            if self._args.reuseWorld and self._is_town_loaded(town):
+                print("Reusing the already loaded {}".format(town))
+                self._reset_world()
+            else:
+                self.world = self.client.load_world(town)
+                self._loaded_town = town
+                self._loaded_world_id = self.world.id
+                self._initial_weather = self.world.get_weather()
         else:
             # if the world should not be reloaded, wait at least until all ego vehicles are ready
             ego_vehicle_found = False
@@ -347,19 +442,23 @@ class ScenarioRunner(object):
 
         return True
 
-    def _load_and_run_scenario(self, config):
+    def _load_and_run_scenario(self, config, repetition=0):
         """
-        Load and run the scenario given by config
+        Load and run the given repetition of the scenario given by config
         """
         result = False
+        self.scenario_summary = None
         if not self._load_and_wait_for_world(config.town, config.ego_vehicles):
             self._cleanup()
             return False
 
         if self._args.agent:
-            agent_class_name = self.module_agent.__name__.title().replace('_', '')
+            agent_class_name = os.path.basename(self._args.agent).split('.')[0].title().replace('_', '')
             try:
-                self.agent_instance = getattr(self.module_agent, agent_class_name)(self._args.agentConfig)
+                if self._args.agentProcess:
+                    self.agent_instance = AgentHost(self._args.agent, agent_class_name, self._args.agentConfig)
+                else:
+                    self.agent_instance = getattr(self.module_agent, agent_class_name)(self._args.agentConfig)
                 config.agent = self.agent_instance
             except Exception as e:          # pylint: disable=broad-except
                 traceback.print_exc()
@@ -412,7 +511,7 @@ class ScenarioRunner(object):
                 self.client.start_recorder(recorder_name, True)
 
             # Load scenario and run it
-            self.manager.load_scenario(scenario, self.agent_instance)
+            self.manager.load_scenario(scenario, self.agent_instance, repetition)
             self.manager.run_scenario()
 
             # Provide outputs if required
@@ -450,9 +549,9 @@ class ScenarioRunner(object):
 
         # Execute each configuration
         for config in scenario_configurations:
-            for _ in range(self._args.repetitions):
+            for repetition in range(self._args.repetitions):
                 self.finished = False
-                result = self._load_and_run_scenario(config)
+                result = self._load_and_run_scenario(config, repetition)
 
             self._cleanup()
         return result
@@ -477,13 +576,57 @@ class ScenarioRunner(object):
         else:
             route_configurations = self._args.route
 
+        # Group the routes by town, so that the world is only loaded once per town
+        if self._args.reuseWorld:
+            route_configurations = sorted(route_configurations, key=lambda config: config.town)
+
+        if self._args.preTraceRoutes:
+            print("Pre-traced {} routes".format(pre_trace_routes(route_configurations, self._args.preTraceRoutes)))
+
+        checkpoint = RouteCheckpoint(get_checkpoint_filename(self._args), self._args.route[0], self._args.resume,
+                                     self._args.route[1] if len(self._args.route) > 1 else None,
+                                     self._args.repetitions)
+
         for config in route_configurations:
-            for _ in range(self._args.repetitions):
-                result = self._load_and_run_scenario(config)
+            for repetition in range(self._args.repetitions):
+                if checkpoint.is_finished(config.route_id, repetition):
+                    print("Skipping {} (repetition {}), already finished".format(config.name, repetition))
+                    continue
 
-                self._cleanup()
+                record = self.run_route_job(config, repetition)
+                if self._shutdown_requested:
+                    return False
+
+                checkpoint.add(record)
+                result = record["executed"]
         return result
 
+    def run_route_job(self, config, repetition):
+        """
+        Run one repetition of a route and return its results
+        """
+        self.finished = False
+        result = self._load_and_run_scenario(config, repetition)
+        self._cleanup()
+
+        record = {
+            "route_id": config.route_id,
+            "name": config.name,
+            "town": config.town,
+            "repetition": repetition,
+            "host": "{}:{}".format(self._args.host, self._args.port),
+            "executed": result
+        }
+        if self.scenario_summary is not None:
+            record.update(self.scenario_summary)
+        return record
+
+    def shutdown_requested(self):
+        """
+        Returns whether a signal asked the scenario runner to stop
+        """
+        return self._shutdown_requested
+
     def _run_openscenario(self):
         """
         Run a scenario based on OpenSCENARIO
@@ -523,7 +666,160 @@ class ScenarioRunner(object):
         return result
 
 
-def main():
+def get_checkpoint_filename(args):
+    """
+    Returns the path of the checkpoint file of a route evaluation
+    """
+    if args.checkpoint:
+        return args.checkpoint
+    return os.path.join(args.outputDir, "route_checkpoint.json")
+
+
+def parse_batch_servers(servers):
+    """
+    Parse the list of 'host:port[:trafficManagerPort]' entries given to --batchServers.
+    Without an explicit port, the traffic manager uses the CARLA port + 6000
+    """
+    parsed_servers = []
+    for server in servers:
+        fields = server.split(':')
+        if len(fields) not in (2, 3) or not all(fields):
+            raise ValueError("Invalid server '{}', expected 'host:port[:trafficManagerPort]'".format(server))
+        host, port = fields[0], fields[1]
+        tm_port = fields[2] if len(fields) == 3 else str(int(port) + 6000)
+        parsed_servers.append((host, port, tm_port))
+
+    return parsed_servers
+
+
+def _route_batch_worker(args, server, job_queue, result_queue, traced_routes):
+    """
+    Worker process of the route batch. It owns a ScenarioRunner connected to its own CARLA server
+    and traffic manager, and runs the (route id, repetition) jobs it takes from the queue.
+    The routes pre-traced by the main process are given as traced_routes
+    """
+    add_traced_routes(traced_routes)
+
+    worker_args = copy.copy(args)
+    worker_args.host, worker_args.port, worker_args.trafficManagerPort = server
+    worker_args.telemetry = get_worker_target(args.telemetry, "{}:{}".format(worker_args.host, worker_args.port))
+
+    scenario_runner = None
+    try:
+        scenario_runner = ScenarioRunner(worker_args)
+        route_configurations = {}
+        for config in RouteParser.parse_routes_file(args.route[0], args.route[1]):
+            route_configurations[config.route_id] = config
+
+        while not scenario_runner.shutdown_requested():
+            job = job_queue.get()
+            if job is None:
+                break
+
+            route_id, repetition = job
+            record = scenario_runner.run_route_job(route_configurations[route_id], repetition)
+            if scenario_runner.shutdown_requested():
+                break
+            result_queue.put(record)
+
+    except Exception:   # pylint: disable=broad-except
+        traceback.print_exc()
+
+    finally:
+        if scenario_runner is not None:
+            scenario_runner.destroy()
+
+
+def run_route_batch(args):
+    """
+    Run the routes of the route file in parallel, sharding them across one worker process
+    per CARLA server given at --batchServers. The results of all the routes are then
+    written into a single report at the output directory
+    """
+    servers = parse_batch_servers(args.batchServers)
+
+    single_route = args.route[2] if len(args.route) > 2 else None
+    route_configurations = RouteParser.parse_routes_file(args.route[0], args.route[1], single_route)
+    if args.reuseWorld:
+        route_configurations = sorted(route_configurations, key=lambda config: config.town)
+    all_jobs = [(config.route_id, repetition)
+                for config in route_configurations for repetition in range(args.repetitions)]
+
+    checkpoint = RouteCheckpoint(get_checkpoint_filename(args), args.route[0], args.resume,
+                                 args.route[1], args.repetitions)
+    jobs = [job for job in all_jobs if not checkpoint.is_finished(*job)]
+    configs_by_id = {}
+    for config in route_configurations:
+        configs_by_id[config.route_id] = config
+
+    # Traced before starting the workers, which are given the traced routes whatever the start method of the platform
+    if args.preTraceRoutes:
+        if args.routePlannerCache:
+            RoutePlannerCache.set_cache_dir(args.routePlannerCache)
+        print("Pre-traced {} routes".format(pre_trace_routes(route_configurations, args.preTraceRoutes)))
+
+    # Routes are taken from a shared queue, so that a server never stays idle while others are busy
+    job_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    for _ in servers:
+        job_queue.put(None)
+
+    traced_routes = get_traced_routes()
+    workers = []
+    for server in servers:
+        worker = multiprocessing.Process(target=_route_batch_worker,
+                                         args=(args, server, job_queue, result_queue, traced_routes))
+        worker.start()
+        workers.append(worker)
+
+    print("Running {} route jobs across {} CARLA servers".format(len(jobs), len(servers)))
+    records = {}
+    while len(records) < len(jobs):
+        try:
+            record = result_queue.get(timeout=1.0)
+        except Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+            continue
+        records[(record["route_id"], record["repetition"])] = record
+        checkpoint.add(record)
+        print("Finished {} (repetition {}) on {} [{}/{}]".format(
+            record["name"], record["repetition"], record["host"], len(records), len(jobs)))
+
+    for worker in workers:
+        worker.join()
+
+    # Jobs lost with a crashed worker are reported as not executed
+    results = []
+    for route_id, repetition in all_jobs:
+        record = checkpoint.get_record(route_id, repetition)
+        if record is None:
+            config = configs_by_id[route_id]
+            record = {"route_id": route_id, "name": config.name, "town": config.town,
+                      "repetition": repetition, "host": None, "executed": False}
+        results.append(record)
+
+    report = {
+        "routes_file": args.route[0],
+        "servers": ["{}:{}".format(host, port) for host, port, _ in servers],
+        "total": len(results),
+        "executed": sum(1 for record in results if record["executed"]),
+        "success": sum(1 for record in results if record.get("success", False)),
+        "results": results
+    }
+    report_name = os.path.join(args.outputDir, "batch_report.json")
+    with open(report_name, 'w', encoding='utf-8') as fp:
+        json.dump(report, fp, indent=4, default=str)
+
+    print("Executed {executed}/{total} route jobs, {success} successful".format(**report))
+    print("Batch report written to {}".format(report_name))
+
+    return report["executed"] == report["total"]
+
+
+def main():  # pylint: disable=too-many-return-statements
     """
     main function
     """
@@ -552,17 +848,34 @@ def main():
         '--scenario', help='Name of the scenario to be executed. Use the preposition \'group:\' to run all scenarios of one class, e.g. ControlLoss or FollowLeadingVehicle')
     parser.add_argument('--openscenario', help='Provide an OpenSCENARIO definition')
     parser.add_argument('--openscenarioparams', help='Overwrited for OpenSCENARIO ParameterDeclaration')
+    parser.add_argument('--skipValidation', action="store_true",
+                        help='Do not validate the OpenSCENARIO files and their catalogs against the XSD')
+    parser.add_argument('--validateOnce', action="store_true",
+                        help='Only validate the OpenSCENARIO files whose content was not validated before')
+    parser.add_argument('--schemaCache', default='',
+                        help='Directory where the compiled OpenSCENARIO XSD and the hashes of the validated files are kept')
     parser.add_argument(
         '--route', help='Run a route as a scenario (input: (route_file,scenario_file,[route id]))', nargs='+', type=str)
 
+    parser.add_argument('--batchServers', nargs='+', type=str,
+                        help='Run the routes in parallel, one worker per CARLA server (input: host:port[:trafficManagerPort] ...)')
+
     parser.add_argument(
         '--agent', help="Agent used to execute the scenario. Currently only compatible with route-based scenarios.")
     parser.add_argument('--agentConfig', type=str, help="Path to Agent's configuration file", default="")
+    parser.add_argument('--agentProcess', action="store_true",
+                        help='Run the agent in its own process, sharing the sensor data through shared memory (Python 3.8+).\nThe agent can\'t use CarlaDataProvider there')
+    parser.add_argument('--agentMode', default='serial', choices=['serial', 'parallel', 'pipelined'],
+                        help='How the agent runs alongside the scenario (default: serial).\nparallel: the agent runs while the scenario ticks, with the same results as serial\npipelined: the agent also runs while the world ticks, and its control is applied one frame later')
 
     parser.add_argument('--output', action="store_true", help='Provide results on stdout')
     parser.add_argument('--file', action="store_true", help='Write results into a txt file')
     parser.add_argument('--junit', action="store_true", help='Write results into a junit file')
     parser.add_argument('--json', action="store_true", help='Write results into a JSON file')
+    parser.add_argument('--profile', action="store_true",
+                        help='Measure the time spent by each behaviour of the scenario tree and write a ranked report')
+    parser.add_argument('--telemetry', type=str, default='',
+                        help='Send the timing of every tick to a CSV file, a JSON lines file (*.jsonl) or a statsd server (udp://host:port)')
     parser.add_argument('--outputDir', default='', help='Directory for output files (default: this directory)')
 
     parser.add_argument('--configFile', default='', help='Provide an additional scenario configuration file (*.xml)')
@@ -571,11 +884,21 @@ def main():
     parser.add_argument('--debug', action="store_true", help='Run with debug output')
     parser.add_argument('--reloadWorld', action="store_true",
                         help='Reload the CARLA world before starting a scenario (default=True)')
+    parser.add_argument('--reuseWorld', action="store_true",
+                        help='Reset the loaded world instead of reloading it when consecutive routes share a town.\nRoutes are grouped by town')
+    parser.add_argument('--routePlannerCache', default='',
+                        help='Directory where the route planner graph of each town is saved, to be reused by other runs')
+    parser.add_argument('--preTraceRoutes', default='',
+                        help='Directory with the <town>.xodr files of the routes, used to trace all of them in parallel before running them')
     parser.add_argument('--record', type=str, default='',
                         help='Path were the files will be saved, relative to SCENARIO_RUNNER_ROOT.\nActivates the CARLA recording feature and saves to file all the criteria information.')
     parser.add_argument('--randomize', action="store_true", help='Scenario parameters are randomized')
     parser.add_argument('--repetitions', default=1, type=int, help='Number of scenario executions')
     parser.add_argument('--waitForEgo', action="store_true", help='Connect the scenario to an existing ego vehicle')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='Checkpoint file storing the progress of a route evaluation (default: outputDir/route_checkpoint.json)')
+    parser.add_argument('--resume', action="store_true",
+                        help='Resume a route evaluation from its checkpoint, skipping the routes already finished')
 
     arguments = parser.parse_args()
     # pylint: enable=line-too-long
@@ -603,12 +926,20 @@ def main():
     if arguments.openscenarioparams and not arguments.openscenario:
         print("WARN: Ignoring --openscenarioparams when --openscenario is not specified")
 
+    if arguments.batchServers and (not arguments.route or len(arguments.route) < 2):
+        print("The batch mode requires a route file and a scenario file at --route\n\n")
+        parser.print_help(sys.stdout)
+        return 1
+
     if arguments.route:
         arguments.reloadWorld = True
 
     if arguments.agent:
         arguments.sync = True
 
+    if arguments.batchServers:
+        return not run_route_batch(arguments)
+
     scenario_runner = None
     result = True
     try:
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the AgentHost, which runs an autonomous agent in its own process.
+The sensor data is shared with the agent process through shared memory, while the
+commands and the resulting controls are exchanged through a pipe.
+
+Requires Python 3.8 or newer (multiprocessing.shared_memory)
+"""
+
+from __future__ import print_function
+
+import importlib
+import multiprocessing
+import os
+import sys
+import traceback
+from timeit import default_timer
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+import carla
+
+from srunner.autoagents.autonomous_agent import AutonomousAgent
+
+
+class SharedSensorRing(object):
+
+    """
+    Ring of slots in shared memory, each of them holding one frame of a sensor
+
+    Args:
+        slot_size (int): size of each slot, in bytes
+        slots (int): number of slots of the ring
+    """
+
+    def __init__(self, slot_size, slots=2):
+        self.slot_size = max(int(slot_size), 1)
+        self.slots = slots
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slot_size * self.slots)
+        self._next_slot = 0
+
+    def write(self, array):
+        """
+        Copies the array into the next slot and returns its offset in the shared memory
+        """
+        offset = self._next_slot * self.slot_size
+        if array.nbytes:
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=self.memory.buf, offset=offset)
+            np.copyto(target, array)
+            del target
+        self._next_slot = (self._next_slot + 1) % self.slots
+        return offset
+
+    def close(self):
+        """
+        Releases the shared memory
+        """
+        self.memory.close()
+        self.memory.unlink()
+
+
+class AgentHost(AutonomousAgent):
+
+    """
+    Autonomous agent running another agent in its own process, so that its dependencies
+    and computations stay out of the scenario runner's interpreter.
+
+    The sensors are still handled by this side, and the data of each frame is written into one
+    SharedSensorRing per sensor. The agent process gets its input data as arrays backed by the same
+    shared memory, which are only valid during its run_step.
+
+    The agent process isn't connected to CARLA: CarlaDataProvider has no client, world, map or actors
+    there. Agents that use CarlaDataProvider (or any other CARLA state) in their setup or run_step
+    can't be run this way, and have to get everything they need from their sensors and global plan.
+
+    Args:
+        agent_path (str): path to the Python file of the agent
+        agent_class_name (str): name of the agent class in that file
+        path_to_conf_file (str): configuration file given to the agent
+        timeout (float): how long to wait for the agent process to answer a command [seconds].
+            After that, the process is killed
+    """
+
+    # Extra room given to the rings when a sensor sends more data than fits in its slots
+    ring_growth = 1.5
+
+    # How often the agent process is checked to still be alive while waiting for it [seconds]
+    poll_interval = 0.1
+
+    def __init__(self, agent_path, agent_class_name, path_to_conf_file, timeout=60.0):
+        if shared_memory is None:
+            raise ImportError("Running the agent in its own process requires Python 3.8 or newer")
+
+        self._agent_path = agent_path
+        self._agent_class_name = agent_class_name
+        self._timeout = timeout
+        self._rings = {}
+        self._process = None
+        self._connection = None
+        self._sensors = []
+        super(AgentHost, self).__init__(path_to_conf_file)
+
+    def setup(self, path_to_conf_file):
+        """
+        Start the agent process and ask for the sensors of the agent
+        """
+        context = multiprocessing.get_context('spawn')
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(target=_run_agent_process,
+                                        args=(self._agent_path, self._agent_class_name,
+                                              path_to_conf_file, child_connection),
+                                        daemon=True)
+        self._process.start()
+        child_connection.close()
+
+        self._sensors = self._request('sensors')
+
+    def _request(self, command, payload=None):
+        """
+        Send a command to the agent process and wait for its result.
+        The process is killed if it doesn't answer within the timeout
+        """
+        if self._process is None:
+            raise RuntimeError("The agent process isn't running")
+
+        try:
+            self._connection.send((command, payload))
+            deadline = default_timer() + self._timeout
+            while not self._connection.poll(self.poll_interval):
+                if not self._process.is_alive():
+                    raise EOFError()
+                if default_timer() > deadline:
+                    self._kill_process()
+                    raise RuntimeError("The agent process didn't answer '{}' within {} seconds".format(
+                        command, self._timeout))
+            status, result = self._connection.recv()
+        except (EOFError, OSError) as e:
+            self._kill_process()
+            raise RuntimeError("The agent process stopped unexpectedly") from e
+
+        if status == 'error':
+            raise RuntimeError("The agent process failed:\n{}".format(result))
+        return result
+
+    def _kill_process(self):
+        """
+        Stop the agent process without waiting for it to finish its current command
+        """
+        if self._process is None:
+            return
+        self._process.terminate()
+        self._process.join(timeout=1.0)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._process = None
+        self._connection.close()
+
+    def sensors(self):
+        """
+        Returns the sensors defined by the agent
+        """
+        return self._sensors
+
+    def set_global_plan(self, global_plan_gps, global_plan_world_coord):
+        """
+        Set the plan (route) for the agent. The transforms are sent by value
+        """
+        world_coord = []
+        for transform, road_option in global_plan_world_coord:
+            location = transform.location
+            rotation = transform.rotation
+            world_coord.append(((location.x, location.y, location.z),
+                                (rotation.pitch, rotation.yaw, rotation.roll),
+                                road_option))
+
+        self._request('global_plan', (global_plan_gps, world_coord))
+
+    def run_step(self, input_data, timestamp):
+        """
+        Share the sensor data with the agent process and wait for its control
+        """
+        sensor_data = {}
+        for tag, (frame, data) in input_data.items():
+            if not isinstance(data, np.ndarray):
+                sensor_data[tag] = (frame, None, data)
+                continue
+
+            data = np.ascontiguousarray(data)
+            ring = self._rings.get(tag)
+            if ring is None or data.nbytes > ring.slot_size:
+                if ring is not None:
+                    ring.close()
+                ring = SharedSensorRing(data.nbytes * self.ring_growth)
+                self._rings[tag] = ring
+
+            offset = ring.write(data)
+            sensor_data[tag] = (frame, ring.memory.name, (offset, data.shape, data.dtype.str))
+
+        throttle, steer, brake, hand_brake, reverse, manual_gear_shift, gear = self._request(
+            'run_step', (sensor_data, timestamp))
+
+        control = carla.VehicleControl()
+        control.throttle = throttle
+        control.steer = steer
+        control.brake = brake
+        control.hand_brake = hand_brake
+        control.reverse = reverse
+        control.manual_gear_shift = manual_gear_shift
+        control.gear = gear
+        return control
+
+    def destroy(self):
+        """
+        Destroy the agent, stop its process and release the shared memory
+        """
+        if self._process is not None:
+            try:
+                self._request('destroy')
+            except RuntimeError as e:
+                print(e)
+
+        # The process may have already been killed by a failed request
+        if self._process is not None:
+            self._process.join(timeout=5.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+            self._connection.close()
+
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+
+
+def _run_agent_process(agent_path, agent_class_name, path_to_conf_file, connection):
+    """
+    Main loop of the agent process, running the commands sent by the AgentHost
+    """
+    memory_blocks = {}
+
+    def get_memory_block(tag, name):
+        """
+        Attach to the shared memory block of a sensor. The AgentHost owns it and unlinks it,
+        while the blocks it replaced by bigger ones are closed here
+        """
+        memory_block = memory_blocks.get(tag)
+        if memory_block is None or memory_block.name != name:
+            if memory_block is not None:
+                memory_block.close()
+            memory_block = shared_memory.SharedMemory(name=name)
+            memory_blocks[tag] = memory_block
+        return memory_block
+
+    agent = None
+    try:
+        module_name = os.path.basename(agent_path).split('.')[0]
+        sys.path.insert(0, os.path.dirname(agent_path))
+        agent = getattr(importlib.import_module(module_name), agent_class_name)(path_to_conf_file)
+    except Exception:   # pylint: disable=broad-except
+        connection.send(('error', traceback.format_exc()))
+        return
+
+    while True:
+        try:
+            command, payload = connection.recv()
+        except EOFError:
+            break
+
+        try:
+            result = None
+            if command == 'sensors':
+                result = agent.sensors()
+
+            elif command == 'global_plan':
+                global_plan_gps, world_coord = payload
+                global_plan_world_coord = [(carla.Transform(carla.Location(*location),
+                                                            carla.Rotation(pitch=rotation[0],
+                                                                           yaw=rotation[1],
+                                                                           roll=rotation[2])), road_option)
+                                           for location, rotation, road_option in world_coord]
+                agent.set_global_plan(global_plan_gps, global_plan_world_coord)
+
+            elif command == 'run_step':
+                sensor_data, timestamp = payload
+                input_data = {}
+                for tag, (frame, name, data) in sensor_data.items():
+                    if name is not None:
+                        offset, shape, dtype = data
+                        data = np.ndarray(shape, dtype=np.dtype(dtype), buffer=get_memory_block(tag, name).buf,
+                                          offset=offset)
+                    input_data[tag] = (frame, data)
+
+                control = agent.run_step(input_data, timestamp)
+                del input_data
+                result = (control.throttle, control.steer, control.brake, control.hand_brake, control.reverse,
+                          control.manual_gear_shift, control.gear)
+
+            elif command == 'destroy':
+                agent.destroy()
+                connection.send(('ok', None))
+                break
+
+            connection.send(('ok', result))
+
+        except Exception:   # pylint: disable=broad-except
+            connection.send(('error', traceback.format_exc()))
+
+    for memory_block in memory_blocks.values():
+        try:
+            memory_block.close()
+        except BufferError:
+            pass
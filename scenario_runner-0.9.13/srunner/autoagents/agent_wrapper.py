@@ -11,6 +11,9 @@ Wrapper for autonomous agents required for tracking and checking of used sensors
 
 from __future__ import print_function
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 import carla
 
 from srunner.autoagents.sensor_interface import CallBack
@@ -21,16 +24,36 @@ class AgentWrapper(object):
 
     """
     Wrapper for autonomous agents required for tracking and checking of used sensors
+
+    The agent can be run in three modes:
+    - serial: the agent is called and its control applied before ticking the scenario
+    - parallel: the agent runs in its own thread while the scenario ticks, and its control is
+      applied before the world ticks. The results are the same as in serial mode
+    - pipelined: the agent also runs while the world ticks, so the control computed with
+      the data of a frame is applied at the next one. The agent is always one frame behind
     """
 
+    SERIAL = 'serial'
+    PARALLEL = 'parallel'
+    PIPELINED = 'pipelined'
+
     _agent = None
     _sensors_list = []
 
-    def __init__(self, agent):
+    def __init__(self, agent, mode=SERIAL, timeout=10.0):
         """
-        Set the autonomous agent
+        Set the autonomous agent, the mode it runs in and how long
+        the scenario can wait for a control in the parallel modes
         """
+        if mode not in (self.SERIAL, self.PARALLEL, self.PIPELINED):
+            raise ValueError("Unknown agent mode '{}'".format(mode))
+
         self._agent = agent
+        self.mode = mode
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1) if mode != self.SERIAL else None
+        self._pending_control = None
+        self._timed_out = False
 
     def __call__(self):
         """
@@ -38,6 +61,48 @@ class AgentWrapper(object):
         """
         return self._agent()
 
+    def start_step(self):
+        """
+        Start computing the control for the current frame in the agent's thread
+        """
+        if self._timed_out:
+            raise RuntimeError("The agent timed out in a previous step and can't be run anymore")
+        self._pending_control = self._executor.submit(self._agent)
+
+    def wait_for_control(self):
+        """
+        Wait for the control started by start_step, or returns None if there is none
+        """
+        if self._pending_control is None:
+            return None
+
+        pending_control = self._pending_control
+        self._pending_control = None
+        try:
+            return pending_control.result(self._timeout)
+        except FutureTimeoutError as e:
+            # The hung step can't be stopped, so the thread is abandoned instead of waited for
+            self._timed_out = True
+            self._shutdown_executor()
+            raise RuntimeError("The agent took more than {} seconds to compute its control".format(
+                self._timeout)) from e
+
+    def _shutdown_executor(self):
+        """
+        Shut down the agent's thread. After a timeout, its running step is not waited for
+        """
+        if self._executor is None:
+            return
+        if self._timed_out:
+            try:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            except TypeError:
+                # cancel_futures requires Python 3.9 or newer
+                self._executor.shutdown(wait=False)
+        else:
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
     def setup_sensors(self, vehicle, debug_mode=False):
         """
         Create the sensors defined by the user and attach them to the ego-vehicle
@@ -88,6 +153,13 @@ class AgentWrapper(object):
         """
         Remove and destroy all sensors
         """
+        if self._executor is not None:
+            try:
+                self.wait_for_control()
+            except Exception as e:      # pylint: disable=broad-except
+                print("The agent failed computing its last control: {}".format(e))
+            self._shutdown_executor()
+
         for i, _ in enumerate(self._sensors_list):
             if self._sensors_list[i] is not None:
                 self._sensors_list[i].stop()
@@ -95,6 +95,9 @@ class AutonomousAgent(object):
         control = self.run_step(input_data, timestamp)
         control.manual_gear_shift = False
 
+        # The sensor arrays given to run_step are reused for the next frames
+        self.sensor_interface.recycle_buffers()
+
         return control
 
     def set_global_plan(self, global_plan_gps, global_plan_world_coord):
@@ -8,20 +8,16 @@ This file containts CallBack class and SensorInterface, responsible of
 handling the use of sensors for the agents
 """
 
-import copy
 import logging
-
-try:
-    from queue import Queue
-    from queue import Empty
-except ImportError:
-    from Queue import Queue
-    from Queue import Empty
+import threading
+import time
 
 import numpy as np
 
 import carla
 
+from srunner.scenariomanager.timer import GameTime
+
 
 class SensorReceivedNoData(Exception):
 
@@ -62,35 +58,39 @@ class CallBack(object):
         else:
             logging.error('No callback method for this sensor.')
 
+    def _copy_to_buffer(self, tag, raw_data, dtype, shape, frame, reverse_columns=False):
+        """
+        Copies the raw data of a sensor into one of its preallocated buffers,
+        and sends the resulting array to the data provider
+        """
+        raw_array = np.frombuffer(raw_data, dtype=dtype).reshape(shape)
+        buffer = self._data_provider.acquire_buffer(tag, dtype, raw_array.size)
+        array = buffer[:raw_array.size].reshape(shape)
+        np.copyto(array, raw_array[:, ::-1] if reverse_columns else raw_array)
+        self._data_provider.update_sensor(tag, array, frame, buffer)
+
     # Parsing CARLA physical Sensors
     def _parse_image_cb(self, image, tag):
         """
         parses cameras
         """
-        array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
-        array = copy.deepcopy(array)
-        array = np.reshape(array, (image.height, image.width, 4))
-        self._data_provider.update_sensor(tag, array, image.frame)
+        self._copy_to_buffer(tag, image.raw_data, np.dtype("uint8"), (image.height, image.width, 4), image.frame)
 
     def _parse_lidar_cb(self, lidar_data, tag):
         """
         parses lidar sensors
         """
-        points = np.frombuffer(lidar_data.raw_data, dtype=np.dtype('f4'))
-        points = copy.deepcopy(points)
-        points = np.reshape(points, (int(points.shape[0] / 4), 4))
-        self._data_provider.update_sensor(tag, points, lidar_data.frame)
+        points_count = len(lidar_data.raw_data) // (4 * 4)
+        self._copy_to_buffer(tag, lidar_data.raw_data, np.dtype('f4'), (points_count, 4), lidar_data.frame)
 
     def _parse_radar_cb(self, radar_data, tag):
         """
         parses radar sensors
         """
-        # [depth, azimuth, altitute, velocity]
-        points = np.frombuffer(radar_data.raw_data, dtype=np.dtype('f4'))
-        points = copy.deepcopy(points)
-        points = np.reshape(points, (int(points.shape[0] / 4), 4))
-        points = np.flip(points, 1)
-        self._data_provider.update_sensor(tag, points, radar_data.frame)
+        # [depth, azimuth, altitute, velocity], stored as [velocity, altitute, azimuth, depth]
+        points_count = len(radar_data.raw_data) // (4 * 4)
+        self._copy_to_buffer(tag, radar_data.raw_data, np.dtype('f4'), (points_count, 4), radar_data.frame,
+                             reverse_columns=True)
 
     def _parse_gnss_cb(self, gnss_data, tag):
         """
@@ -116,10 +116,58 @@ class CallBack(object):
         self._data_provider.update_sensor(tag, array, imu_data.frame)
 
 
+class SensorBufferPool(object):
+
+    """
+    Preallocated arrays holding the data of the sensors, which are reused once the agent is done with them.
+
+    Buffers are kept per sensor tag as flat arrays, large enough for the biggest measurement seen so far
+    """
+
+    def __init__(self):
+        """
+        Initializes the pool
+        """
+        self._lock = threading.Lock()
+        self._free_buffers = {}
+
+    def acquire(self, tag, dtype, size):
+        """
+        Returns a flat buffer of the sensor, with at least size elements of type dtype
+        """
+        with self._lock:
+            free_buffers = self._free_buffers.setdefault(tag, [])
+            for i, buffer in enumerate(free_buffers):
+                if buffer.dtype == dtype and buffer.size >= size:
+                    return free_buffers.pop(i)
+            if free_buffers:
+                # Replace the smallest buffer, the ones that are too small won't be used again
+                free_buffers.pop(0)
+
+        return np.empty(size, dtype=dtype)
+
+    def release(self, tag, buffer):
+        """
+        Gives a buffer back to the pool of its sensor
+        """
+        with self._lock:
+            free_buffers = self._free_buffers.setdefault(tag, [])
+            free_buffers.append(buffer)
+            free_buffers.sort(key=lambda free_buffer: free_buffer.size)
+
+
 class SensorInterface(object):
 
     """
-    Class that contains all sensor data
+    Class that contains all sensor data.
+
+    The data is gathered per frame, and get_data() returns the data of all sensors for a single frame.
+    Data arriving for a frame older than the last one returned is dropped, as is data
+    of a frame that was skipped, and both are counted in stale_data_count.
+
+    The camera, lidar and radar arrays returned by get_data() are views of preallocated buffers,
+    which are recycled by recycle_buffers() after the agent's run_step. Agents that keep
+    any of these arrays for later steps have to copy them
     """
 
     def __init__(self):
@@ -127,8 +175,15 @@ class SensorInterface(object):
         Initializes the class
         """
         self._sensors_objects = {}
-        self._new_data_buffers = Queue()
-        self._queue_timeout = 10
+        self._frames_data = {}
+        self._first_valid_frame = 0
+        self._data_condition = threading.Condition()
+        self._data_timeout = 10
+        self._buffer_pool = SensorBufferPool()
+        self._delivered_buffers = []
+
+        self.stale_data_count = 0
+        self.duplicated_data_count = 0
 
     def register_sensor(self, tag, sensor):
         """
@@ -139,27 +194,80 @@ class SensorInterface(object):
 
         self._sensors_objects[tag] = sensor
 
-    def update_sensor(self, tag, data, timestamp):
+    def acquire_buffer(self, tag, dtype, size):
+        """
+        Returns a flat buffer to hold the data of a sensor, with at least size elements of type dtype
+        """
+        return self._buffer_pool.acquire(tag, dtype, size)
+
+    def update_sensor(self, tag, data, timestamp, buffer=None):
         """
-        Updates the sensor
+        Updates the sensor with its data of the frame given by timestamp. If the data is stored in
+        a buffer given by acquire_buffer, the buffer is recycled once the data has been used by the agent
         """
         if tag not in self._sensors_objects:
             raise ValueError("The sensor with tag [{}] has not been created!".format(tag))
 
-        self._new_data_buffers.put((tag, timestamp, data))
+        with self._data_condition:
+            if timestamp < self._first_valid_frame:
+                self.stale_data_count += 1
+                self._release(tag, buffer)
+                return
+
+            frame_data = self._frames_data.setdefault(timestamp, {})
+            if tag in frame_data:
+                logging.warning('Sensor [%s] sent its data of frame %d twice', tag, timestamp)
+                self.duplicated_data_count += 1
+                self._release(tag, frame_data[tag][2])
+
+            frame_data[tag] = (timestamp, data, buffer)
+            if len(frame_data) == len(self._sensors_objects):
+                self._data_condition.notify_all()
 
-    def get_data(self):
+    def _release(self, tag, buffer):
         """
-        Returns the data of a sensor
+        Gives a buffer back to the pool, if the data was stored in one
         """
-        try:
-            data_dict = {}
-            while len(data_dict.keys()) < len(self._sensors_objects.keys()):
+        if buffer is not None:
+            self._buffer_pool.release(tag, buffer)
 
-                sensor_data = self._new_data_buffers.get(True, self._queue_timeout)
-                data_dict[sensor_data[0]] = ((sensor_data[1], sensor_data[2]))
+    def recycle_buffers(self):
+        """
+        Gives the buffers of the data returned by the last get_data() back to the pool
+        """
+        for tag, buffer in self._delivered_buffers:
+            self._release(tag, buffer)
+        self._delivered_buffers = []
 
-        except Empty:
-            raise SensorReceivedNoData("A sensor took too long to send its data")
+    def get_data(self, frame=None):
+        """
+        Returns the data of all the sensors for a frame, by default the current frame of the simulation.
+        Waits until the last sensor sends its data, raising SensorReceivedNoData if it takes too long
+        """
+        if frame is None:
+            frame = GameTime.get_frame()
+
+        deadline = time.time() + self._data_timeout
+        with self._data_condition:
+            while len(self._frames_data.get(frame, ())) < len(self._sensors_objects):
+                remaining_time = deadline - time.time()
+                if remaining_time <= 0:
+                    raise SensorReceivedNoData("A sensor took too long to send its data")
+                self._data_condition.wait(remaining_time)
+
+            frame_data = self._frames_data.pop(frame, {})
+
+            # Drop the data of the previous frames, which will never be used
+            for old_frame in [old_frame for old_frame in self._frames_data if old_frame < frame]:
+                for tag, (_, _, buffer) in self._frames_data.pop(old_frame).items():
+                    self.stale_data_count += 1
+                    self._release(tag, buffer)
+            self._first_valid_frame = max(self._first_valid_frame, frame + 1)
+
+        data_dict = {}
+        for tag, (timestamp, data, buffer) in frame_data.items():
+            data_dict[tag] = ((timestamp, data))
+            if buffer is not None:
+                self._delivered_buffers.append((tag, buffer))
 
         return data_dict
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Support class of the MetricsManager to keep the parsed recorder logs on disk,
+so that running several metrics on the same log only parses it once
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import shutil
+
+from srunner.metrics.tools.metrics_log import MetricsLog
+
+
+class MetricsCache(object):
+
+    """
+    Directory with the parsed recorder logs, written by MetricsLog.save().
+
+    Each log has its own entry, named after its path, which is only used while the
+    size and modification time of the log are the same as when it was parsed.
+
+    Args:
+        cache_dir (str): directory of the cache, created if needed
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _get_entry(self, log_file):
+        """
+        Returns the directory of the cache entry of a log
+        """
+        log_path = os.path.abspath(log_file)
+        log_hash = hashlib.sha1(log_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "{}_{}".format(os.path.basename(log_path), log_hash))
+
+    @staticmethod
+    def _get_key(log_file):
+        """
+        Returns the values identifying the current version of a log
+        """
+        stat = os.stat(log_file)
+        return {
+            "log": os.path.abspath(log_file),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime
+        }
+
+    def is_valid(self, log_file):
+        """
+        Returns whether the cache has an up to date entry for the log
+        """
+        key_file = os.path.join(self._get_entry(log_file), "key.json")
+        if not os.path.isfile(key_file):
+            return False
+
+        with open(key_file, 'r', encoding='utf-8') as fd:
+            try:
+                key = json.load(fd)
+            except ValueError:
+                return False
+
+        return key == self._get_key(log_file)
+
+    def load(self, log_file):
+        """
+        Returns the MetricsLog of a log, with its arrays memory-mapped from the cache,
+        or None if the cache has no up to date entry for it
+        """
+        if not self.is_valid(log_file):
+            return None
+        return MetricsLog.load(self._get_entry(log_file))
+
+    def save(self, log_file, log):
+        """
+        Stores the MetricsLog of a log. The entry is written to a temporary directory
+        and then renamed, so that an interrupted run never leaves a broken entry behind
+        """
+        entry = self._get_entry(log_file)
+        temp_entry = "{}.tmp{}".format(entry, os.getpid())
+        if os.path.isdir(temp_entry):
+            shutil.rmtree(temp_entry)
+
+        log.save(temp_entry)
+        with open(os.path.join(temp_entry, "key.json"), 'w', encoding='utf-8') as fd:
+            json.dump(self._get_key(log_file), fd)
+
+        if os.path.isdir(entry):
+            shutil.rmtree(entry)
+        os.rename(temp_entry, entry)
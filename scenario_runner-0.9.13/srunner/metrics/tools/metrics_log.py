@@ -15,11 +15,202 @@ specific information
 """
 
 import fnmatch
-from srunner.metrics.tools.metrics_parser import MetricsParser
+import json
+import os
+
+import numpy as np
+
+import carla
+
+from srunner.metrics.tools.metrics_parser import MetricsParser, VEHICLE_LIGHTS, parse_physics_control
+
+
+def _to_transform(values):
+    """Builds a carla.Transform from its x, y, z, roll, pitch and yaw"""
+    x, y, z, roll, pitch, yaw = values.tolist()
+    return carla.Transform(carla.Location(x=x, y=y, z=z), carla.Rotation(roll=roll, pitch=pitch, yaw=yaw))
+
+
+def _to_vector(values):
+    """Builds a carla.Vector3D from its x, y and z"""
+    x, y, z = values.tolist()
+    return carla.Vector3D(x=x, y=y, z=z)
+
+
+def _to_control(values):
+    """Builds a carla.VehicleControl from its throttle, steer, brake, hand brake and gear"""
+    throttle, steer, brake, hand_brake, gear = values.tolist()
+    return carla.VehicleControl(
+        throttle=throttle,
+        steer=steer,
+        brake=brake,
+        hand_brake=bool(hand_brake),
+        reverse=gear < 0,
+        manual_gear_shift=False,
+        gear=int(gear),
+    )
+
+
+def _to_vehicle_lights(values):
+    """Builds the list of active carla.VehicleLightState from their bit mask"""
+    mask = int(values[0])
+    if mask == 0:
+        return [carla.VehicleLightState.NONE]
+    return [getattr(carla.VehicleLightState, name) for i, name in enumerate(VEHICLE_LIGHTS) if mask & (1 << i)]
+
+
+def _to_traffic_light_state(values):
+    """Builds the carla.TrafficLightState from its number"""
+    number_to_state = (
+        carla.TrafficLightState.Red,
+        carla.TrafficLightState.Yellow,
+        carla.TrafficLightState.Green,
+        carla.TrafficLightState.Off,
+        carla.TrafficLightState.Unknown,
+    )
+    return number_to_state[int(values[0])]
+
+
+# Actor states available to the queries: name -> (name of the StateTable, function building the state)
+ACTOR_STATES = {
+    "transform": ("transform", _to_transform),
+    "velocity": ("velocity", _to_vector),
+    "angular_velocity": ("angular_velocity", _to_vector),
+    "acceleration": ("acceleration", _to_vector),
+    "control": ("control", _to_control),
+    "speed": ("walker_speed", lambda values: float(values[0])),
+    "lights": ("vehicle_lights", _to_vehicle_lights),
+    "state": ("traffic_light", _to_traffic_light_state),
+    "frozen": ("traffic_light", lambda values: bool(values[1])),
+    "elapsed_time": ("traffic_light", lambda values: float(values[2])),
+}
+
+
+def _actor_to_json(actor_info):
+    """
+    Returns the information of an actor with its CARLA objects replaced by lists of numbers
+    """
+    actor_json = dict(actor_info)
+    location = actor_info["location"]
+    actor_json["location"] = [location.x, location.y, location.z]
+    for key in ("bounding_box", "trigger_volume"):
+        if key in actor_info:
+            bbox = actor_info[key]
+            actor_json[key] = [[bbox.location.x, bbox.location.y, bbox.location.z],
+                               [bbox.extent.x, bbox.extent.y, bbox.extent.z]]
+    return actor_json
+
+
+def _actor_from_json(actor_json):
+    """
+    Inverse of _actor_to_json, recreating the CARLA objects of the information of an actor
+    """
+    actor_info = dict(actor_json)
+    actor_info["location"] = carla.Location(*actor_json["location"])
+    for key in ("bounding_box", "trigger_volume"):
+        if key in actor_json:
+            location, extent = actor_json[key]
+            actor_info[key] = carla.BoundingBox(carla.Location(*location), carla.Vector3D(*extent))
+    return actor_info
+
+
+def _index_events(events):
+    """
+    Groups the rows of an event array, whose two first columns are the frame index and the id,
+    by id. Returns a dictionary id -> (array with the frame indices, array with the rows)
+    """
+    index = {}
+    if len(events) == 0:
+        return index
+
+    order = np.lexsort((events[:, 0], events[:, 1]))
+    events = events[order]
+    ids, starts = np.unique(events[:, 1], return_index=True)
+    for event_id, rows in zip(ids.tolist(), np.split(events, starts[1:])):
+        index[int(event_id)] = (rows[:, 0].astype(np.int64), rows)
+    return index
+
+
+def _get_last_event(index, event_id, frame_index):
+    """
+    Returns the last event row of an id at or before the given frame index, or None if there is none
+    """
+    if event_id not in index:
+        return None
+
+    frame_indices, rows = index[event_id]
+    i = np.searchsorted(frame_indices, frame_index, side='right') - 1
+    if i < 0:
+        return None
+    return rows[i]
+
+
+class StateSeries(object):
+    """
+    Read-only list with the states of an actor during a frame interval, backed by NumPy arrays.
+
+    Creating or slicing it doesn't copy any data, as the CARLA objects are only built when
+    its elements are accessed. Elements are None at the frames the actor didn't have the state.
+
+    Attributes:
+        values (np.ndarray): (frames, fields) array with the values of the state
+        valid (np.ndarray): (frames,) boolean array, True at the frames the actor had the state
+    """
+
+    def __init__(self, values, valid, to_state):
+        self.values = values
+        self.valid = valid
+        self._to_state = to_state
+
+    def __len__(self):
+        return len(self.valid)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return StateSeries(self.values[index], self.valid[index], self._to_state)
+
+        if not self.valid[index]:
+            return None
+        return self._to_state(self.values[index])
+
+    def __iter__(self):
+        for values, valid in zip(self.values, self.valid):
+            yield self._to_state(values) if valid else None
+
+
+class ActorStates(object):
+    """
+    One kind of state of all the actors, stored as a contiguous time series per actor.
+
+    Attributes:
+        columns (dict): actor id -> index of the actor in the arrays
+        values (np.ndarray): (actors, frames, fields) array with the values of the state
+        valid (np.ndarray): (actors, frames) boolean array, True where the actor had the state
+    """
+
+    def __init__(self, columns, values, valid):
+        self.columns = columns
+        self.values = values
+        self.valid = valid
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Creates the time series from a (frames x actors x fields) StateTable of the MetricsParser
+        """
+        return cls(table.columns,
+                   np.ascontiguousarray(table.values.swapaxes(0, 1)),
+                   np.ascontiguousarray(table.valid.T))
+
 
 class MetricsLog(object):  # pylint: disable=too-many-public-methods
     """
     Utility class to query the log.
+
+    The states of the actors are kept as one NumPy time series per actor, and are only
+    turned into CARLA objects when queried. The frame numbers are mapped to the rows of
+    those series, and the frames each actor was alive are kept in a table, so that most
+    queries don't depend on the length of the simulation.
     """
 
     def __init__(self, recorder):
@@ -28,7 +219,125 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         """
         # Parse the information
         parser = MetricsParser(recorder)
-        self._simulation, self._actors, self._frames = parser.parse_recorder_info()
+        simulation, actors, frames = parser.parse_recorder_info()
+
+        states = dict((name, ActorStates.from_table(table)) for name, table in frames["states"].items())
+        self._set_data(simulation, actors, frames["frame"], states, frames["events"])
+
+    def _set_data(self, simulation, actors, times, states, events):
+        """
+        Stores the information of the log and creates the indices used by the queries
+        """
+        self._simulation = simulation
+        self._actors = actors
+        self._times = times
+        self._states = states
+        self._events = events
+
+        # Frame number -> row of the time series, -1 for the frames missing from the recorder
+        frame_numbers = self._times["number"]
+        self._frame_rows = np.full(frame_numbers.max() + 1 if len(frame_numbers) else 0, -1, dtype=np.int64)
+        self._frame_rows[frame_numbers] = np.arange(len(frame_numbers))
+
+        # First and last frame each actor was alive
+        self._alive_ids = np.array(sorted(self._actors), dtype=np.int64)
+        self._alive_frames = np.zeros((len(self._alive_ids), 2), dtype=np.int64)
+        for i, actor_id in enumerate(self._alive_ids.tolist()):
+            actor_info = self._actors[actor_id]
+            self._alive_frames[i, 0] = actor_info["created"]
+            if "destroyed" in actor_info:
+                self._alive_frames[i, 1] = actor_info["destroyed"] - 1
+            else:
+                self._alive_frames[i, 1] = self.get_total_frame_count()
+        self._alive_index = dict((actor_id, i) for i, actor_id in enumerate(self._alive_ids.tolist()))
+
+        # Actor id -> {frame index: ids of the actors it collided with}
+        self._collisions = {}
+        for frame_index, actor_id, other_id in events["collisions"].tolist():
+            self._collisions.setdefault(actor_id, {}).setdefault(frame_index, []).append(other_id)
+
+        self._scene_lights = _index_events(events["scene_lights"])
+        self._state_times = _index_events(events["traffic_light_state_time"])
+
+        # The physics controls are only parsed the first time they are queried
+        self._physics_controls = {}
+        self._parsed_physics_controls = {}
+        for frame_index, actor_id, rows in events["physics_control"]:
+            frame_indices, controls = self._physics_controls.setdefault(actor_id, ([], []))
+            frame_indices.append(frame_index)
+            controls.append(rows)
+
+    def save(self, directory):
+        """
+        Writes the parsed log to a directory, with one .npy file per array, so that
+        it can be loaded again with MetricsLog.load() without parsing the recorder.
+
+        Args:
+            directory (str): path of the directory, which is created if needed
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        def save_array(name, array):
+            np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(array))
+
+        for name, array in self._times.items():
+            save_array("frame_" + name, array)
+
+        for name, states in self._states.items():
+            actor_ids = np.zeros(len(states.columns), dtype=np.int64)
+            for actor_id, column in states.columns.items():
+                actor_ids[column] = actor_id
+            save_array(name + "_actor_ids", actor_ids)
+            save_array(name + "_values", states.values)
+            save_array(name + "_valid", states.valid)
+
+        for name in ("collisions", "scene_lights", "traffic_light_state_time"):
+            save_array(name, self._events[name])
+
+        info = {
+            "simulation": self._simulation,
+            "actors": [[actor_id, _actor_to_json(actor_info)] for actor_id, actor_info in self._actors.items()],
+            "frame": sorted(self._times),
+            "states": sorted(self._states),
+            "physics_control": self._events["physics_control"]
+        }
+        with open(os.path.join(directory, "log.json"), 'w', encoding='utf-8') as fd:
+            json.dump(info, fd)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Creates a MetricsLog from a directory written by MetricsLog.save().
+        The arrays are memory-mapped instead of read, so only the parts used by the metric are loaded.
+
+        Args:
+            directory (str): path of the directory
+        """
+        with open(os.path.join(directory, "log.json"), 'r', encoding='utf-8') as fd:
+            info = json.load(fd)
+
+        def load_array(name):
+            return np.load(os.path.join(directory, name + ".npy"), mmap_mode='r')
+
+        times = dict((name, load_array("frame_" + name)) for name in info["frame"])
+
+        states = {}
+        for name in info["states"]:
+            actor_ids = load_array(name + "_actor_ids").tolist()
+            states[name] = ActorStates(dict((actor_id, i) for i, actor_id in enumerate(actor_ids)),
+                                       load_array(name + "_values"),
+                                       load_array(name + "_valid"))
+
+        events = dict((name, np.asarray(load_array(name)))
+                      for name in ("collisions", "scene_lights", "traffic_light_state_time"))
+        events["physics_control"] = [tuple(event) for event in info["physics_control"]]
+
+        actors = dict((actor_id, _actor_from_json(actor_info)) for actor_id, actor_info in info["actors"])
+
+        log = cls.__new__(cls)
+        log._set_data(info["simulation"], actors, times, states, events)  # pylint: disable=protected-access
+        return log
 
     ### Functions used to get general info of the simulation ###
     def get_actor_collisions(self, actor_id):
@@ -39,15 +348,15 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         Args:
             actor_id (int): ID of the actor.
         """
-        actor_collisions = {}
-
-        for i, frame in enumerate(self._frames):
-            collisions = frame["events"]["collisions"]
+        actor_collisions = self._collisions.get(actor_id, {})
+        return dict((frame_index, list(other_ids)) for frame_index, other_ids in actor_collisions.items())
 
-            if actor_id in collisions:
-                actor_collisions.update({i: collisions[actor_id]})
+    def get_map_name(self):
+        """
+        Returns the name of the map the simulation took place in.
+        """
 
-        return actor_collisions
+        return self._simulation["map"]
 
     def get_total_frame_count(self):
         """
@@ -61,21 +370,22 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         Returns a float with the elapsed time of a specific frame.
         """
 
-        return self._frames[frame]["frame"]["elapsed_time"]
+        return float(self._times["elapsed_time"][frame])
 
     def get_delta_time(self, frame):
         """
         Returns a float with the delta time of a specific frame.
         """
 
-        return self._frames[frame]["frame"]["delta_time"]
+        return float(self._times["delta_time"][frame])
 
     def get_platform_time(self, frame):
         """
         Returns a float with the platform time time of a specific frame.
         """
 
-        return self._frames[frame]["frame"]["platform_time"]
+        platform_time = float(self._times["platform_time"][frame])
+        return None if np.isnan(platform_time) else platform_time
 
     ### Functions used to get info about the actors ###
     def get_ego_vehicle_id(self):
@@ -167,20 +477,22 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
             actor_id (int): Id of the actor
         """
 
-        if actor_id in self._actors:
-
-            actor_info = self._actors[actor_id]
-            first_frame = actor_info["created"]
-            if "destroyed" in actor_info:
-                last_frame = actor_info["destroyed"] - 1
-            else:
-                last_frame = self.get_total_frame_count()
-
+        if actor_id in self._alive_index:
+            first_frame, last_frame = self._alive_frames[self._alive_index[actor_id]].tolist()
             return first_frame, last_frame
 
         return None, None
 
     ### Functions used to get the actor states ###
+    def _get_row(self, frame):
+        """
+        Returns the row of the time series corresponding to a frame number,
+        or None if the frame isn't part of the recorder
+        """
+        if 0 <= frame < len(self._frame_rows) and self._frame_rows[frame] >= 0:
+            return int(self._frame_rows[frame])
+        return None
+
     def _get_actor_state(self, actor_id, state, frame):
         """
         Given an actor id, returns the specific variable of that actor at a given frame.
@@ -191,24 +503,21 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
             frame: (int): frame number of the simulation.
             attribute (str): name of the actor's attribute to be returned.
         """
-        frame_state = self._frames[frame - 1]["actors"]
-
-        # Check if the actor exists
-        if actor_id in frame_state:
+        table_name, to_state = ACTOR_STATES[state]
+        states = self._states[table_name]
 
-            # Check if the state exists
-            if state not in frame_state[actor_id]:
-                return None
-
-            state_info = frame_state[actor_id][state]
-            return state_info
+        column = states.columns.get(actor_id)
+        row = self._get_row(frame)
+        if column is None or row is None or not states.valid[column, row]:
+            return None
 
-        return None
+        return to_state(states.values[column, row])
 
     def _get_all_actor_states(self, actor_id, state, first_frame=None, last_frame=None):
         """
-        Given an actor id, returns a list of the specific variable of that actor during
-        a frame interval. Some elements might be None.
+        Given an actor id, returns a StateSeries (a list-like view of the time series of the actor)
+        of the specific variable of that actor during a frame interval. Some elements might be None.
+        The interval is limited to the frames that are part of the recorder.
 
         By default, first_frame and last_frame are the start and end of the simulation, respectively.
 
@@ -223,13 +532,26 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         if last_frame is None:
             last_frame = self.get_total_frame_count()
 
-        state_list = []
+        # Rows of the interval. The recorder frames are consecutive, so they are a slice
+        frame_numbers = self._times["number"]
+        rows = slice(0, 0)
+        if len(frame_numbers):
+            first_frame = max(first_frame, int(frame_numbers[0]))
+            last_frame = min(last_frame, int(frame_numbers[-1]))
+            if first_frame <= last_frame:
+                rows = slice(int(self._frame_rows[first_frame]), int(self._frame_rows[last_frame]) + 1)
 
-        for frame_number in range(first_frame, last_frame + 1):
-            state_info = self._get_actor_state(actor_id, state, frame_number)
-            state_list.append(state_info)
+        table_name, to_state = ACTOR_STATES[state]
+        states = self._states[table_name]
 
-        return state_list
+        column = states.columns.get(actor_id)
+        if column is None:
+            frames = rows.stop - rows.start
+            fields = states.values.shape[2]
+            return StateSeries(np.zeros((frames, fields), dtype=states.values.dtype),
+                               np.zeros(frames, dtype=bool), to_state)
+
+        return StateSeries(states.values[column, rows], states.valid[column, rows], to_state)
 
     def _get_states_at_frame(self, frame, state, actor_list=None):
         """
@@ -239,16 +561,23 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         By default, all actors will be considered.
         """
         states = {}
-        actor_info = self._frames[frame]["actors"]
+        row = self._get_row(frame)
+        if row is None:
+            return states
+
+        table_name, to_state = ACTOR_STATES[state]
+        actor_states = self._states[table_name]
+
+        # Only check the actors alive at that frame
+        alive = (self._alive_frames[:, 0] <= frame) & (frame <= self._alive_frames[:, 1])
+        actor_ids = self._alive_ids[alive]
+        if actor_list:
+            actor_ids = actor_ids[np.isin(actor_ids, actor_list)]
 
-        for actor_id in actor_info:
-            if not actor_list:
-                _state = self._get_actor_state(actor_id, state, frame)
-                if _state:
-                    states.update({actor_id: _state})
-            elif actor_id in actor_list:
-                _state = self._get_actor_state(actor_id, state, frame)
-                states.update({actor_id: _state})
+        for actor_id in actor_ids.tolist():
+            column = actor_states.columns.get(actor_id)
+            if column is not None and actor_states.valid[column, row]:
+                states.update({actor_id: to_state(actor_states.values[column, row])})
 
         return states
 
@@ -261,7 +590,7 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
 
     def get_all_actor_transforms(self, actor_id, first_frame=None, last_frame=None):
         """
-        Returns a list with all the transforms of the actor at the frame interval.
+        Returns a StateSeries (list-like) with all the transforms of the actor at the frame interval.
         """
         return self._get_all_actor_states(actor_id, "transform", first_frame, last_frame)
 
@@ -281,7 +610,7 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
 
     def get_all_actor_velocities(self, actor_id, first_frame=None, last_frame=None):
         """
-        Returns a list with all the velocities of the actor at the frame interval.
+        Returns a StateSeries (list-like) with all the velocities of the actor at the frame interval.
         """
         return self._get_all_actor_states(actor_id, "velocity", first_frame, last_frame)
 
@@ -301,7 +630,7 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
 
     def get_all_actor_angular_velocities(self, actor_id, first_frame=None, last_frame=None):
         """
-        Returns a list with all the angular velocities of the actor at the frame interval.
+        Returns a StateSeries (list-like) with all the angular velocities of the actor at the frame interval.
         """
         return self._get_all_actor_states(actor_id, "angular_velocity", first_frame, last_frame)
 
@@ -321,7 +650,7 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
 
     def get_all_actor_accelerations(self, actor_id, first_frame=None, last_frame=None):
         """
-        Returns a list with all the accelerations of the actor at the frame interval.
+        Returns a StateSeries (list-like) with all the accelerations of the actor at the frame interval.
         """
         return self._get_all_actor_states(actor_id, "acceleration", first_frame, last_frame)
 
@@ -345,13 +674,17 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         Returns None if the id can't be found.
         """
 
-        for i in range(frame - 1, -1, -1):  # Go backwards from the frame until 0
-            physics_info = self._frames[i]["events"]["physics_control"]
+        if vehicle_id not in self._physics_controls:
+            return None
 
-            if vehicle_id in physics_info:
-                return physics_info[vehicle_id]
+        frame_indices, controls = self._physics_controls[vehicle_id]
+        i = int(np.searchsorted(frame_indices, frame - 1, side='right')) - 1
+        if i < 0:
+            return None
 
-        return None
+        if (vehicle_id, i) not in self._parsed_physics_controls:
+            self._parsed_physics_controls[(vehicle_id, i)] = parse_physics_control(controls[i])
+        return self._parsed_physics_controls[(vehicle_id, i)]
 
     def get_walker_speed(self, walker_id, frame):
         """
@@ -384,15 +717,19 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         Returns None if the id can't be found.
         """
 
-        for i in range(frame - 1, -1, -1):  # Go backwards from the frame until 0
-            state_times_info = self._frames[i]["events"]["traffic_light_state_time"]
+        state_columns = {
+            carla.TrafficLightState.Green: 2,
+            carla.TrafficLightState.Yellow: 3,
+            carla.TrafficLightState.Red: 4,
+        }
+        if state not in state_columns:
+            return None
 
-            if traffic_light_id in state_times_info:
-                states = state_times_info[traffic_light_id]
-                if state in states:
-                    return state_times_info[traffic_light_id][state]
+        state_times = _get_last_event(self._state_times, traffic_light_id, frame - 1)
+        if state_times is None:
+            return None
 
-        return None
+        return float(state_times[state_columns[state]])
 
     # Vehicle lights
     def get_vehicle_lights(self, vehicle_id, frame):
@@ -419,10 +756,14 @@ class MetricsLog(object):  # pylint: disable=too-many-public-methods
         Returns None if the id can't be found.
         """
 
-        for i in range(frame - 1, -1, -1):  # Go backwards from the frame until 0
-            scene_lights_info = self._frames[i]["events"]["scene_lights"]
-
-            if light_id in scene_lights_info:
-                return scene_lights_info[light_id]
+        scene_light = _get_last_event(self._scene_lights, light_id, frame - 1)
+        if scene_light is None:
+            return None
 
-        return None
+        _, _, active, intensity, red, green, blue = scene_light.tolist()
+        return carla.LightState(
+            intensity=int(intensity),
+            color=carla.Color(int(red * 255), int(green * 255), int(blue * 255)),
+            group=carla.LightGroup.NONE,
+            active=bool(active)
+        )
@@ -8,9 +8,14 @@
 
 """
 Support class of the MetricsManager to parse the information of
-the CARLA recorder into a readable dictionary
+the CARLA recorder into readable information.
+
+The states of the actors are stored as frames x actors x fields NumPy arrays,
+while the rest of the information is kept in dictionaries
 """
 
+import numpy as np
+
 import carla
 
 
@@ -200,341 +205,455 @@ def parse_wheels_control(info):
     )
     return wheels_control
 
-
-class MetricsParser(object):
+def parse_physics_control(rows):
     """
-    Class used to parse the CARLA recorder into readable information
+    Parses the rows of a 'Physics Control' entry of the recorder into a carla.VehiclePhysicsControl.
+    The first row is the one with the actor id, and the rest are its (indented) attributes.
     """
+    physics_control = carla.VehiclePhysicsControl()
+
+    forward_gears = []
+    wheels = []
+    for row in rows[1:]:
+
+        if row.startswith('    '):
+            elements = row[4:].split(" ")
+            if elements[0] == "gear":
+                forward_gears.append(parse_gears_control(elements))
+            elif elements[0] == "wheel":
+                wheels.append(parse_wheels_control(elements))
+
+        else:
+            elements = row[3:].split(" = ")
+            name = elements[0]
+
+            if name == "center_of_mass":
+                values = elements[1].split(" ")
+                value = carla.Vector3D(
+                    float(values[0][1:-1]),
+                    float(values[1][:-1]),
+                    float(values[2][:-1]),
+                )
+                setattr(physics_control, name, value)
+            elif name == "torque_curve" or name == "steering_curve":
+                values = elements[1].split(" ")
+                value = parse_vector_list(values)
+                setattr(physics_control, name, value)
+
+            elif name == "use_gear_auto_box":
+                name = "use_gear_autobox"
+                value = True if elements[1] == "true" else False
+                setattr(physics_control, name, value)
+
+            elif "forward_gears" in name or "wheels" in name:
+                pass
+
+            else:
+                name = name.lower()
+                value = float(elements[1])
+                setattr(physics_control, name, value)
+
+    setattr(physics_control, "forward_gears", forward_gears)
+    setattr(physics_control, "wheels", wheels)
+    return physics_control
+
+
+# Names of the vehicle lights, in the order of their bit in the carla.VehicleLightState flags
+VEHICLE_LIGHTS = ("Position", "LowBeam", "HighBeam", "Brake", "RightBlinker", "LeftBlinker",
+                  "Reverse", "Fog", "Interior", "Special1", "Special2")
+VEHICLE_LIGHT_BITS = dict((name, 1 << i) for i, name in enumerate(VEHICLE_LIGHTS))
+VEHICLE_LIGHT_BITS["None"] = 0
+
+# Fields of the actor states, stored as one StateTable each
+STATE_FIELDS = {
+    "transform": ("x", "y", "z", "roll", "pitch", "yaw"),
+    "velocity": ("x", "y", "z"),
+    "angular_velocity": ("x", "y", "z"),
+    "acceleration": ("x", "y", "z"),
+    "control": ("throttle", "steer", "brake", "hand_brake", "gear"),
+    "walker_speed": ("speed",),
+    "vehicle_lights": ("lights",),
+    "traffic_light": ("state", "frozen", "elapsed_time"),
+}
+
+# Sections of a frame whose rows are parsed, in the order they appear in the recorder
+SECTIONS = ("Positions", "State traffic lights", "Vehicle animations", "Walker animations",
+            "Vehicle light animations", "Scene light changes", "Dynamic actors", "Actor bounding boxes",
+            "Actor trigger volumes", "Physics Control", "Traffic Light time events")
+
+
+def _to_float(element):
+    """Parses an element such as '(1.5,' or '2.0)' into a float"""
+    return float(element.strip("(),"))
+
+
+def _iterate_lines(text):
+    """Yields the lines of a string one by one, without splitting it all at once"""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+class StateTable(object):
+    """
+    Values of one kind of actor state (transform, velocity...) during the simulation,
+    stored as a frames x actors x fields array.
 
-    def __init__(self, recorder_info):
+    The MetricsParser fills it frame by frame, growing the arrays as new frames and actors appear.
 
-        self.recorder_info = recorder_info
-        self.frame_list = None
-        self.frame_row = None
-        self.i = 0
+    Attributes:
+        fields (tuple): names of the fields of the state
+        columns (dict): actor id -> column of the actor in the arrays
+        values (np.ndarray): (frames, actors, fields) array with the values of the state
+        valid (np.ndarray): (frames, actors) boolean array, True where the actor had the state
+    """
+
+    def __init__(self, fields, dtype=np.float32):
+        self.fields = tuple(fields)
+        self.columns = {}
+        self.values = np.zeros((64, 8, len(self.fields)), dtype=dtype)
+        self.valid = np.zeros((64, 8), dtype=bool)
 
-    def get_row_elements(self, indent_num, split_string):
+        self._frame_columns = []
+        self._frame_values = []
+
+    @classmethod
+    def from_arrays(cls, fields, actor_ids, values, valid):
         """
-        returns a list with the elements of the row
+        Creates a table from already filled arrays, the columns belonging to the given actor ids
         """
-        return self.frame_row[indent_num:].split(split_string)
-
-    def next_row(self):
+        table = cls(fields, values.dtype)
+        table.columns = dict((int(actor_id), i) for i, actor_id in enumerate(actor_ids))
+        table.values = values
+        table.valid = valid
+        return table
+
+    @property
+    def actor_ids(self):
         """
-        Gets the next row of the recorder
+        Array with the actor id of each column
         """
-        self.i += 1
-        self.frame_row = self.frame_list[self.i]
+        actor_ids = np.zeros(len(self.columns), dtype=np.int64)
+        for actor_id, column in self.columns.items():
+            actor_ids[column] = actor_id
+        return actor_ids
 
-    def parse_recorder_info(self):
+    def add(self, actor_id, values):
         """
-        Parses the recorder into readable information.
-
-        Args:
-            recorder_info (str): string given by the recorder
+        Adds the state of an actor at the frame being parsed
         """
+        column = self.columns.get(actor_id)
+        if column is None:
+            column = len(self.columns)
+            self.columns[actor_id] = column
 
-        # Divide it into frames
-        recorder_list = self.recorder_info.split("Frame")
-
-        # Get general information
-        header = recorder_list[0].split("\n")
-        sim_map = header[1][5:]
-        sim_date = header[2][6:]
-
-        annex = recorder_list[-1].split("\n")
-        sim_frames = int(annex[0][3:])
-        sim_duration = float(annex[1][10:-8])
-
-        recorder_list = recorder_list[1:-1]
-
-        simulation_info = {
-            "map": sim_map,
-            "date:": sim_date,
-            "total_frames": sim_frames,
-            "duration": sim_duration
-        }
-
-        actors_info = {}
-        frames_info = []
-
-        for frame in recorder_list:
-
-            # Divide the frame in lines
-            self.frame_list = frame.split("\n")
-
-            # Get the general frame information
-            frame_info = self.frame_list[0].split(" ")
-            frame_number = int(frame_info[1])
-            frame_time = float(frame_info[3])
-
-            try:
-                prev_frame = frames_info[frame_number - 2]
-                prev_time = prev_frame["frame"]["elapsed_time"]
-                delta_time = round(frame_time - prev_time, 6)
-            except IndexError:
-                delta_time = 0
-
-            # Variable to store all the information about the frame
-            frame_state = {
-                "frame": {
-                    "elapsed_time": frame_time,
-                    "delta_time": delta_time,
-                    "platform_time": None
-                },
-                "actors": {},
-                "events":{
-                    "scene_lights": {},
-                    "physics_control": {},
-                    "traffic_light_state_time": {},
-                    "collisions": {}
-                }
-            }
-
-            # Loop through all the other rows.
-            self.i = 0
-            self.next_row()
-
-            while self.frame_row.startswith(' Create') or self.frame_row.startswith('  '):
-
-                if self.frame_row.startswith(' Create'):
-                    elements = self.get_row_elements(1, " ")
-                    actor_id = int(elements[1][:-1])
-
-                    actor = parse_actor(elements)
-                    actors_info.update({actor_id: actor})
-                    actors_info[actor_id].update({"created": frame_number})
-                else:
-                    elements = self.get_row_elements(2, " = ")
-                    actors_info[actor_id].update({elements[0]: elements[1]})
-
-                self.next_row()
-
-            while self.frame_row.startswith(' Destroy'):
-
-                elements = self.get_row_elements(1, " ")
-
-                actor_id = int(elements[1])
-                actors_info[actor_id].update({"destroyed": frame_number})
-
-                self.next_row()
-
-            while self.frame_row.startswith(' Collision'):
-
-                elements = self.get_row_elements(1, " ")
-
-                actor_id = int(elements[4])
-                other_id = int(elements[-1])
-
-                if actor_id not in frame_state["events"]["collisions"]:
-                    frame_state["events"]["collisions"][actor_id] = [other_id]
-                else:
-                    collisions = frame_state["events"]["collisions"][actor_id]
-                    collisions.append(other_id)
-                    frame_state["events"]["collisions"].update({actor_id: collisions})
-
-                self.next_row()
-
-            while self.frame_row.startswith(' Parenting'):
-
-                elements = self.get_row_elements(1, " ")
-
-                actor_id = int(elements[1])
-                parent_id = int(elements[3])
-                actors_info[actor_id].update({"parent": parent_id})
-
-                self.next_row()
-
-            if self.frame_row.startswith(' Positions'):
-                self.next_row()
-
-                while self.frame_row.startswith('  '):
-
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
-
-                    transform = parse_transform(elements)
-                    frame_state["actors"].update({actor_id: {"transform": transform}})
-
-                    self.next_row()
-
-            if self.frame_row.startswith(' State traffic lights'):
-                self.next_row()
+        self._frame_columns.append(column)
+        self._frame_values.append(values)
 
-                while self.frame_row.startswith('  '):
-
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
-
-                    traffic_light = parse_traffic_light(elements)
-                    frame_state["actors"].update({actor_id: traffic_light})
-                    self.next_row()
+    def end_frame(self, frame_index):
+        """
+        Writes the states added since the last call into the row of the given frame
+        """
+        if not self._frame_columns:
+            return
 
-            if self.frame_row.startswith(' Vehicle animations'):
-                self.next_row()
+        frames, actors = self.valid.shape
+        if frame_index >= frames or len(self.columns) > actors:
+            while frame_index >= frames:
+                frames *= 2
+            while len(self.columns) > actors:
+                actors *= 2
+            self._resize(frames, actors)
 
-                while self.frame_row.startswith('  '):
+        self.values[frame_index, self._frame_columns] = self._frame_values
+        self.valid[frame_index, self._frame_columns] = True
 
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
+        self._frame_columns = []
+        self._frame_values = []
 
-                    control = parse_control(elements)
-                    frame_state["actors"][actor_id].update({"control": control})
-                    self.next_row()
+    def finish(self, frames):
+        """
+        Trims the arrays to the number of parsed frames and actors
+        """
+        self._resize(frames, len(self.columns))
 
-            if self.frame_row.startswith(' Walker animations'):
-                self.next_row()
+    def _resize(self, frames, actors):
+        """
+        Reallocates the arrays with a new number of frames and actors, keeping their content
+        """
+        values = np.zeros((frames, actors, len(self.fields)), dtype=self.values.dtype)
+        valid = np.zeros((frames, actors), dtype=bool)
 
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
+        old_frames = min(frames, self.valid.shape[0])
+        old_actors = min(actors, self.valid.shape[1])
+        values[:old_frames, :old_actors] = self.values[:old_frames, :old_actors]
+        valid[:old_frames, :old_actors] = self.valid[:old_frames, :old_actors]
 
-                    frame_state["actors"][actor_id].update({"speed": elements[3]})
-                    self.next_row()
+        self.values = values
+        self.valid = valid
 
-            if self.frame_row.startswith(' Vehicle light animations'):
-                self.next_row()
+    def get(self, actor_id, frame_index):
+        """
+        Returns the array with the state of the actor at a frame, or None if it didn't have it
+        """
+        column = self.columns.get(actor_id)
+        if column is None or not self.valid[frame_index, column]:
+            return None
+        return self.values[frame_index, column]
 
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
 
-                    lights = parse_vehicle_lights(elements)
-                    frame_state["actors"][actor_id].update({"lights": lights})
-                    self.next_row()
+class MetricsParser(object):
+    """
+    Class used to parse the CARLA recorder into readable information.
 
-            if self.frame_row.startswith(' Scene light changes'):
-                self.next_row()
+    The recorder is read line by line, either from the string given by the
+    client or from any iterable of lines, such as an open file.
+    """
 
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
+    def __init__(self, recorder_info):
 
-                    scene_light = parse_scene_lights(elements)
-                    frame_state["events"]["scene_lights"].update({actor_id: scene_light})
-                    self.next_row()
+        self.recorder_info = recorder_info
 
-            if self.frame_row.startswith(' Dynamic actors'):
-                self.next_row()
+    def _get_lines(self):
+        """
+        Returns an iterator over the lines of the recorder
+        """
+        if isinstance(self.recorder_info, str):
+            return _iterate_lines(self.recorder_info)
+        return (line.rstrip("\n") for line in self.recorder_info)
 
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
+    def parse_recorder_info(self):
+        """
+        Parses the recorder into readable information.
 
-                    velocity = parse_velocity(elements)
-                    frame_state["actors"][actor_id].update({"velocity": velocity})
+        Returns:
+            simulation_info (dict): map, date, total frames and duration of the simulation
+            actors_info (dict): actor id -> dictionary with the information of the actor
+            frames_info (dict): with the keys
+                'frame': arrays with the number, elapsed, delta and platform time of each frame
+                'states': StateTable of each of the STATE_FIELDS
+                'events': collisions, scene lights and traffic light state times (as arrays),
+                    and the rows of the physics control changes
+        """
+        simulation_info = {
+            "map": None,
+            "date:": None,
+            "total_frames": 0,
+            "duration": 0.0
+        }
+        actors_info = {}
 
-                    angular_v = parse_angular_velocity(elements)
-                    frame_state["actors"][actor_id].update({"angular_velocity": angular_v})
+        # The values that end up in CARLA objects are stored as float32, like in CARLA,
+        # while the ones returned as they are keep their full precision
+        states = dict((name, StateTable(fields)) for name, fields in STATE_FIELDS.items())
+        states["walker_speed"] = StateTable(STATE_FIELDS["walker_speed"], dtype=np.float64)
+        states["traffic_light"] = StateTable(STATE_FIELDS["traffic_light"], dtype=np.float64)
+        states["vehicle_lights"] = StateTable(STATE_FIELDS["vehicle_lights"], dtype=np.int32)
+
+        frame_numbers = []
+        elapsed_times = []
+        platform_times = []
+        collisions = []
+        scene_lights = []
+        state_times = []
+        physics_controls = []
+
+        transforms = states["transform"]
+        velocities = states["velocity"]
+        angular_velocities = states["angular_velocity"]
+        controls = states["control"]
+        walker_speeds = states["walker_speed"]
+        vehicle_lights = states["vehicle_lights"]
+        traffic_lights = states["traffic_light"]
+
+        frame_index = -1
+        frame_number = 0
+        section = None
+        actor_id = None
+
+        for row in self._get_lines():
+
+            # Rows of the current section
+            if row.startswith('  '):
+                if section == 'Positions':
+                    elements = row[2:].split(" ")
+                    transforms.add(int(elements[1]), (
+                        _to_float(elements[3]) / 100, _to_float(elements[4]) / 100, _to_float(elements[5]) / 100,
+                        _to_float(elements[7]), _to_float(elements[8]), _to_float(elements[9])))
+
+                elif section == 'Dynamic actors':
+                    elements = row[2:].split(" ")
+                    velocities.add(int(elements[1]), (
+                        _to_float(elements[3]), _to_float(elements[4]), _to_float(elements[5])))
+                    angular_velocities.add(int(elements[1]), (
+                        _to_float(elements[7]), _to_float(elements[8]), _to_float(elements[9])))
+
+                elif section == 'State traffic lights':
+                    elements = row[2:].split(" ")
+                    traffic_lights.add(int(elements[1]), (
+                        float(elements[3]), float(elements[5]), float(elements[7])))
+
+                elif section == 'Vehicle animations':
+                    elements = row[2:].split(" ")
+                    controls.add(int(elements[1]), (
+                        float(elements[5]), float(elements[3]), float(elements[7]),
+                        float(elements[9]), float(elements[11])))
+
+                elif section == 'Walker animations':
+                    elements = row[2:].split(" ")
+                    walker_speeds.add(int(elements[1]), (float(elements[3]),))
+
+                elif section == 'Vehicle light animations':
+                    elements = row[2:].split(" ")
+                    lights = 0
+                    for light in elements[2:]:
+                        lights |= VEHICLE_LIGHT_BITS[light]
+                    vehicle_lights.add(int(elements[1]), (lights,))
+
+                elif section == 'Create':
+                    elements = row[2:].split(" = ")
+                    actors_info[actor_id].update({elements[0]: elements[1]})
 
-                    if delta_time == 0:
-                        acceleration = carla.Vector3D(0, 0, 0)
+                elif section == 'Physics Control':
+                    if row.startswith('   '):
+                        physics_controls[-1][2].append(row)
                     else:
-                        prev_velocity = frame_state["actors"][actor_id]["velocity"]
-                        acceleration = (velocity - prev_velocity) / delta_time
-
-                    frame_state["actors"][actor_id].update({"acceleration": acceleration})
-                    self.next_row()
-
-            if self.frame_row.startswith(' Actor bounding boxes'):
-                self.next_row()
-
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
-
-                    bbox = parse_bounding_box(elements)
-                    actors_info[actor_id].update({"bounding_box": bbox})
-                    self.next_row()
-
-            if self.frame_row.startswith(' Actor trigger volumes'):
-                self.next_row()
-
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
-
-                    trigvol = parse_bounding_box(elements)
-                    actors_info[actor_id].update({"trigger_volume": trigvol})
-                    self.next_row()
-
-            if self.frame_row.startswith(' Current platform time'):
-
-                elements = self.get_row_elements(1, " ")
-
-                platform_time = float(elements[-1])
-                frame_state["frame"]["platform_time"] = platform_time
-                self.next_row()
-
-            if self.frame_row.startswith(' Physics Control'):
-                self.next_row()
-
-                actor_id = None
-                while self.frame_row.startswith('  '):
-
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
-                    physics_control = carla.VehiclePhysicsControl()
-                    self.next_row()
-
-                    forward_gears = []
-                    wheels = []
-                    while self.frame_row.startswith('   '):
-
-                        if self.frame_row.startswith('    '):
-                            elements = self.get_row_elements(4, " ")
-                            if elements[0] == "gear":
-                                forward_gears.append(parse_gears_control(elements))
-                            elif elements[0] == "wheel":
-                                wheels.append(parse_wheels_control(elements))
-
-                        else:
-                            elements = self.get_row_elements(3, " = ")
-                            name = elements[0]
+                        elements = row[2:].split(" ")
+                        physics_controls.append((frame_index, int(elements[1]), [row]))
+
+                elif section == 'Scene light changes':
+                    elements = row[2:].split(" ")
+                    scene_lights.append((
+                        frame_index, int(elements[1]), bool(elements[3]), int(float(elements[5])),
+                        _to_float(elements[7]), _to_float(elements[8]), _to_float(elements[9])))
+
+                elif section == 'Traffic Light time events':
+                    elements = row[2:].split(" ")
+                    state_times.append((
+                        frame_index, int(elements[1]), float(elements[3]), float(elements[5]), float(elements[7])))
+
+                elif section in ('Actor bounding boxes', 'Actor trigger volumes'):
+                    elements = row[2:].split(" ")
+                    key = "bounding_box" if section == 'Actor bounding boxes' else "trigger_volume"
+                    actors_info[int(elements[1])].update({key: parse_bounding_box(elements)})
+
+            # Start of a section, or single row events
+            elif row.startswith(' '):
+                if row.startswith(' Create'):
+                    section = 'Create'
+                    elements = row[1:].split(" ")
+                    actor_id = int(elements[1][:-1])
 
-                            if name == "center_of_mass":
-                                values = elements[1].split(" ")
-                                value = carla.Vector3D(
-                                    float(values[0][1:-1]),
-                                    float(values[1][:-1]),
-                                    float(values[2][:-1]),
-                                )
-                                setattr(physics_control, name, value)
-                            elif name == "torque_curve" or name == "steering_curve":
-                                values = elements[1].split(" ")
-                                value = parse_vector_list(values)
-                                setattr(physics_control, name, value)
+                    actor = parse_actor(elements)
+                    actors_info.update({actor_id: actor})
+                    actors_info[actor_id].update({"created": frame_number})
 
-                            elif name == "use_gear_auto_box":
-                                name = "use_gear_autobox"
-                                value = True if elements[1] == "true" else False
-                                setattr(physics_control, name, value)
+                elif row.startswith(' Destroy'):
+                    section = None
+                    elements = row[1:].split(" ")
+                    actors_info[int(elements[1])].update({"destroyed": frame_number})
 
-                            elif "forward_gears" in name or "wheels" in name:
-                                pass
+                elif row.startswith(' Collision'):
+                    section = None
+                    elements = row[1:].split(" ")
+                    collisions.append((frame_index, int(elements[4]), int(elements[-1])))
 
-                            else:
-                                name = name.lower()
-                                value = float(elements[1])
-                                setattr(physics_control, name, value)
+                elif row.startswith(' Parenting'):
+                    section = None
+                    elements = row[1:].split(" ")
+                    actors_info[int(elements[1])].update({"parent": int(elements[3])})
 
-                        self.next_row()
+                elif row.startswith(' Current platform time'):
+                    section = None
+                    platform_times[-1] = float(row[1:].split(" ")[-1])
 
-                    setattr(physics_control, "forward_gears", forward_gears)
-                    setattr(physics_control, "wheels", wheels)
-                    frame_state["events"]["physics_control"].update({actor_id: physics_control})
+                else:
+                    section = None
+                    for name in SECTIONS:
+                        if row.startswith(name, 1):
+                            section = name
+                            break
+
+            # General information
+            elif row.startswith('Frame '):
+                self._end_frame(states, frame_index)
+                frame_index += 1
+                section = None
+
+                elements = row.split(" ")
+                frame_number = int(elements[1])
+                frame_numbers.append(frame_number)
+                elapsed_times.append(float(elements[3]))
+                platform_times.append(np.nan)
+
+            elif row.startswith('Frames: '):
+                simulation_info["total_frames"] = int(row[8:])
+            elif row.startswith('Duration: '):
+                simulation_info["duration"] = float(row[10:-8])
+            elif row.startswith('Map: '):
+                simulation_info["map"] = row[5:]
+            elif row.startswith('Date: '):
+                simulation_info["date:"] = row[6:]
+
+        self._end_frame(states, frame_index)
+
+        frames = frame_index + 1
+        for table in states.values():
+            table.finish(frames)
+
+        elapsed_time = np.array(elapsed_times, dtype=np.float64)
+        delta_time = np.zeros(frames)
+        delta_time[1:] = np.round(np.diff(elapsed_time), 6)
+
+        states["acceleration"] = self._get_accelerations(velocities, delta_time)
+
+        frames_info = {
+            "frame": {
+                "number": np.array(frame_numbers, dtype=np.int64),
+                "elapsed_time": elapsed_time,
+                "delta_time": delta_time,
+                "platform_time": np.array(platform_times, dtype=np.float64)
+            },
+            "states": states,
+            "events": {
+                "collisions": np.array(collisions, dtype=np.int64).reshape(-1, 3),
+                "scene_lights": np.array(scene_lights, dtype=np.float64).reshape(-1, 7),
+                "traffic_light_state_time": np.array(state_times, dtype=np.float64).reshape(-1, 5),
+                "physics_control": physics_controls
+            }
+        }
 
-            if self.frame_row.startswith(' Traffic Light time events'):
-                self.next_row()
+        return simulation_info, actors_info, frames_info
 
-                while self.frame_row.startswith('  '):
-                    elements = self.get_row_elements(2, " ")
-                    actor_id = int(elements[1])
+    @staticmethod
+    def _end_frame(states, frame_index):
+        """
+        Stores the states of the frame that has just been parsed
+        """
+        if frame_index < 0:
+            return
+        for table in states.values():
+            table.end_frame(frame_index)
 
-                    state_times = parse_state_times(elements)
-                    frame_state["events"]["traffic_light_state_time"].update({actor_id: state_times})
-                    self.next_row()
+    @staticmethod
+    def _get_accelerations(velocities, delta_time):
+        """
+        Computes the accelerations of the actors from the change of their velocity
+        with respect to the previous frame. It is zero the first frame an actor has a velocity
+        """
+        values = np.zeros_like(velocities.values)
+        valid = velocities.valid.copy()
 
-            frames_info.append(frame_state)
+        if len(values) > 1:
+            dt = delta_time[1:, np.newaxis]
+            changed = valid[1:] & valid[:-1] & (dt > 0)
+            safe_dt = np.where(dt > 0, dt, 1.0)[..., np.newaxis]
+            values[1:] = np.where(changed[..., np.newaxis],
+                                  (velocities.values[1:] - velocities.values[:-1]) / safe_dt, 0)
 
-        return simulation_info, actors_info, frames_info
+        return StateTable.from_arrays(STATE_FIELDS["acceleration"], velocities.actor_ids, values, valid)
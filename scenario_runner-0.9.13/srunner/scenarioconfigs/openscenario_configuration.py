@@ -13,8 +13,6 @@ import logging
 import os
 import xml.etree.ElementTree as ET
 
-import xmlschema
-
 import carla
 
 # pylint: disable=line-too-long
@@ -22,6 +20,8 @@ from srunner.scenarioconfigs.scenario_configuration import ActorConfigurationDat
 # pylint: enable=line-too-long
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider  # workaround
 from srunner.tools.openscenario_parser import OpenScenarioParser, ParameterRef
+from srunner.tools.openscenario_schema import OpenScenarioSchema
+from srunner.tools.openscenario_catalog_cache import get_catalog
 
 
 class OpenScenarioConfiguration(ScenarioConfiguration):
@@ -65,19 +65,7 @@ class OpenScenarioConfiguration(ScenarioConfiguration):
 
         Note: This will throw if the config is not valid. But this is fine here.
         """
-        xsd_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../openscenario/OpenSCENARIO.xsd")
-        xsd = xmlschema.XMLSchema(xsd_file)
-        xsd.validate(self.xml_tree)
-
-    def _validate_openscenario_catalog_configuration(self, catalog_xml_tree):
-        """
-        Validate the given OpenSCENARIO catalog config against the 1.0 XSD
-
-        Note: This will throw if the catalog config is not valid. But this is fine here.
-        """
-        xsd_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../openscenario/OpenSCENARIO.xsd")
-        xsd = xmlschema.XMLSchema(xsd_file)
-        xsd.validate(catalog_xml_tree)
+        OpenScenarioSchema.validate(self.xml_tree, self.filename)
 
     def _parse_openscenario_configuration(self):
         """
@@ -103,7 +91,7 @@ class OpenScenarioConfiguration(ScenarioConfiguration):
 
     def _load_catalogs(self):
         """
-        Read Catalog xml files into dictionary for later use
+        Read Catalog xml files into dictionary of CatalogEntry for later use
 
         NOTE: Catalogs must have distinct names, even across different types
         """
@@ -131,13 +119,9 @@ class OpenScenarioConfiguration(ScenarioConfiguration):
             if not os.path.isfile(catalog_path):
                 self.logger.warning(" The %s path for the %s Catalog is invalid", catalog_path, catalog_type)
             else:
-                xml_tree = ET.parse(catalog_path)
-                self._validate_openscenario_catalog_configuration(xml_tree)
-                catalog = xml_tree.find("Catalog")
-                catalog_name = catalog.attrib.get("name")
-                self.catalogs[catalog_name] = {}
-                for entry in catalog:
-                    self.catalogs[catalog_name][entry.attrib.get("name")] = entry
+                # Catalogs are parsed and validated once per process, and their entries are shared
+                catalog = get_catalog(catalog_path)
+                self.catalogs[catalog.name] = catalog.entries
 
     def _set_scenario_name(self):
         """
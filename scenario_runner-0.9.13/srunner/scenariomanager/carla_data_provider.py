@@ -12,8 +12,12 @@ local buffers to avoid blocking calls to CARLA
 
 from __future__ import print_function
 
+from collections import OrderedDict
+import hashlib
 import math
 import re
+import threading
+import numpy as np
 from numpy import random
 from six import iteritems
 
@@ -29,6 +33,223 @@ def calculate_velocity(actor):
     return math.sqrt(velocity_squared)
 
 
+class ActorStateStore(object):
+
+    """
+    Structure-of-arrays buffer with the state of all registered actors.
+
+    Every actor owns one row of the contiguous arrays, found via its id:
+    - position: x, y, z [m]
+    - rotation: pitch, yaw, roll [deg]
+    - velocity: x, y, z [m/s]
+    - speed: absolute planar velocity [m/s]
+
+    A row is only meaningful once 'updated' is set, and 'alive' tells
+    if the actor was part of the last world snapshot. The rows are kept contiguous,
+    so discarding an actor moves the last row into its place
+    """
+
+    _initial_capacity = 64
+    _columns = ('position', 'rotation', 'velocity', 'speed', 'updated', 'alive')
+
+    def __init__(self):
+        self._rows = {}
+        self._ids = []
+        self._actors = []
+        self.position = np.zeros((self._initial_capacity, 3))
+        self.rotation = np.zeros((self._initial_capacity, 3))
+        self.velocity = np.zeros((self._initial_capacity, 3))
+        self.speed = np.zeros(self._initial_capacity)
+        self.updated = np.zeros(self._initial_capacity, dtype=bool)
+        self.alive = np.zeros(self._initial_capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, actor_id):
+        return actor_id in self._rows
+
+    def _grow(self):
+        """
+        Double the capacity of all arrays, keeping their content
+        """
+        capacity = 2 * len(self.speed)
+        for name in self._columns:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, actor):
+        """
+        Reserve a new row for the actor and return its index
+        """
+        row = len(self._ids)
+        if row == len(self.speed):
+            self._grow()
+        self._rows[actor.id] = row
+        self._ids.append(actor.id)
+        self._actors.append(actor)
+        return row
+
+    def get_row(self, actor_id):
+        """
+        Return the row of the actor if it holds valid data, None otherwise
+        """
+        row = self._rows.get(actor_id)
+        if row is None or not self.updated[row]:
+            return None
+        return row
+
+    def discard(self, actor_id):
+        """
+        Free the row of the actor, so that it is no longer updated.
+        The last row takes its place, so the rows obtained before are no longer valid
+        """
+        row = self._rows.pop(actor_id, None)
+        if row is None:
+            return
+
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._rows[moved_id] = row
+            self._ids[row] = moved_id
+            self._actors[row] = self._actors[last]
+            for name in self._columns:
+                column = getattr(self, name)
+                column[row] = column[last]
+
+        self._ids.pop()
+        self._actors.pop()
+        self.updated[last] = False
+        self.alive[last] = False
+
+    def get_actor(self, row):
+        """
+        Return the actor stored at the given row
+        """
+        return self._actors[row]
+
+    def get_ids(self):
+        """
+        Return the actor ids as an array, in row order
+        """
+        return np.array(self._ids, dtype=int)
+
+    def update(self, snapshot):
+        """
+        Fill all rows with the data of a carla.WorldSnapshot
+        """
+        size = len(self._ids)
+        rows = []
+        data = []
+        for row, actor_id in enumerate(self._ids):
+            actor_snapshot = snapshot.find(actor_id)
+            if actor_snapshot is None:
+                continue
+            transform = actor_snapshot.get_transform()
+            velocity = actor_snapshot.get_velocity()
+            rows.append(row)
+            data.append((transform.location.x, transform.location.y, transform.location.z,
+                         transform.rotation.pitch, transform.rotation.yaw, transform.rotation.roll,
+                         velocity.x, velocity.y, velocity.z))
+
+        # Actors missing from the snapshot keep their last known state
+        self.alive[:size] = False
+        if not rows:
+            return
+
+        data = np.array(data, dtype=float)
+        self.position[rows] = data[:, 0:3]
+        self.rotation[rows] = data[:, 3:6]
+        self.velocity[rows] = data[:, 6:9]
+        self.speed[rows] = np.hypot(data[:, 6], data[:, 7])
+        self.updated[rows] = True
+        self.alive[rows] = True
+
+
+class ActorGridIndex(object):
+
+    """
+    Uniform grid over the ground plane, bucketing the positions of actors
+    to answer proximity queries without checking every single actor.
+
+    The index holds the rows of an ActorStateStore, and is rebuilt from scratch
+    with build(). Distances are computed in 3D, cells only use x and y
+    """
+
+    def __init__(self, cell_size=20.0):
+        self._cell_size = float(cell_size)
+        self._rows = np.zeros(0, dtype=int)
+        self._positions = np.zeros((0, 3))
+        self._cells = {}
+        self._min_cell = (0, 0)
+        self._max_cell = (0, 0)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _get_cell(self, x, y):
+        """
+        Return the cell coordinates of a point
+        """
+        return int(math.floor(x / self._cell_size)), int(math.floor(y / self._cell_size))
+
+    def build(self, rows, positions):
+        """
+        Bucket the given positions, with rows being their identifiers
+        """
+        self._rows = rows
+        self._positions = positions
+        self._cells = {}
+        if len(rows) == 0:
+            return
+
+        keys = np.floor(positions[:, :2] / self._cell_size).astype(int)
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        sorted_keys = keys[order]
+        changes = np.flatnonzero(np.any(np.diff(sorted_keys, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(order)]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self._cells[tuple(sorted_keys[start].tolist())] = order[start:end]
+
+        self._min_cell = tuple(keys.min(axis=0).tolist())
+        self._max_cell = tuple(keys.max(axis=0).tolist())
+
+    def _candidates(self, cells):
+        """
+        Return the indices of all positions inside the given cells
+        """
+        buckets = [self._cells[cell] for cell in cells if cell in self._cells]
+        if not buckets:
+            return np.zeros(0, dtype=int)
+        return np.concatenate(buckets)
+
+    def _distances(self, indices, point):
+        """
+        Return the distances between the indexed positions and the point
+        """
+        return np.linalg.norm(self._positions[indices] - np.asarray(point, dtype=float), axis=1)
+
+    def query_radius(self, point, radius):
+        """
+        Return the rows closer than radius to the point (x, y, z)
+        """
+        min_x, min_y = self._get_cell(point[0] - radius, point[1] - radius)
+        max_x, max_y = self._get_cell(point[0] + radius, point[1] + radius)
+        min_x, min_y = max(min_x, self._min_cell[0]), max(min_y, self._min_cell[1])
+        max_x, max_y = min(max_x, self._max_cell[0]), min(max_y, self._max_cell[1])
+
+        cells = [(i, j) for i in range(min_x, max_x + 1) for j in range(min_y, max_y + 1)]
+        indices = self._candidates(cells)
+        if len(indices) == 0:
+            return self._rows[indices]
+
+        return self._rows[indices[self._distances(indices, point) < radius]]
+
+
 class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
 
     """
@@ -40,25 +261,42 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
     - Location
     - Transform
 
+    All of them are kept in an ActorStateStore, which also allows
+    to retrieve the positions of all actors at once. On top of it,
+    an ActorGridIndex answers proximity queries around a location
+
     Potential additions:
     - Acceleration
 
     In addition it provides access to the map and the transform of all traffic lights
+
+    The actor states, the proximity index and the waypoint cache are guarded by a lock, as
+    agents running in the parallel and pipelined modes use them while the scenario is ticked
     """
 
-    _actor_velocity_map = {}
-    _actor_location_map = {}
-    _actor_transform_map = {}
+    _lock = threading.RLock()
+    _actor_state_store = ActorStateStore()
+    _actor_grid_index = ActorGridIndex()
+    _actor_grid_index_outdated = True
     _traffic_light_map = {}
+    _traffic_light_index = {}
+    _lane_end_cache = {}
+    _waypoint_cache = OrderedDict()
+    _waypoint_cache_size = 10000
+    _waypoint_cache_resolution = 0.05
+    _waypoint_cache_hits = 0
+    _waypoint_cache_misses = 0
     _carla_actor_pool = {}
     _global_osc_parameters = {}
     _client = None
     _world = None
     _map = None
+    _map_hash = None
     _sync_flag = False
     _spawn_points = None
     _spawn_index = 0
     _blueprint_library = None
+    _world_data_cache = {}
     _ego_vehicle_route = None
     _traffic_manager_port = 8000
     _random_seed = 2000
@@ -70,23 +308,12 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
         Add new actor to dictionaries
         If actor already exists, throw an exception
         """
-        if actor in CarlaDataProvider._actor_velocity_map:
-            raise KeyError(
-                "Vehicle '{}' already registered. Cannot register twice!".format(actor.id))
-        else:
-            CarlaDataProvider._actor_velocity_map[actor] = 0.0
-
-        if actor in CarlaDataProvider._actor_location_map:
-            raise KeyError(
-                "Vehicle '{}' already registered. Cannot register twice!".format(actor.id))
-        else:
-            CarlaDataProvider._actor_location_map[actor] = None
-
-        if actor in CarlaDataProvider._actor_transform_map:
-            raise KeyError(
-                "Vehicle '{}' already registered. Cannot register twice!".format(actor.id))
-        else:
-            CarlaDataProvider._actor_transform_map[actor] = None
+        with CarlaDataProvider._lock:
+            if actor.id in CarlaDataProvider._actor_state_store:
+                raise KeyError(
+                    "Vehicle '{}' already registered. Cannot register twice!".format(actor.id))
+            else:
+                CarlaDataProvider._actor_state_store.add(actor)
 
     @staticmethod
     def update_osc_global_params(parameters):
@@ -114,64 +341,111 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
     def on_carla_tick():
         """
         Callback from CARLA
-        """
-        for actor in CarlaDataProvider._actor_velocity_map:
-            if actor is not None and actor.is_alive:
-                CarlaDataProvider._actor_velocity_map[actor] = calculate_velocity(actor)
 
-        for actor in CarlaDataProvider._actor_location_map:
-            if actor is not None and actor.is_alive:
-                CarlaDataProvider._actor_location_map[actor] = actor.get_location()
-
-        for actor in CarlaDataProvider._actor_transform_map:
-            if actor is not None and actor.is_alive:
-                CarlaDataProvider._actor_transform_map[actor] = actor.get_transform()
+        All registered actors are updated from a single world snapshot, instead of
+        querying velocity, location and transform of every actor separately
+        """
+        with CarlaDataProvider._lock:
+            world = CarlaDataProvider._world
+            if world is None:
+                print("WARNING: CarlaDataProvider couldn't find the world")
+                return
 
-        world = CarlaDataProvider._world
-        if world is None:
-            print("WARNING: CarlaDataProvider couldn't find the world")
+            CarlaDataProvider._actor_state_store.update(world.get_snapshot())
+            CarlaDataProvider._actor_grid_index_outdated = True
 
     @staticmethod
     def get_velocity(actor):
         """
         returns the absolute velocity for the given actor
         """
-        for key in CarlaDataProvider._actor_velocity_map:
-            if key.id == actor.id:
-                return CarlaDataProvider._actor_velocity_map[key]
+        with CarlaDataProvider._lock:
+            store = CarlaDataProvider._actor_state_store
+            if actor.id in store:
+                row = store.get_row(actor.id)
+                return float(store.speed[row]) if row is not None else 0.0
 
-        # We are intentionally not throwing here
-        # This may cause exception loops in py_trees
-        print('{}.get_velocity: {} not found!' .format(__name__, actor))
-        return 0.0
+            # We are intentionally not throwing here
+            # This may cause exception loops in py_trees
+            print('{}.get_velocity: {} not found!' .format(__name__, actor))
+            return 0.0
 
     @staticmethod
     def get_location(actor):
         """
         returns the location for the given actor
         """
-        for key in CarlaDataProvider._actor_location_map:
-            if key.id == actor.id:
-                return CarlaDataProvider._actor_location_map[key]
-
-        # We are intentionally not throwing here
-        # This may cause exception loops in py_trees
-        print('{}.get_location: {} not found!' .format(__name__, actor))
-        return None
+        with CarlaDataProvider._lock:
+            store = CarlaDataProvider._actor_state_store
+            if actor.id in store:
+                row = store.get_row(actor.id)
+                if row is None:
+                    return None
+                x, y, z = store.position[row].tolist()
+                return carla.Location(x=x, y=y, z=z)
+
+            # We are intentionally not throwing here
+            # This may cause exception loops in py_trees
+            print('{}.get_location: {} not found!' .format(__name__, actor))
+            return None
 
     @staticmethod
     def get_transform(actor):
         """
         returns the transform for the given actor
         """
-        for key in CarlaDataProvider._actor_transform_map:
-            if key.id == actor.id:
-                return CarlaDataProvider._actor_transform_map[key]
+        with CarlaDataProvider._lock:
+            store = CarlaDataProvider._actor_state_store
+            if actor.id in store:
+                row = store.get_row(actor.id)
+                if row is None:
+                    return None
+                x, y, z = store.position[row].tolist()
+                pitch, yaw, roll = store.rotation[row].tolist()
+                return carla.Transform(carla.Location(x=x, y=y, z=z), carla.Rotation(pitch=pitch, yaw=yaw, roll=roll))
+
+            # We are intentionally not throwing here
+            # This may cause exception loops in py_trees
+            print('{}.get_transform: {} not found!' .format(__name__, actor))
+            return None
 
-        # We are intentionally not throwing here
-        # This may cause exception loops in py_trees
-        print('{}.get_transform: {} not found!' .format(__name__, actor))
-        return None
+    @staticmethod
+    def get_all_actor_positions():
+        """
+        returns the ids and the positions of all registered actors alive in the last tick,
+        as a (N,) int array and a (N, 3) float array. Useful for vectorized distance checks
+        """
+        with CarlaDataProvider._lock:
+            store = CarlaDataProvider._actor_state_store
+            size = len(store)
+            alive = store.alive[:size]
+            return store.get_ids()[alive], store.position[:size][alive].copy()
+
+    @staticmethod
+    def _get_actor_grid_index():
+        """
+        Return the spatial index of the registered actors, rebuilding it if
+        the actors have moved since the last query
+        """
+        with CarlaDataProvider._lock:
+            if CarlaDataProvider._actor_grid_index_outdated:
+                store = CarlaDataProvider._actor_state_store
+                rows = np.flatnonzero(store.alive[:len(store)])
+                CarlaDataProvider._actor_grid_index.build(rows, store.position[rows])
+                CarlaDataProvider._actor_grid_index_outdated = False
+
+            return CarlaDataProvider._actor_grid_index
+
+    @staticmethod
+    def get_actors_within(location, radius):
+        """
+        returns all registered actors that are closer than radius to the given location,
+        according to their positions at the last tick
+        """
+        with CarlaDataProvider._lock:
+            store = CarlaDataProvider._actor_state_store
+            rows = CarlaDataProvider._get_actor_grid_index().query_radius((location.x, location.y, location.z), radius)
+            return [store.get_actor(row) for row in rows.tolist()]
 
     @staticmethod
     def set_client(client):
@@ -190,15 +464,42 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
     @staticmethod
     def set_world(world):
         """
-        Set the world and world settings
+        Set the world and world settings.
+        The map data is kept while the same world stays loaded, so that setting it again
+        after a scenario doesn't fetch the map, blueprints and traffic lights once more
         """
         CarlaDataProvider._world = world
         CarlaDataProvider._sync_flag = world.get_settings().synchronous_mode
+        CarlaDataProvider.clear_waypoint_cache()
+
+        world_id = getattr(world, 'id', None)
+        world_data = CarlaDataProvider._world_data_cache
+        if world_id is not None and world_data.get('world_id') == world_id:
+            CarlaDataProvider._map = world_data['map']
+            CarlaDataProvider._map_hash = world_data['map_hash']
+            CarlaDataProvider._blueprint_library = world_data['blueprint_library']
+            CarlaDataProvider._traffic_light_map.clear()
+            CarlaDataProvider._traffic_light_map.update(world_data['traffic_light_map'])
+            CarlaDataProvider._traffic_light_index = world_data['traffic_light_index']
+            CarlaDataProvider.generate_spawn_points(world_data['spawn_points'])
+            return
+
         CarlaDataProvider._map = world.get_map()
+        CarlaDataProvider._map_hash = None
         CarlaDataProvider._blueprint_library = world.get_blueprint_library()
         CarlaDataProvider.generate_spawn_points()
         CarlaDataProvider.prepare_map()
 
+        CarlaDataProvider._world_data_cache = {
+            'world_id': world_id,
+            'map': CarlaDataProvider._map,
+            'map_hash': CarlaDataProvider.get_map_hash(),
+            'blueprint_library': CarlaDataProvider._blueprint_library,
+            'spawn_points': list(CarlaDataProvider._map.get_spawn_points()),
+            'traffic_light_map': dict(CarlaDataProvider._traffic_light_map),
+            'traffic_light_index': CarlaDataProvider._traffic_light_index
+        }
+
     @staticmethod
     def get_world():
         """
@@ -222,6 +523,82 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
 
         return CarlaDataProvider._map
 
+    @staticmethod
+    def get_map_hash(carla_map=None):
+        """
+        Returns the hash of the OpenDRIVE of the given map, or of the current one if None.
+        The OpenDRIVE of the current map is only fetched once per world
+        """
+        if carla_map is not None and carla_map is not CarlaDataProvider._map:
+            return hashlib.sha1(carla_map.to_opendrive().encode('utf-8')).hexdigest()
+
+        map_hash = CarlaDataProvider._map_hash
+        if map_hash is None:
+            map_hash = hashlib.sha1(CarlaDataProvider.get_map().to_opendrive().encode('utf-8')).hexdigest()
+            CarlaDataProvider._map_hash = map_hash
+        return map_hash
+
+    @staticmethod
+    def get_waypoint(location, project_to_road=True, lane_type=None):
+        """
+        Cached version of carla.Map.get_waypoint. If lane_type isn't given, CARLA's default
+        (carla.LaneType.Driving) is used.
+
+        Locations are quantized to _waypoint_cache_resolution meters, so that querying
+        the same (or nearly the same) position reuses the previous result.
+        The least recently used results are discarded once the cache is full
+        """
+        with CarlaDataProvider._lock:
+            resolution = CarlaDataProvider._waypoint_cache_resolution
+            key = (int(round(location.x / resolution)),
+                   int(round(location.y / resolution)),
+                   int(round(location.z / resolution)),
+                   project_to_road,
+                   lane_type)
+
+            cache = CarlaDataProvider._waypoint_cache
+            if key in cache:
+                CarlaDataProvider._waypoint_cache_hits += 1
+                waypoint = cache.pop(key)
+                cache[key] = waypoint
+                return waypoint
+
+            CarlaDataProvider._waypoint_cache_misses += 1
+            if lane_type is None:
+                if project_to_road:
+                    waypoint = CarlaDataProvider.get_map().get_waypoint(location)
+                else:
+                    waypoint = CarlaDataProvider.get_map().get_waypoint(location, project_to_road=False)
+            else:
+                waypoint = CarlaDataProvider.get_map().get_waypoint(
+                    location, project_to_road=project_to_road, lane_type=lane_type)
+
+            cache[key] = waypoint
+            if len(cache) > CarlaDataProvider._waypoint_cache_size:
+                cache.popitem(last=False)
+
+            return waypoint
+
+    @staticmethod
+    def get_waypoint_cache_info():
+        """
+        returns the hits, misses and current size of the waypoint cache
+        """
+        with CarlaDataProvider._lock:
+            return {'hits': CarlaDataProvider._waypoint_cache_hits,
+                    'misses': CarlaDataProvider._waypoint_cache_misses,
+                    'size': len(CarlaDataProvider._waypoint_cache)}
+
+    @staticmethod
+    def clear_waypoint_cache():
+        """
+        Remove all entries of the waypoint cache and reset its counters
+        """
+        with CarlaDataProvider._lock:
+            CarlaDataProvider._waypoint_cache.clear()
+            CarlaDataProvider._waypoint_cache_hits = 0
+            CarlaDataProvider._waypoint_cache_misses = 0
+
     @staticmethod
     def is_sync_mode():
         """
@@ -257,6 +634,96 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
                 raise KeyError(
                     "Traffic light '{}' already registered. Cannot register twice!".format(traffic_light.id))
 
+        CarlaDataProvider._build_traffic_light_index()
+
+    @staticmethod
+    def _get_lane_end_locations(carla_map):
+        """
+        Returns a dictionary with the location of the last waypoint before the next intersection,
+        for all (road_id, section_id, lane_id) outside junctions. As this only depends on the map,
+        the result is computed once per town and cached, by map name and OpenDRIVE hash
+        """
+        # Maps generated from OpenDRIVE can share their name, so their content is part of the key
+        map_key = (carla_map.name, CarlaDataProvider.get_map_hash(carla_map))
+        if map_key in CarlaDataProvider._lane_end_cache:
+            return CarlaDataProvider._lane_end_cache[map_key]
+
+        def get_lane_key(waypoint):
+            """
+            Returns the identifier of the lane section of a waypoint
+            """
+            return (waypoint.road_id, waypoint.section_id, waypoint.lane_id)
+
+        # Walk each lane section until it ends, storing its last location and its successor
+        lane_ends = {}
+        for entry, _ in carla_map.get_topology():
+            key = get_lane_key(entry)
+            if key in lane_ends or entry.is_intersection:
+                continue
+
+            waypoint = entry
+            successor = None
+            while True:
+                next_waypoints = waypoint.next(2.0)
+                if not next_waypoints or next_waypoints[0].is_intersection:
+                    break
+                if get_lane_key(next_waypoints[0]) != key:
+                    successor = get_lane_key(next_waypoints[0])
+                    break
+                waypoint = next_waypoints[0]
+
+            location = waypoint.transform.location
+            lane_ends[key] = ((location.x, location.y, location.z), successor)
+
+        # Follow the successors up to the intersection, reusing the already solved ones
+        end_locations = {}
+        for start_key in lane_ends:
+            chain = []
+            key = start_key
+            while key not in end_locations:
+                chain.append(key)
+                location, successor = lane_ends[key]
+                if successor is None or successor not in lane_ends or successor in chain:
+                    end_locations[key] = location
+                    break
+                key = successor
+
+            for chain_key in chain:
+                end_locations[chain_key] = end_locations[key]
+
+        CarlaDataProvider._lane_end_cache[map_key] = end_locations
+        return end_locations
+
+    @staticmethod
+    def _build_traffic_light_index():
+        """
+        Links each (road_id, section_id, lane_id) to the traffic light whose trigger volume
+        is the closest one to the end of the lane, as used by get_next_traffic_light
+        """
+        CarlaDataProvider._traffic_light_index = {}
+
+        end_locations = CarlaDataProvider._get_lane_end_locations(CarlaDataProvider._map)
+        if not end_locations:
+            return
+
+        traffic_lights = []
+        trigger_locations = []
+        for traffic_light, tl_t in iteritems(CarlaDataProvider._traffic_light_map):
+            if hasattr(traffic_light, 'trigger_volume'):
+                transformed_tv = tl_t.transform(traffic_light.trigger_volume.location)
+                traffic_lights.append(traffic_light)
+                trigger_locations.append((transformed_tv.x, transformed_tv.y, transformed_tv.z))
+
+        keys = list(end_locations)
+        if not traffic_lights:
+            CarlaDataProvider._traffic_light_index = dict.fromkeys(keys)
+            return
+
+        lane_ends = np.array([end_locations[key] for key in keys])
+        distances = np.linalg.norm(lane_ends[:, np.newaxis, :] - np.array(trigger_locations)[np.newaxis, :, :], axis=2)
+        closest = np.argmin(distances, axis=1).tolist()
+        CarlaDataProvider._traffic_light_index = {key: traffic_lights[i] for key, i in zip(keys, closest)}
+
     @staticmethod
     def annotate_trafficlight_in_group(traffic_light):
         """
@@ -371,7 +838,16 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
         else:
             location = CarlaDataProvider.get_location(actor)
 
-        waypoint = CarlaDataProvider.get_map().get_waypoint(location)
+        waypoint = CarlaDataProvider.get_waypoint(location)
+        if waypoint and waypoint.is_intersection:
+            return None
+
+        # Use the precomputed traffic light of the lane, if available
+        if waypoint:
+            lane_key = (waypoint.road_id, waypoint.section_id, waypoint.lane_id)
+            if lane_key in CarlaDataProvider._traffic_light_index:
+                return CarlaDataProvider._traffic_light_index[lane_key]
+
         # Create list of all waypoints until next intersection
         list_of_waypoints = []
         while waypoint and not waypoint.is_intersection:
@@ -415,11 +891,13 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
         return CarlaDataProvider._ego_vehicle_route
 
     @staticmethod
-    def generate_spawn_points():
+    def generate_spawn_points(spawn_points=None):
         """
-        Generate spawn points for the current map
+        Generate spawn points for the current map, shuffling the given ones if available
         """
-        spawn_points = list(CarlaDataProvider.get_map(CarlaDataProvider._world).get_spawn_points())
+        if spawn_points is None:
+            spawn_points = CarlaDataProvider.get_map(CarlaDataProvider._world).get_spawn_points()
+        spawn_points = list(spawn_points)
         CarlaDataProvider._rng.shuffle(spawn_points)
         CarlaDataProvider._spawn_points = spawn_points
         CarlaDataProvider._spawn_index = 0
@@ -780,6 +1258,7 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
             CarlaDataProvider._carla_actor_pool[actor_id].destroy()
             CarlaDataProvider._carla_actor_pool[actor_id] = None
             CarlaDataProvider._carla_actor_pool.pop(actor_id)
+            CarlaDataProvider._discard_actor_state(actor_id)
         else:
             print("Trying to remove a non-existing actor id {}".format(actor_id))
 
@@ -787,16 +1266,38 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
     def remove_actors_in_surrounding(location, distance):
         """
         Remove all actors from the pool that are closer than distance to the
-        provided location
+        provided location. The actors whose state wasn't updated in the last tick,
+        such as those spawned since, are checked with their live location
         """
-        for actor_id in CarlaDataProvider._carla_actor_pool.copy():
-            if CarlaDataProvider._carla_actor_pool[actor_id].get_location().distance(location) < distance:
-                CarlaDataProvider._carla_actor_pool[actor_id].destroy()
-                CarlaDataProvider._carla_actor_pool.pop(actor_id)
+        store = CarlaDataProvider._actor_state_store
+        nearby_ids = set(actor.id for actor in CarlaDataProvider.get_actors_within(location, distance))
+
+        for actor_id, actor in list(CarlaDataProvider._carla_actor_pool.items()):
+            if actor is None:
+                continue
+            if actor_id not in nearby_ids:
+                row = store.get_row(actor_id)
+                if row is not None and store.alive[row]:
+                    continue
+                if actor.get_location().distance(location) >= distance:
+                    continue
+
+            actor.destroy()
+            CarlaDataProvider._carla_actor_pool.pop(actor_id)
+            CarlaDataProvider._discard_actor_state(actor_id)
 
         # Remove all keys with None values
         CarlaDataProvider._carla_actor_pool = dict({k: v for k, v in CarlaDataProvider._carla_actor_pool.items() if v})
 
+    @staticmethod
+    def _discard_actor_state(actor_id):
+        """
+        Free the state of a destroyed actor, which is no longer updated nor part of the proximity queries
+        """
+        with CarlaDataProvider._lock:
+            CarlaDataProvider._actor_state_store.discard(actor_id)
+            CarlaDataProvider._actor_grid_index_outdated = True
+
     @staticmethod
     def get_traffic_manager_port():
         """
@@ -833,11 +1334,14 @@ class CarlaDataProvider(object):  # pylint: disable=too-many-public-methods
                 else:
                     raise e
 
-        CarlaDataProvider._actor_velocity_map.clear()
-        CarlaDataProvider._actor_location_map.clear()
-        CarlaDataProvider._actor_transform_map.clear()
+        CarlaDataProvider._actor_state_store = ActorStateStore()
+        CarlaDataProvider._actor_grid_index = ActorGridIndex()
+        CarlaDataProvider._actor_grid_index_outdated = True
         CarlaDataProvider._traffic_light_map.clear()
+        CarlaDataProvider._traffic_light_index = {}
+        CarlaDataProvider.clear_waypoint_cache()
         CarlaDataProvider._map = None
+        CarlaDataProvider._map_hash = None
         CarlaDataProvider._world = None
         CarlaDataProvider._sync_flag = False
         CarlaDataProvider._ego_vehicle_route = None
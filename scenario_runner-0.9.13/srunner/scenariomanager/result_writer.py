@@ -95,6 +95,8 @@ class ResultOutputProvider(object):
         list_statistics.extend([["Duration (System Time)", "{}s".format(system_time)]])
         list_statistics.extend([["Duration (Game Time)", "{}s".format(game_time)]])
         list_statistics.extend([["Ratio (System Time / Game Time)", "{}s".format(ratio)]])
+        list_statistics.extend([["Processed / Skipped Frames", "{} / {}".format(
+            self._data.frames_processed, self._data.frames_skipped)]])
 
         output += tabulate(list_statistics, tablefmt='fancy_grid')
         output += "\n\n"
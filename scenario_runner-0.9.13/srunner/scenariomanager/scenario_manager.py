@@ -12,13 +12,17 @@ It must not be modified and is for reference only!
 
 from __future__ import print_function
 import sys
+import threading
 import time
+from timeit import default_timer
 
 import py_trees
 
 from srunner.autoagents.agent_wrapper import AgentWrapper
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.result_writer import ResultOutputProvider
+from srunner.scenariomanager.tick_profiler import TickProfiler
+from srunner.scenariomanager.tick_telemetry import TickTelemetry
 from srunner.scenariomanager.timer import GameTime
 from srunner.scenariomanager.watchdog import Watchdog
 
@@ -39,12 +43,23 @@ class ScenarioManager(object):
        the scenario execution
     4. Trigger a result evaluation with manager.analyze_scenario()
     5. If needed, cleanup with manager.stop_scenario()
+
+    In asynchronous mode, the scenario is ticked whenever the server notifies a new frame.
+    If the scenario takes longer than a frame to tick, it skips to the newest frame,
+    and the number of skipped frames is reported at the end of the scenario.
     """
 
-    def __init__(self, debug_mode=False, sync_mode=False, timeout=2.0):
+    # Maximum time waiting for a new frame before checking again if the scenario is running
+    tick_timeout = 1.0
+
+    def __init__(self, debug_mode=False, sync_mode=False, timeout=2.0, profiling=False, telemetry=None,
+                 agent_mode=AgentWrapper.SERIAL):
         """
         Setups up the parameters, which will be filled at load_scenario()
 
+        If profiling is enabled, the time spent by each behaviour of the scenario tree is measured.
+        If a telemetry target is given, the timing of every tick is sent to it (see TickTelemetry).
+        The agent mode sets how the agent runs alongside the scenario (see AgentWrapper)
         """
         self.scenario = None
         self.scenario_tree = None
@@ -54,9 +69,13 @@ class ScenarioManager(object):
 
         self._debug_mode = debug_mode
         self._agent = None
+        self._agent_mode = agent_mode
         self._sync_mode = sync_mode
         self._watchdog = None
         self._timeout = timeout
+        self._profiling = profiling
+        self.profiler = None
+        self.telemetry = TickTelemetry(telemetry) if telemetry else None
 
         self._running = False
         self._timestamp_last_run = 0.0
@@ -65,6 +84,12 @@ class ScenarioManager(object):
         self.start_system_time = None
         self.end_system_time = None
 
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self._last_frame = None
+        self._latest_snapshot = None
+        self._tick_condition = threading.Condition()
+
     def _reset(self):
         """
         Reset all parameters
@@ -75,6 +100,10 @@ class ScenarioManager(object):
         self.scenario_duration_game = 0.0
         self.start_system_time = None
         self.end_system_time = None
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self._last_frame = None
+        self._latest_snapshot = None
         GameTime.restart()
 
     def cleanup(self):
@@ -86,6 +115,9 @@ class ScenarioManager(object):
             self._watchdog.stop()
             self._watchdog = None
 
+        if self.profiler is not None:
+            self.profiler.detach()
+
         if self.scenario is not None:
             self.scenario.terminate()
 
@@ -93,14 +125,17 @@ class ScenarioManager(object):
             self._agent.cleanup()
             self._agent = None
 
+        if self.telemetry is not None:
+            self.telemetry.flush()
+
         CarlaDataProvider.cleanup()
 
-    def load_scenario(self, scenario, agent=None):
+    def load_scenario(self, scenario, agent=None, repetition=0):
         """
-        Load a new scenario
+        Load a new scenario. The repetition is only used to label its telemetry
         """
         self._reset()
-        self._agent = AgentWrapper(agent) if agent else None
+        self._agent = AgentWrapper(agent, self._agent_mode, float(self._timeout)) if agent else None
         if self._agent is not None:
             self._sync_mode = True
         self.scenario_class = scenario
@@ -109,6 +144,13 @@ class ScenarioManager(object):
         self.ego_vehicles = scenario.ego_vehicles
         self.other_actors = scenario.other_actors
 
+        self.profiler = None
+        if self._profiling:
+            self.profiler = TickProfiler(self.scenario._extract_nodes_from_tree(self.scenario_tree))  # pylint: disable=protected-access
+
+        if self.telemetry is not None:
+            self.telemetry.start(self.scenario_tree.name, repetition)
+
         # To print the scenario tree uncomment the next line
         # py_trees.display.render_dot_tree(self.scenario_tree)
 
@@ -123,19 +165,30 @@ class ScenarioManager(object):
         self.start_system_time = time.time()
         start_game_time = GameTime.get_time()
 
+        world = CarlaDataProvider.get_world()
+        if world is None:
+            raise RuntimeError("ScenarioManager: CarlaDataProvider has no world, the scenario can't be run")
+
         self._watchdog = Watchdog(float(self._timeout))
         self._watchdog.start()
         self._running = True
 
-        while self._running:
-            timestamp = None
-            world = CarlaDataProvider.get_world()
-            if world:
-                snapshot = world.get_snapshot()
+        tick_callback_id = None
+        if not self._sync_mode:
+            tick_callback_id = world.on_tick(self._on_carla_tick)
+
+        try:
+            while self._running:
+                if self._sync_mode:
+                    snapshot = world.get_snapshot()
+                else:
+                    snapshot = self._wait_for_snapshot()
                 if snapshot:
-                    timestamp = snapshot.timestamp
-            if timestamp:
-                self._tick_scenario(timestamp)
+                    self._count_frame(snapshot.frame)
+                    self._tick_scenario(snapshot.timestamp)
+        finally:
+            if tick_callback_id is not None:
+                world.remove_on_tick(tick_callback_id)
 
         self.cleanup()
 
@@ -149,12 +202,51 @@ class ScenarioManager(object):
         if self.scenario_tree.status == py_trees.common.Status.FAILURE:
             print("ScenarioManager: Terminated due to failure")
 
+        if self.frames_skipped:
+            print("ScenarioManager: Processed {} frames, skipped {} frames".format(
+                self.frames_processed, self.frames_skipped))
+
+        if self.telemetry is not None:
+            print("ScenarioManager: Real time factor {:.3f}".format(self.telemetry.real_time_factor))
+
+    def _on_carla_tick(self, snapshot):
+        """
+        Callback of the world ticks in asynchronous mode, keeping only the newest snapshot
+        """
+        with self._tick_condition:
+            self._latest_snapshot = snapshot
+            self._tick_condition.notify()
+
+    def _wait_for_snapshot(self):
+        """
+        Wait until the server notifies a frame that hasn't been processed yet.
+        Returns None if no frame arrives before the tick timeout
+        """
+        with self._tick_condition:
+            if self._latest_snapshot is None:
+                self._tick_condition.wait(self.tick_timeout)
+            snapshot = self._latest_snapshot
+            self._latest_snapshot = None
+        return snapshot
+
+    def _count_frame(self, frame):
+        """
+        Keep track of the processed frames and of those skipped since the last one
+        """
+        if self._last_frame is not None and frame <= self._last_frame:
+            return
+        if self._last_frame is not None:
+            self.frames_skipped += frame - self._last_frame - 1
+        self._last_frame = frame
+        self.frames_processed += 1
+
     def _tick_scenario(self, timestamp):
         """
         Run next tick of scenario and the agent.
         If running synchornously, it also handles the ticking of the world.
         """
 
+        tick_times = None
         if self._timestamp_last_run < timestamp.elapsed_seconds and self._running:
             self._timestamp_last_run = timestamp.elapsed_seconds
 
@@ -163,18 +255,53 @@ class ScenarioManager(object):
             if self._debug_mode:
                 print("\n--------- Tick ---------\n")
 
+            agent_mode = self._agent.mode if self._agent is not None else None
+            ego_action = None
+            agent_time = 0.0
+
+            # In pipelined mode, the control was computed from the previous frame while the world ticked
+            if agent_mode == AgentWrapper.PIPELINED:
+                agent_start = default_timer()
+                ego_action = self._agent.wait_for_control()
+                agent_time += default_timer() - agent_start
+
             # Update game time and actor information
+            tick_start = default_timer()
             GameTime.on_carla_tick(timestamp)
             CarlaDataProvider.on_carla_tick()
+            carla_tick_time = default_timer() - tick_start
 
-            if self._agent is not None:
+            agent_start = default_timer()
+            if agent_mode == AgentWrapper.SERIAL:
                 ego_action = self._agent()  # pylint: disable=not-callable
+            elif agent_mode is not None:
+                self._agent.start_step()
+            agent_time += default_timer() - agent_start
 
-            if self._agent is not None:
+            control_start = default_timer()
+            if ego_action is not None:
                 self.ego_vehicles[0].apply_control(ego_action)
+            control_time = default_timer() - control_start
 
             # Tick scenario
+            tree_start = default_timer()
+            if self.profiler is not None:
+                self.profiler.start_tick()
             self.scenario_tree.tick_once()
+            if self.profiler is not None:
+                self.profiler.end_tick()
+            tree_time = default_timer() - tree_start
+
+            # In parallel mode, the control has to be applied before the world ticks
+            if agent_mode == AgentWrapper.PARALLEL:
+                agent_start = default_timer()
+                ego_action = self._agent.wait_for_control()
+                agent_time += default_timer() - agent_start
+                control_start = default_timer()
+                self.ego_vehicles[0].apply_control(ego_action)
+                control_time += default_timer() - control_start
+
+            tick_times = [carla_tick_time, agent_time, control_time, tree_time]
 
             if self._debug_mode:
                 print("\n")
@@ -184,8 +311,14 @@ class ScenarioManager(object):
             if self.scenario_tree.status != py_trees.common.Status.RUNNING:
                 self._running = False
 
+        world_tick_time = 0.0
         if self._sync_mode and self._running and self._watchdog.get_status():
+            world_tick_start = default_timer()
             CarlaDataProvider.get_world().tick()
+            world_tick_time = default_timer() - world_tick_start
+
+        if self.telemetry is not None and tick_times is not None:
+            self.telemetry.record(timestamp.frame, GameTime.get_time(), tick_times + [world_tick_time])
 
     def get_running_status(self):
         """
@@ -200,13 +333,20 @@ class ScenarioManager(object):
         """
         self._running = False
 
-    def analyze_scenario(self, stdout, filename, junit, json):
+    def analyze_scenario(self, stdout, filename, junit, json, profile=None):
         """
         This function is intended to be called from outside and provide
         the final statistics about the scenario (human-readable, in form of a junit
         report, etc.)
+        If profiling is enabled, the tick profile is also written to the profile file
         """
 
+        if self.profiler is not None:
+            if profile is not None:
+                self.profiler.write(profile)
+            if stdout:
+                print(self.profiler.create_output_text())
+
         failure = False
         timeout = False
         result = "SUCCESS"
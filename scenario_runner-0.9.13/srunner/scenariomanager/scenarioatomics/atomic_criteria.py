@@ -26,6 +26,7 @@ import carla
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.timer import GameTime
 from srunner.scenariomanager.traffic_events import TrafficEvent, TrafficEventType
+from srunner.tools.route_geometry import RouteGeometry
 
 
 class Criterion(py_trees.behaviour.Behaviour):
@@ -666,11 +667,11 @@ class OffRoadTest(Criterion):
         current_location = CarlaDataProvider.get_location(self.actor)
 
         # Get the waypoint at the current location to see if the actor is offroad
-        drive_waypoint = self._map.get_waypoint(
+        drive_waypoint = CarlaDataProvider.get_waypoint(
             current_location,
             project_to_road=False
         )
-        park_waypoint = self._map.get_waypoint(
+        park_waypoint = CarlaDataProvider.get_waypoint(
             current_location,
             project_to_road=False,
             lane_type=carla.LaneType.Parking
@@ -743,7 +744,7 @@ class EndofRoadTest(Criterion):
         new_status = py_trees.common.Status.RUNNING
 
         current_location = CarlaDataProvider.get_location(self.actor)
-        current_waypoint = self._map.get_waypoint(current_location)
+        current_waypoint = CarlaDataProvider.get_waypoint(current_location)
 
         # Get the current road id
         if self._road_id is None:
@@ -826,7 +827,7 @@ class OnSidewalkTest(Criterion):
         # Some of the vehicle parameters
         current_tra = CarlaDataProvider.get_transform(self._actor)
         current_loc = current_tra.location
-        current_wp = self._map.get_waypoint(current_loc, lane_type=carla.LaneType.Any)
+        current_wp = CarlaDataProvider.get_waypoint(current_loc, lane_type=carla.LaneType.Any)
 
         # Case 1) Car center is at a sidewalk
         if current_wp.lane_type == carla.LaneType.Sidewalk:
@@ -854,10 +855,10 @@ class OnSidewalkTest(Criterion):
                 current_loc + carla.Location(-1 * x_boundary_vector + y_boundary_vector)]
 
             bbox_wp = [
-                self._map.get_waypoint(bbox[0], lane_type=carla.LaneType.Any),
-                self._map.get_waypoint(bbox[1], lane_type=carla.LaneType.Any),
-                self._map.get_waypoint(bbox[2], lane_type=carla.LaneType.Any),
-                self._map.get_waypoint(bbox[3], lane_type=carla.LaneType.Any)]
+                CarlaDataProvider.get_waypoint(bbox[0], lane_type=carla.LaneType.Any),
+                CarlaDataProvider.get_waypoint(bbox[1], lane_type=carla.LaneType.Any),
+                CarlaDataProvider.get_waypoint(bbox[2], lane_type=carla.LaneType.Any),
+                CarlaDataProvider.get_waypoint(bbox[3], lane_type=carla.LaneType.Any)]
 
             lane_type_list = [bbox_wp[0].lane_type, bbox_wp[1].lane_type, bbox_wp[2].lane_type, bbox_wp[3].lane_type]
 
@@ -1043,6 +1044,7 @@ class OutsideRouteLanesTest(Criterion):
         actor (carla.ACtor): CARLA actor to be used for this test
         route (list [carla.Location, connection]): series of locations representing the route waypoints
         optional (bool): If True, the result is not considered for an overall pass/fail result
+        route_geometry (RouteGeometry): precomputed geometry of the route. Built from the route if not given
     """
 
     ALLOWED_OUT_DISTANCE = 1.3          # At least 0.5, due to the mini-shoulder between lanes and sidewalks
@@ -1050,7 +1052,7 @@ class OutsideRouteLanesTest(Criterion):
     MAX_ALLOWED_WAYPOINT_ANGLE = 150.0  # Maximum change between the yaw-lane angle between frames
     WINDOWS_SIZE = 3                    # Amount of additional waypoints checked (in case the first on fails)
 
-    def __init__(self, actor, route, optional=False, name="OutsideRouteLanesTest"):
+    def __init__(self, actor, route, optional=False, name="OutsideRouteLanesTest", route_geometry=None):
         """
         Constructor
         """
@@ -1059,9 +1061,9 @@ class OutsideRouteLanesTest(Criterion):
 
         self._actor = actor
         self._route = route
+        self._route_geometry = route_geometry if route_geometry is not None else RouteGeometry(route)
         self._current_index = 0
-        self._route_length = len(self._route)
-        self._waypoints, _ = zip(*self._route)
+        self._route_length = len(self._route_geometry)
 
         self._map = CarlaDataProvider.get_map()
         self._pre_ego_waypoint = self._map.get_waypoint(self._actor.get_location())
@@ -1099,30 +1101,20 @@ class OutsideRouteLanesTest(Criterion):
         if self._outside_lane_active or self._wrong_lane_active:
             self.test_status = "FAILURE"
 
-        # 2) Get the traveled distance
-        for index in range(self._current_index + 1,
-                           min(self._current_index + self.WINDOWS_SIZE + 1, self._route_length)):
-            # Get the dot product to know if it has passed this location
-            index_location = self._waypoints[index]
-            index_waypoint = self._map.get_waypoint(index_location)
+        # 2) Get the traveled distance, checking which route points the actor has already passed
+        passed_indices = self._route_geometry.passed_indices(
+            location, self._current_index + 1, self._current_index + self.WINDOWS_SIZE + 1)
+        for index in passed_indices.tolist():
+            # Get the distance traveled
+            new_dist = self._route_geometry.get_distance(self._current_index, index)
 
-            wp_dir = index_waypoint.transform.get_forward_vector()  # Waypoint's forward vector
-            wp_veh = location - index_location  # vector waypoint - vehicle
-            dot_ve_wp = wp_veh.x * wp_dir.x + wp_veh.y * wp_dir.y + wp_veh.z * wp_dir.z
+            # Add it to the total distance
+            self._current_index = index
+            self._total_distance += new_dist
 
-            if dot_ve_wp > 0:
-                # Get the distance traveled
-                index_location = self._waypoints[index]
-                current_index_location = self._waypoints[self._current_index]
-                new_dist = current_index_location.distance(index_location)
-
-                # Add it to the total distance
-                self._current_index = index
-                self._total_distance += new_dist
-
-                # And to the wrong one if outside route lanes
-                if self._outside_lane_active or self._wrong_lane_active:
-                    self._wrong_distance += new_dist
+            # And to the wrong one if outside route lanes
+            if self._outside_lane_active or self._wrong_lane_active:
+                self._wrong_distance += new_dist
 
         self.logger.debug("%s.update()[%s->%s]" % (self.__class__.__name__, self.status, new_status))
 
@@ -1133,8 +1125,8 @@ class OutsideRouteLanesTest(Criterion):
         Detects if the ego_vehicle is outside driving lanes
         """
 
-        current_driving_wp = self._map.get_waypoint(location, lane_type=carla.LaneType.Driving, project_to_road=True)
-        current_parking_wp = self._map.get_waypoint(location, lane_type=carla.LaneType.Parking, project_to_road=True)
+        current_driving_wp = CarlaDataProvider.get_waypoint(location)
+        current_parking_wp = CarlaDataProvider.get_waypoint(location, lane_type=carla.LaneType.Parking)
 
         driving_distance = location.distance(current_driving_wp.transform.location)
         if current_parking_wp is not None:  # Some towns have no parking
@@ -1156,7 +1148,7 @@ class OutsideRouteLanesTest(Criterion):
         Detects if the ego_vehicle has invaded a wrong lane
         """
 
-        current_waypoint = self._map.get_waypoint(location, lane_type=carla.LaneType.Driving, project_to_road=True)
+        current_waypoint = CarlaDataProvider.get_waypoint(location)
         current_lane_id = current_waypoint.lane_id
         current_road_id = current_waypoint.road_id
 
@@ -1268,7 +1260,7 @@ class WrongLaneTest(Criterion):
         if self._terminate_on_failure and (self.test_status == "FAILURE"):
             new_status = py_trees.common.Status.FAILURE
 
-        lane_waypoint = self._map.get_waypoint(self._actor.get_location())
+        lane_waypoint = CarlaDataProvider.get_waypoint(self._actor.get_location())
         current_lane_id = lane_waypoint.lane_id
         current_road_id = lane_waypoint.road_id
 
@@ -1358,7 +1350,7 @@ class WrongLaneTest(Criterion):
         """
         if not self._in_lane:
 
-            lane_waypoint = self._map.get_waypoint(self._actor.get_location())
+            lane_waypoint = CarlaDataProvider.get_waypoint(self._actor.get_location())
             current_lane_id = lane_waypoint.lane_id
             current_road_id = lane_waypoint.road_id
 
@@ -1462,11 +1454,13 @@ class InRouteTest(Criterion):
     - offroad_max: Maximum distance (in meters) the actor can deviate from the route
     - offroad_min: Maximum safe distance (in meters). Might eventually cause failure
     - terminate_on_failure [optional]: If True, the complete scenario will terminate upon failure of this test
+    - route_geometry [optional]: Precomputed RouteGeometry of the route. Built from the route if not given
     """
     MAX_ROUTE_PERCENTAGE = 30  # %
     WINDOWS_SIZE = 5  # Amount of additional waypoints checked
 
-    def __init__(self, actor, route, offroad_min=-1, offroad_max=30, name="InRouteTest", terminate_on_failure=False):
+    def __init__(self, actor, route, offroad_min=-1, offroad_max=30, name="InRouteTest", terminate_on_failure=False,
+                 route_geometry=None):
         """
         """
         super(InRouteTest, self).__init__(name, actor, 0, terminate_on_failure=terminate_on_failure)
@@ -1481,23 +1475,13 @@ class InRouteTest(Criterion):
             self._offroad_min = self._offroad_min
 
         self._world = CarlaDataProvider.get_world()
-        self._waypoints, _ = zip(*self._route)
-        self._route_length = len(self._route)
+        self._route_geometry = route_geometry if route_geometry is not None else RouteGeometry(route)
+        self._route_length = len(self._route_geometry)
         self._current_index = 0
         self._out_route_distance = 0
         self._in_safe_route = True
 
-        self._accum_meters = []
-        prev_wp = self._waypoints[0]
-        for i, wp in enumerate(self._waypoints):
-            d = wp.distance(prev_wp)
-            if i > 0:
-                accum = self._accum_meters[i - 1]
-            else:
-                accum = 0
-
-            self._accum_meters.append(d + accum)
-            prev_wp = wp
+        self._accum_meters = self._route_geometry.accum_meters
 
         # Blackboard variable
         blackv = py_trees.blackboard.Blackboard()
@@ -1520,17 +1504,9 @@ class InRouteTest(Criterion):
 
             off_route = True
 
-            shortest_distance = float('inf')
-            closest_index = -1
-
             # Get the closest distance
-            for index in range(self._current_index,
-                               min(self._current_index + self.WINDOWS_SIZE + 1, self._route_length)):
-                ref_waypoint = self._waypoints[index]
-                distance = math.sqrt(((location.x - ref_waypoint.x) ** 2) + ((location.y - ref_waypoint.y) ** 2))
-                if distance <= shortest_distance:
-                    closest_index = index
-                    shortest_distance = distance
+            closest_index, shortest_distance = self._route_geometry.closest_index(
+                location, self._current_index, self._current_index + self.WINDOWS_SIZE + 1)
 
             if closest_index == -1 or shortest_distance == float('inf'):
                 return new_status
@@ -1543,12 +1519,12 @@ class InRouteTest(Criterion):
             # If actor advanced a step, record the distance
             if self._current_index != closest_index:
 
-                new_dist = self._accum_meters[closest_index] - self._accum_meters[self._current_index]
+                new_dist = float(self._accum_meters[closest_index] - self._accum_meters[self._current_index])
 
                 # If too far from the route, add it and check if its value
                 if not self._in_safe_route:
                     self._out_route_distance += new_dist
-                    out_route_percentage = 100 * self._out_route_distance / self._accum_meters[-1]
+                    out_route_percentage = 100 * self._out_route_distance / self._route_geometry.length
                     if out_route_percentage > self.MAX_ROUTE_PERCENTAGE:
                         off_route = True
 
@@ -1590,36 +1566,28 @@ class RouteCompletionTest(Criterion):
     - actor: CARLA actor to be used for this test
     - route: Route to be checked
     - terminate_on_failure [optional]: If True, the complete scenario will terminate upon failure of this test
+    - route_geometry [optional]: Precomputed RouteGeometry of the route. Built from the route if not given
     """
     DISTANCE_THRESHOLD = 10.0  # meters
     WINDOWS_SIZE = 2
 
-    def __init__(self, actor, route, name="RouteCompletionTest", terminate_on_failure=False):
+    def __init__(self, actor, route, name="RouteCompletionTest", terminate_on_failure=False, route_geometry=None):
         """
         """
         super(RouteCompletionTest, self).__init__(name, actor, 100, terminate_on_failure=terminate_on_failure)
         self.logger.debug("%s.__init__()" % (self.__class__.__name__))
         self._actor = actor
         self._route = route
-        self._map = CarlaDataProvider.get_map()
+        self._route_geometry = route_geometry if route_geometry is not None else RouteGeometry(route)
 
         self._wsize = self.WINDOWS_SIZE
         self._current_index = 0
-        self._route_length = len(self._route)
-        self._waypoints, _ = zip(*self._route)
-        self.target = self._waypoints[-1]
-
-        self._accum_meters = []
-        prev_wp = self._waypoints[0]
-        for i, wp in enumerate(self._waypoints):
-            d = wp.distance(prev_wp)
-            if i > 0:
-                accum = self._accum_meters[i - 1]
-            else:
-                accum = 0
+        self._route_length = len(self._route_geometry)
+        self.target = self._route[-1][0]
+        if hasattr(self.target, 'location'):
+            self.target = self.target.location
 
-            self._accum_meters.append(d + accum)
-            prev_wp = wp
+        self._accum_meters = self._route_geometry.accum_meters
 
         self._traffic_event = TrafficEvent(event_type=TrafficEventType.ROUTE_COMPLETION)
         self.list_traffic_events.append(self._traffic_event)
@@ -1640,24 +1608,18 @@ class RouteCompletionTest(Criterion):
 
         elif self.test_status in ('RUNNING', 'INIT'):
 
-            for index in range(self._current_index, min(self._current_index + self._wsize + 1, self._route_length)):
-                # Get the dot product to know if it has passed this location
-                ref_waypoint = self._waypoints[index]
-                wp = self._map.get_waypoint(ref_waypoint)
-                wp_dir = wp.transform.get_forward_vector()          # Waypoint's forward vector
-                wp_veh = location - ref_waypoint                    # vector waypoint - vehicle
-                dot_ve_wp = wp_veh.x * wp_dir.x + wp_veh.y * wp_dir.y + wp_veh.z * wp_dir.z
-
-                if dot_ve_wp > 0:
-                    # good! segment completed!
-                    self._current_index = index
-                    self._percentage_route_completed = 100.0 * float(self._accum_meters[self._current_index]) \
-                        / float(self._accum_meters[-1])
-                    self._traffic_event.set_dict({
-                        'route_completed': self._percentage_route_completed})
-                    self._traffic_event.set_message(
-                        "Agent has completed > {:.2f}% of the route".format(
-                            self._percentage_route_completed))
+            passed_indices = self._route_geometry.passed_indices(
+                location, self._current_index, self._current_index + self._wsize + 1)
+            if len(passed_indices) > 0:
+                # good! segment completed!
+                self._current_index = int(passed_indices[-1])
+                self._percentage_route_completed = 100.0 * float(self._accum_meters[self._current_index]) \
+                    / self._route_geometry.length
+                self._traffic_event.set_dict({
+                    'route_completed': self._percentage_route_completed})
+                self._traffic_event.set_message(
+                    "Agent has completed > {:.2f}% of the route".format(
+                        self._percentage_route_completed))
 
             if self._percentage_route_completed > 99.0 and location.distance(self.target) < self.DISTANCE_THRESHOLD:
                 route_completion_event = TrafficEvent(event_type=TrafficEventType.ROUTE_COMPLETED)
@@ -1774,7 +1736,7 @@ class RunningRedLightTest(Criterion):
 
             for wp in waypoints:
 
-                tail_wp = self._map.get_waypoint(tail_far_pt)
+                tail_wp = CarlaDataProvider.get_waypoint(tail_far_pt)
 
                 # Calculate the dot product (Might be unscaled, as only its sign is important)
                 ve_dir = CarlaDataProvider.get_transform(self._actor).get_forward_vector()
@@ -1945,7 +1907,7 @@ class RunningStopTest(Criterion):
 
         # slower and accurate test based on waypoint's horizon and geometric test
         list_locations = [current_location]
-        waypoint = self._map.get_waypoint(current_location)
+        waypoint = CarlaDataProvider.get_waypoint(current_location)
         for _ in range(multi_step):
             if waypoint:
                 next_wps = waypoint.next(self.WAYPOINT_STEP)
@@ -1968,7 +1930,7 @@ class RunningStopTest(Criterion):
         ve_tra = CarlaDataProvider.get_transform(self._actor)
         ve_dir = ve_tra.get_forward_vector()
 
-        wp = self._map.get_waypoint(ve_tra.location)
+        wp = CarlaDataProvider.get_waypoint(ve_tra.location)
         wp_dir = wp.transform.get_forward_vector()
 
         dot_ve_wp = ve_dir.x * wp_dir.x + ve_dir.y * wp_dir.y + ve_dir.z * wp_dir.z
@@ -31,7 +31,7 @@ from agents.navigation.global_route_planner import GlobalRoutePlanner
 from srunner.scenariomanager.scenarioatomics.atomic_behaviors import calculate_distance
 from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.timer import GameTime
-from srunner.tools.scenario_helper import get_distance_along_route
+from srunner.tools.scenario_helper import RouteDistanceIndex
 
 import srunner.tools as sr_tools
 
@@ -131,8 +131,8 @@ class InTriggerDistanceToOSCPosition(AtomicCondition):
 
             if self._along_route:
                 # Global planner needs a location at a driving lane
-                actor_location = self._map.get_waypoint(actor_location).transform.location
-                osc_location = self._map.get_waypoint(osc_location).transform.location
+                actor_location = CarlaDataProvider.get_waypoint(actor_location).transform.location
+                osc_location = CarlaDataProvider.get_waypoint(osc_location).transform.location
 
             distance = calculate_distance(actor_location, osc_location, self._grp)
 
@@ -200,8 +200,8 @@ class InTimeToArrivalToOSCPosition(AtomicCondition):
 
         if self._along_route:
             # Global planner needs a location at a driving lane
-            actor_location = self._map.get_waypoint(actor_location).transform.location
-            target_location = self._map.get_waypoint(target_location).transform.location
+            actor_location = CarlaDataProvider.get_waypoint(actor_location).transform.location
+            target_location = CarlaDataProvider.get_waypoint(target_location).transform.location
 
         distance = calculate_distance(actor_location, target_location, self._grp)
 
@@ -743,7 +743,8 @@ class InTriggerDistanceToLocationAlongRoute(AtomicCondition):
         self._route = route
         self._distance = distance
 
-        self._location_distance, _ = get_distance_along_route(self._route, self._location)
+        self._route_index = RouteDistanceIndex(self._route)
+        self._location_distance, _ = self._route_index.get_distance(self._location)
 
     def update(self):
         new_status = py_trees.common.Status.RUNNING
@@ -755,7 +756,7 @@ class InTriggerDistanceToLocationAlongRoute(AtomicCondition):
 
         if current_location.distance(self._location) < self._distance + 20:
 
-            actor_distance, _ = get_distance_along_route(self._route, current_location)
+            actor_distance, _ = self._route_index.get_distance(current_location)
 
             # If closer than self._distance and hasn't passed the trigger point
             if (self._location_distance < actor_distance + self._distance and
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the TickProfiler, which measures how long each behaviour of
+a scenario tree spends in its update() method.
+It shall be used from the ScenarioManager only.
+"""
+
+from __future__ import print_function
+
+import json
+from timeit import default_timer
+
+import numpy as np
+from tabulate import tabulate
+
+
+class TickProfiler(object):
+
+    """
+    Wraps the update() method of the given behaviours to record their wall time.
+
+    Args:
+        nodes (list(py_trees.behaviour.Behaviour)): behaviours to be profiled
+
+    Attributes:
+        ticks (int): number of profiled ticks of the tree
+        tick_time (float): total wall time of the profiled ticks [seconds]
+    """
+
+    def __init__(self, nodes):
+        self.ticks = 0
+        self.tick_time = 0.0
+        self._tick_start = None
+        self._nodes = []
+        self._durations = {}
+        self._active_ticks = {}
+        self._last_active_tick = {}
+
+        for node in nodes:
+            if id(node) in self._durations:
+                continue
+            self._nodes.append(node)
+            self._durations[id(node)] = []
+            self._active_ticks[id(node)] = 0
+            self._last_active_tick[id(node)] = -1
+            node.update = self._wrap_update(node, node.update)
+
+    def _wrap_update(self, node, update):
+        """
+        Returns an update() function that times the original one
+        """
+        durations = self._durations[id(node)]
+
+        def timed_update():
+            """
+            Profiled update() of the behaviour
+            """
+            start = default_timer()
+            status = update()
+            durations.append(default_timer() - start)
+
+            if self._last_active_tick[id(node)] != self.ticks:
+                self._last_active_tick[id(node)] = self.ticks
+                self._active_ticks[id(node)] += 1
+            return status
+
+        return timed_update
+
+    def detach(self):
+        """
+        Restore the original update() methods of the behaviours
+        """
+        for node in self._nodes:
+            if 'update' in node.__dict__:
+                del node.update
+
+    def start_tick(self):
+        """
+        To be called right before ticking the tree
+        """
+        self._tick_start = default_timer()
+
+    def end_tick(self):
+        """
+        To be called right after ticking the tree
+        """
+        if self._tick_start is None:
+            return
+        self.tick_time += default_timer() - self._tick_start
+        self._tick_start = None
+        self.ticks += 1
+
+    def get_statistics(self):
+        """
+        Returns a list of dictionaries with the statistics of each behaviour,
+        sorted by their total time in decreasing order
+        """
+        statistics = []
+        for node in self._nodes:
+            durations = np.array(self._durations[id(node)])
+            count = len(durations)
+            total = float(durations.sum()) if count else 0.0
+            statistics.append({
+                "name": node.name,
+                "type": node.__class__.__name__,
+                "count": count,
+                "runs_per_tick": float(count) / self.ticks if self.ticks else 0.0,
+                "active_ticks": self._active_ticks[id(node)],
+                "total": total,
+                "mean": total / count if count else 0.0,
+                "p95": float(np.percentile(durations, 95)) if count else 0.0,
+                "max": float(durations.max()) if count else 0.0,
+                "share": total / self.tick_time if self.tick_time else 0.0
+            })
+
+        statistics.sort(key=lambda node_statistics: node_statistics["total"], reverse=True)
+        return statistics
+
+    def write(self, filename):
+        """
+        Write the ranked statistics of all the behaviours to a JSON file
+        """
+        report = {
+            "ticks": self.ticks,
+            "tick_time": self.tick_time,
+            "mean_tick_time": self.tick_time / self.ticks if self.ticks else 0.0,
+            "nodes": self.get_statistics()
+        }
+        with open(filename, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=4)
+
+    def create_output_text(self, max_nodes=20):
+        """
+        Creates a table with the behaviours that spent the most time ticking
+        """
+        header = ['Behaviour', 'Type', 'Count', 'Runs / Tick', 'Mean [ms]', 'P95 [ms]', 'Max [ms]', 'Share']
+        list_statistics = [header]
+        for node_statistics in self.get_statistics()[:max_nodes]:
+            list_statistics.append([
+                node_statistics["name"],
+                node_statistics["type"],
+                node_statistics["count"],
+                round(node_statistics["runs_per_tick"], 3),
+                round(1000 * node_statistics["mean"], 3),
+                round(1000 * node_statistics["p95"], 3),
+                round(1000 * node_statistics["max"], 3),
+                "{:.1%}".format(node_statistics["share"])
+            ])
+
+        output = "\n > Tick profile ({} ticks, {} ms per tick)\n".format(
+            self.ticks, round(1000 * self.tick_time / self.ticks, 3) if self.ticks else 0.0)
+        output += tabulate(list_statistics, tablefmt='fancy_grid')
+        output += "\n"
+        return output
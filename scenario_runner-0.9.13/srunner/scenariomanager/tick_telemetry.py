@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the TickTelemetry, which keeps the timing of the last ticks of a
+scenario in a ring buffer and flushes it to a CSV / JSONL file or to a statsd server.
+It shall be used from the ScenarioManager only.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import socket
+from timeit import default_timer
+
+import numpy as np
+
+
+class TickTelemetry(object):
+
+    """
+    Per tick timing of the ScenarioManager, split into the different stages of a tick.
+
+    The records are stored in a preallocated ring buffer, which is flushed to the target
+    when it is full and at the end of each scenario.
+
+    Args:
+        target (str): where the telemetry is sent. Either 'udp://host:port' for a statsd server,
+            or the path of a file, written as JSON lines if it ends in '.jsonl' and as CSV otherwise
+        capacity (int): number of ticks kept in the ring buffer
+
+    Attributes:
+        real_time_factor (float): game time over wall time, since the start of the scenario
+    """
+
+    STAGES = ('carla_tick', 'agent', 'apply_control', 'tick_once', 'world_tick')
+    COLUMNS = ('frame', 'game_time', 'wall_time') + STAGES + ('real_time_factor',)
+
+    def __init__(self, target, capacity=1000):
+        self._buffer = np.zeros((capacity, len(self.COLUMNS)))
+        self._size = 0
+        self._scenario = None
+        self._start_wall_time = None
+        self._start_game_time = None
+        self.real_time_factor = 0.0
+
+        if target.startswith('udp://'):
+            host, port = target[len('udp://'):].rsplit(':', 1)
+            self._sink = _StatsdSink(host, int(port))
+        else:
+            self._sink = _FileSink(target)
+
+    def start(self, scenario_name, repetition=0):
+        """
+        Start recording the ticks of a new scenario. The repetition is part of the scenario label,
+        so that the repetitions of a scenario can be told apart
+        """
+        self.flush()
+        self._scenario = "{}_rep{}".format(scenario_name, repetition)
+        self._start_wall_time = None
+        self._start_game_time = None
+        self.real_time_factor = 0.0
+
+    def record(self, frame, game_time, durations):
+        """
+        Add the durations [seconds] of the stages of a tick, in the order of TickTelemetry.STAGES
+        """
+        wall_time = default_timer()
+        if self._start_wall_time is None:
+            self._start_wall_time = wall_time
+            self._start_game_time = game_time
+
+        elapsed_wall_time = wall_time - self._start_wall_time
+        if elapsed_wall_time > 0:
+            self.real_time_factor = (game_time - self._start_game_time) / elapsed_wall_time
+
+        row = self._buffer[self._size]
+        row[0] = frame
+        row[1] = game_time
+        row[2] = elapsed_wall_time
+        row[3:3 + len(durations)] = durations
+        row[-1] = self.real_time_factor
+        self._size += 1
+
+        if self._size == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """
+        Send the buffered ticks to the target and empty the buffer
+        """
+        if self._size == 0:
+            return
+        self._sink.write(self._scenario, self.COLUMNS, self._buffer[:self._size])
+        self._size = 0
+
+    def close(self):
+        """
+        Flush the remaining ticks and release the target
+        """
+        self.flush()
+        self._sink.close()
+
+
+def get_worker_target(target, worker_name):
+    """
+    Returns the telemetry target of a worker process, so that workers never write to the same file.
+    statsd targets are shared, as every tick is sent as its own packets
+    """
+    if not target or target.startswith('udp://'):
+        return target
+    root, extension = os.path.splitext(target)
+    return "{}_{}{}".format(root, worker_name.replace(':', '_'), extension)
+
+
+class _FileSink(object):
+
+    """
+    Appends the telemetry to a CSV or JSON lines file
+    """
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._jsonl = filename.endswith('.jsonl')
+        self._header_written = self._jsonl
+
+    def write(self, scenario, columns, rows):
+        """
+        Append the rows of a scenario to the file
+        """
+        if not self._header_written:
+            # Only the process creating the file writes the header
+            try:
+                with open(self._filename, 'x', encoding='utf-8') as fd:
+                    fd.write(','.join(('scenario',) + columns) + '\n')
+            except FileExistsError:
+                pass
+            self._header_written = True
+
+        with open(self._filename, 'a', encoding='utf-8') as fd:
+            for row in rows.tolist():
+                if self._jsonl:
+                    entry = dict(zip(columns, row))
+                    entry['scenario'] = scenario
+                    entry['frame'] = int(entry['frame'])
+                    fd.write(json.dumps(entry) + '\n')
+                else:
+                    fd.write('{},{:d},{}\n'.format(scenario, int(row[0]), ','.join(repr(value) for value in row[1:])))
+
+    def close(self):
+        """
+        Nothing to release, the file is only open while writing
+        """
+
+
+class _StatsdSink(object):
+
+    """
+    Sends the telemetry as statsd timings (in ms) and gauges over UDP, without waiting for any answer
+    """
+
+    PACKET_SIZE = 1400
+
+    def __init__(self, host, port):
+        self._address = (host, port)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def write(self, scenario, columns, rows):
+        """
+        Send the stage timings of every tick and the last real time factor of the scenario
+        """
+        prefix = 'scenario_runner.{}'.format(scenario).replace(' ', '_')
+        stages = [(i, column) for i, column in enumerate(columns) if column in TickTelemetry.STAGES]
+
+        metrics = []
+        for row in rows.tolist():
+            for i, column in stages:
+                metrics.append('{}.{}:{:.3f}|ms'.format(prefix, column, 1000 * row[i]))
+        metrics.append('{}.real_time_factor:{:.3f}|g'.format(prefix, rows[-1, -1]))
+
+        packet = ''
+        for metric in metrics:
+            if packet and len(packet) + len(metric) + 1 > self.PACKET_SIZE:
+                self._send(packet)
+                packet = ''
+            packet = packet + '\n' + metric if packet else metric
+        self._send(packet)
+
+    def _send(self, packet):
+        """
+        Send a packet, dropping it if the socket isn't ready
+        """
+        try:
+            self._socket.sendto(packet.encode('utf-8'), self._address)
+        except (socket.error, OSError):
+            pass
+
+    def close(self):
+        """
+        Close the socket
+        """
+        self._socket.close()
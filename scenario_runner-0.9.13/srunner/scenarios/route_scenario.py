@@ -31,6 +31,7 @@ from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
 from srunner.scenariomanager.scenarioatomics.atomic_behaviors import Idle, ScenarioTriggerer
 from srunner.scenarios.basic_scenario import BasicScenario
 from srunner.tools.route_parser import RouteParser, TRIGGER_THRESHOLD, TRIGGER_ANGLE_THRESHOLD
+from srunner.tools.route_geometry import RouteGeometry
 from srunner.tools.route_manipulation import interpolate_trajectory
 from srunner.tools.py_trees_port import oneshot_behavior
 
@@ -164,6 +165,7 @@ class RouteScenario(BasicScenario):
 
         self.config = config
         self.route = None
+        self.route_geometry = None
         self.sampled_scenarios_definitions = None
 
         self._update_route(world, config, debug_mode)
@@ -208,6 +210,7 @@ class RouteScenario(BasicScenario):
         potential_scenarios_definitions, _ = RouteParser.scan_route_for_scenarios(config.town, route, world_annotations)
 
         self.route = route
+        self.route_geometry = RouteGeometry(self.route)
         CarlaDataProvider.set_ego_vehicle_route(convert_transform_to_location(self.route))
 
         if config.agent is not None:
@@ -515,11 +518,14 @@ class RouteScenario(BasicScenario):
         route_criterion = InRouteTest(self.ego_vehicles[0],
                                       route=route,
                                       offroad_max=30,
-                                      terminate_on_failure=True)
+                                      terminate_on_failure=True,
+                                      route_geometry=self.route_geometry)
 
-        completion_criterion = RouteCompletionTest(self.ego_vehicles[0], route=route)
+        completion_criterion = RouteCompletionTest(self.ego_vehicles[0], route=route,
+                                                   route_geometry=self.route_geometry)
 
-        outsidelane_criterion = OutsideRouteLanesTest(self.ego_vehicles[0], route=route)
+        outsidelane_criterion = OutsideRouteLanesTest(self.ego_vehicles[0], route=route,
+                                                      route_geometry=self.route_geometry)
 
         red_light_criterion = RunningRedLightTest(self.ego_vehicles[0])
 
@@ -148,6 +148,9 @@ class Map:
     def get_topology(self):
         return []
 
+    def to_opendrive(self):
+        return ""
+
 
 class TrafficLightState:
     Red = 0
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides some basic unit tests for the OpenSCENARIO parameter references of ScenarioRunner
+"""
+
+from unittest import TestCase
+import xml.etree.ElementTree as ET
+from srunner.tools.openscenario_catalog_cache import CatalogEntry
+from srunner.tools.openscenario_parameters import LITERAL, PARAMETER, get_reference_kind, get_tokens, substitute
+
+
+CATALOG_ENTRY = """
+<Vehicle name="car" vehicleCategory="$Category">
+  <ParameterDeclarations>
+    <ParameterDeclaration name="Speed" parameterType="double" value="10"/>
+    <ParameterDeclaration name="SpeedMax" parameterType="double" value="20"/>
+  </ParameterDeclarations>
+  <Performance maxSpeed="$SpeedMax" maxAcceleration="$Speed" maxDeceleration="5"/>
+  <Properties>
+    <Property name="type" value="ego_vehicle"/>
+  </Properties>
+</Vehicle>
+"""
+
+
+class TestParameterReferences(TestCase):
+    """
+    Test class for the resolution of the OpenSCENARIO parameter references
+    """
+
+    def test_get_tokens(self):
+        """
+        Split values into text and parameter names, matching whole names only
+        """
+        self.assertIsNone(get_tokens("10.0"))
+        self.assertIsNone(get_tokens("$"))
+        self.assertEqual(get_tokens("$Speed"), ("", "Speed", ""))
+        self.assertEqual(get_tokens("$SpeedMax"), ("", "SpeedMax", ""))
+        self.assertEqual(get_tokens("a$Speed-$Lane_1"), ("a", "Speed", "-", "Lane_1", ""))
+
+    def test_substitute(self):
+        """
+        Replace the assigned parameters, and keep the references to the unassigned ones
+        """
+        parameters = {"Speed": "10", "SpeedMax": "20"}
+        self.assertEqual(substitute(get_tokens("$SpeedMax"), parameters), "20")
+        self.assertEqual(substitute(get_tokens("$Speed/$SpeedMax"), parameters), "10/20")
+        self.assertEqual(substitute(get_tokens("$SpeedMax"), {"Speed": "10"}), "$SpeedMax")
+        self.assertEqual(substitute(get_tokens("$Other+$Speed"), parameters), "$Other+10")
+
+    def test_get_reference_kind(self):
+        """
+        Tell literals from parameter references
+        """
+        self.assertEqual(get_reference_kind("10"), LITERAL)
+        self.assertEqual(get_reference_kind("-1.5"), LITERAL)
+        self.assertEqual(get_reference_kind("$Speed"), PARAMETER)
+        self.assertEqual(get_reference_kind("$Speed_2"), PARAMETER)
+        self.assertIsNone(get_reference_kind("$Speed+1"))
+        self.assertIsNone(get_reference_kind("Speed"))
+
+    def test_catalog_entry_instantiate(self):
+        """
+        Instantiate a catalog entry with the declared and assigned parameters, leaving the entry unmodified
+        """
+        entry = CatalogEntry(ET.fromstring(CATALOG_ENTRY))
+        self.assertEqual(entry.parameters, {"Speed": "10", "SpeedMax": "20"})
+
+        instance = entry.instantiate({})
+        performance = instance.find("Performance")
+        self.assertEqual(performance.attrib["maxSpeed"], "20")
+        self.assertEqual(performance.attrib["maxAcceleration"], "10")
+        self.assertEqual(performance.attrib["maxDeceleration"], "5")
+        self.assertEqual(instance.attrib["vehicleCategory"], "$Category")
+
+        instance = entry.instantiate({"Speed": "15", "Category": "car"})
+        performance = instance.find("Performance")
+        self.assertEqual(performance.attrib["maxSpeed"], "20")
+        self.assertEqual(performance.attrib["maxAcceleration"], "15")
+        self.assertEqual(instance.attrib["vehicleCategory"], "car")
+
+        self.assertEqual(entry.element.find("Performance").attrib["maxAcceleration"], "$Speed")
+        self.assertIs(instance.find("Properties"), entry.element.find("Properties"))
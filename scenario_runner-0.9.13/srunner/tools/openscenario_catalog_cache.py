@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a process wide cache of the OpenSCENARIO catalogs, so that the catalogs
+shared by several OpenSCENARIO files are only parsed and validated once
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+from srunner.tools.openscenario_schema import OpenScenarioSchema
+from srunner.tools.openscenario_parameters import get_tokens, substitute
+
+# Parsed catalogs, by absolute path, with the modification time of their file
+_catalogs = {}
+
+
+class CatalogEntry(object):
+
+    """
+    Entry of a catalog, kept unmodified as the template of its instances.
+
+    The elements with parameter references in their attributes are found and tokenized once, so that
+    an instance only copies those elements and their ancestors. All the other elements are shared with the
+    catalog, which is why the instances must not be modified.
+
+    Args:
+        element (xml.etree.ElementTree.Element): entry in the catalog file
+
+    Attributes:
+        name (str): name of the entry
+        parameters (dict): default values of the parameters declared in the entry
+    """
+
+    def __init__(self, element):
+        self.element = element
+        self.name = element.attrib.get("name")
+
+        self.parameters = {}
+        for elem in element.iter():
+            declarations = elem.find('ParameterDeclarations')
+            if declarations is not None:
+                for parameter in declarations:
+                    self.parameters[parameter.attrib.get('name')] = parameter.attrib.get('value')
+
+        self._template = self._compile(element)
+
+    @staticmethod
+    def _compile(element):
+        """
+        Returns the template of an element as (element, tokens of its parameterized attributes, child templates),
+        or None if neither the element nor its children have parameter references
+        """
+        children = [CatalogEntry._compile(child) for child in element]
+        attributes = [(key, get_tokens(value)) for key, value in element.attrib.items() if get_tokens(value)]
+        if not attributes and all(child is None for child in children):
+            return None
+        return element, attributes, children
+
+    def instantiate(self, parameter_assignments):
+        """
+        Returns the entry with its parameter references replaced by the assigned values,
+        or the declared ones for the parameters without an assignment
+        """
+        if self._template is None:
+            return self.element
+
+        parameters = dict(self.parameters)
+        parameters.update(parameter_assignments)
+        return self._instantiate(self._template, parameters)
+
+    def _instantiate(self, template, parameters):
+        """
+        Returns a copy of the element of the template, with its parameter references replaced
+        """
+        element, attributes, children = template
+        instance = ET.Element(element.tag, element.attrib)
+        instance.text = element.text
+        instance.tail = element.tail
+
+        for key, tokens in attributes:
+            instance.attrib[key] = substitute(tokens, parameters)
+
+        for child, child_template in zip(element, children):
+            if child_template is not None:
+                child = self._instantiate(child_template, parameters)
+            instance.append(child)
+
+        return instance
+
+
+class Catalog(object):
+
+    """
+    Catalog file, parsed and validated against the OpenSCENARIO XSD
+
+    Args:
+        filename (str): path of the catalog file
+
+    Attributes:
+        name (str): name of the catalog
+        entries (dict): CatalogEntry of each entry name
+    """
+
+    def __init__(self, filename):
+        xml_tree = ET.parse(filename)
+        OpenScenarioSchema.validate(xml_tree, filename)
+
+        catalog = xml_tree.find("Catalog")
+        self.name = catalog.attrib.get("name")
+        self.entries = {}
+        for entry in catalog:
+            self.entries[entry.attrib.get("name")] = CatalogEntry(entry)
+
+
+def get_catalog(filename):
+    """
+    Returns the Catalog of a file, only parsing it if it isn't in the cache or was modified since
+    """
+    path = os.path.abspath(filename)
+    mtime = os.path.getmtime(path)
+
+    cached = _catalogs.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, Catalog(path))
+        _catalogs[path] = cached
+    return cached[1]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the resolution of the OpenSCENARIO parameter references ($name).
+The attribute values are split into literal text and parameter references once, so that
+resolving them is a single lookup per reference
+"""
+
+import re
+
+LITERAL_PATTERN = re.compile(r"(-)?\d+(\.\d*)?")
+PARAMETER_PATTERN = re.compile(r"[$][A-Za-z_][\w]*")
+PARAMETER_REFERENCE_PATTERN = re.compile(r"[$]([A-Za-z_][\w]*)")
+
+# Kinds of reference text, see get_reference_kind()
+LITERAL = 'literal'
+PARAMETER = 'parameter'
+
+_tokens = {}
+_reference_kinds = {}
+
+
+def get_tokens(value):
+    """
+    Returns the value split into (text, name, text, name, ..., text), with the names of the
+    referenced parameters at the odd positions, or None if the value has no parameter reference
+    """
+    if '$' not in value:
+        return None
+
+    try:
+        return _tokens[value]
+    except KeyError:
+        pass
+
+    tokens = tuple(PARAMETER_REFERENCE_PATTERN.split(value))
+    if len(tokens) == 1:
+        tokens = None
+
+    _tokens[value] = tokens
+    return tokens
+
+
+def substitute(tokens, parameters):
+    """
+    Returns the value of the tokens, with the references to the given parameters replaced by their values.
+    The references to other parameters are kept
+    """
+    parts = list(tokens)
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        if name in parameters:
+            parts[i] = parameters[name]
+        else:
+            parts[i] = "$" + name
+    return ''.join(parts)
+
+
+def get_reference_kind(reference_text):
+    """
+    Returns LITERAL if the text is a number, PARAMETER if it is a parameter reference, and None otherwise
+    """
+    try:
+        return _reference_kinds[reference_text]
+    except KeyError:
+        pass
+
+    kind = None
+    if LITERAL_PATTERN.fullmatch(reference_text):
+        kind = LITERAL
+    elif PARAMETER_PATTERN.fullmatch(reference_text):
+        kind = PARAMETER
+
+    _reference_kinds[reference_text] = kind
+    return kind
@@ -12,8 +12,6 @@ This module provides a parser for scenario configuration files based on OpenSCEN
 from __future__ import print_function
 
 from distutils.util import strtobool
-import re
-import copy
 import datetime
 import math
 import operator
@@ -70,6 +68,7 @@ from srunner.scenariomanager.scenarioatomics.atomic_trigger_conditions import (I
                                                                                WaitForTrafficLightState,
                                                                                CheckParameter)
 from srunner.scenariomanager.timer import TimeOut, SimulationTimeCondition
+from srunner.tools.openscenario_parameters import LITERAL, PARAMETER, get_reference_kind
 from srunner.tools.py_trees_port import oneshot_behavior
 from srunner.tools.scenario_helper import get_offset_transform, get_troad_from_transform
 
@@ -102,31 +101,22 @@ class ParameterRef:
         """
         Returns: True when text is a literal/number
         """
-        return self._is_matching(pattern=r"(-)?\d+(\.\d*)?")
+        return get_reference_kind(self.reference_text) == LITERAL
 
     def is_parameter(self) -> bool:
         """
         Returns: True when text is a parameter
         """
-        return self._is_matching(pattern=r"[$][A-Za-z_][\w]*")
-
-    def _is_matching(self, pattern: str) -> bool:
-        """
-        Returns: True when pattern is matching with text
-        """
-        match = re.search(pattern, self.reference_text)
-        if match is not None:
-            matching_string = match.group()
-            return matching_string == self.reference_text
-        return False
+        return get_reference_kind(self.reference_text) == PARAMETER
 
     def get_interpreted_value(self):
         """
         Returns: interpreted value from reference_text
         """
-        if self.is_literal():
+        kind = get_reference_kind(self.reference_text)
+        if kind == LITERAL:
             value = self.reference_text
-        elif self.is_parameter():
+        elif kind == PARAMETER:
             value = CarlaDataProvider.get_osc_global_param_value(self.reference_text)
             if value is None:
                 raise Exception("Parameter '{}' is not defined".format(self.reference_text[1:]))
@@ -355,60 +345,23 @@ class OpenScenarioParser(object):
         Get catalog entry referenced by catalog_reference included correct parameter settings
 
         Args:
-            catalogs (Dictionary of dictionaries): List of all catalogs and their entries
+            catalogs (Dictionary of dictionaries): List of all catalogs and their entries (CatalogEntry)
             catalog_reference (XML ElementTree): Reference containing the exact catalog to be used
 
         returns:
-            Catalog entry (XML ElementTree)
+            Catalog entry (XML ElementTree), which shares its unparameterized elements with the catalog
+            and must not be modified
         """
         entry_name = str(ParameterRef(catalog_reference.attrib.get("entryName")))
         entry = catalogs[catalog_reference.attrib.get("catalogName")][entry_name]
-        entry_copy = copy.deepcopy(entry)
-        catalog_copy = copy.deepcopy(catalog_reference)
-        entry = OpenScenarioParser.assign_catalog_parameters(entry_copy, catalog_copy)
-
-        return entry
-
-    @staticmethod
-    def assign_catalog_parameters(entry_instance, catalog_reference):
-        """
-        Parse catalog_reference, and replace all parameter references
-        in entry_instance by the values provided in catalog_reference.
-
-        Not to be used from outside this class.
 
-        Args:
-            entry_instance (XML ElementTree): Entry to be updated
-            catalog_reference (XML ElementTree): Reference containing the exact parameter values
-
-        returns:
-            updated entry_instance with updated parameter values
-        """
-
-        parameter_dict = {}
-        for elem in entry_instance.iter():
-            if elem.find('ParameterDeclarations') is not None:
-                parameters = elem.find('ParameterDeclarations')
-                for parameter in parameters:
-                    name = parameter.attrib.get('name')
-                    value = parameter.attrib.get('value')
-                    parameter_dict[name] = value
-
-        for parameter_assignments in catalog_reference.iter("ParameterAssignments"):
-            for parameter_assignment in parameter_assignments.iter("ParameterAssignment"):
+        parameter_assignments = {}
+        for parameter_assignments_node in catalog_reference.iter("ParameterAssignments"):
+            for parameter_assignment in parameter_assignments_node.iter("ParameterAssignment"):
                 parameter = parameter_assignment.attrib.get("parameterRef")
-                value = parameter_assignment.attrib.get("value")
-                parameter_dict[parameter] = value
-
-        for node in entry_instance.iter():
-            for key in node.attrib:
-                for param in sorted(parameter_dict, key=len, reverse=True):
-                    if "$" + param in node.attrib[key]:
-                        node.attrib[key] = node.attrib[key].replace("$" + param, parameter_dict[param])
-
-        OpenScenarioParser.set_parameters(entry_instance, OpenScenarioParser.global_osc_parameters)
+                parameter_assignments[parameter] = parameter_assignment.attrib.get("value")
 
-        return entry_instance
+        return entry.instantiate(parameter_assignments)
 
     @staticmethod
     def get_friction_from_env_action(xml_tree, catalogs):
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the OpenSCENARIO 1.0 XSD schema, compiled once per process and
+optionally pickled to a cache directory, and the validation of the OpenSCENARIO files against it
+"""
+
+from __future__ import print_function
+
+import hashlib
+import os
+import pickle
+
+import xmlschema
+
+XSD_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../openscenario/OpenSCENARIO.xsd")
+
+# Validation modes: every file, only the files whose content wasn't validated before, or none
+VALIDATE_ALWAYS = 'always'
+VALIDATE_ONCE = 'once'
+VALIDATE_SKIP = 'skip'
+
+# File with the hashes of the validated files, in the cache directory
+VALIDATED_FILE = 'validated.txt'
+
+
+class OpenScenarioSchema(object):
+
+    """
+    This class provides the OpenSCENARIO 1.0 XSD schema, compiled once per process,
+    and the validation of the OpenSCENARIO files against it.
+
+    The compiled schema and the hashes of the validated files are optionally kept in a cache directory,
+    so that they are shared by processes too.
+    """
+
+    _schema = None
+    _xsd_hash = None
+    _validated = None
+    _cache_dir = None
+    _validation_mode = VALIDATE_ALWAYS
+
+    @staticmethod
+    def set_cache_dir(cache_dir):
+        """
+        Set the directory where the compiled schema and the hashes of the validated files are kept.
+        None disables the on-disk cache
+        """
+        OpenScenarioSchema._cache_dir = cache_dir
+        OpenScenarioSchema._validated = None
+
+    @staticmethod
+    def set_validation_mode(mode):
+        """
+        Set the validation mode, one of VALIDATE_ALWAYS, VALIDATE_ONCE and VALIDATE_SKIP
+        """
+        if mode not in (VALIDATE_ALWAYS, VALIDATE_ONCE, VALIDATE_SKIP):
+            raise ValueError("Unknown OpenSCENARIO validation mode '{}'".format(mode))
+        OpenScenarioSchema._validation_mode = mode
+
+    @staticmethod
+    def _get_xsd_hash():
+        """
+        Returns the hash of the XSD file, which identifies the compiled schema
+        """
+        xsd_hash = OpenScenarioSchema._xsd_hash
+        if xsd_hash is None:
+            with open(XSD_FILE, 'rb') as fd:
+                xsd_hash = hashlib.sha1(fd.read()).hexdigest()
+            OpenScenarioSchema._xsd_hash = xsd_hash
+        return xsd_hash
+
+    @staticmethod
+    def get_schema():
+        """
+        Returns the compiled XSD schema, only building it if there isn't one already in memory,
+        or in the on-disk cache if set_cache_dir() was used
+        """
+        if OpenScenarioSchema._schema is not None:
+            return OpenScenarioSchema._schema
+
+        filename = None
+        if OpenScenarioSchema._cache_dir:
+            filename = os.path.join(OpenScenarioSchema._cache_dir, "OpenSCENARIO_{}_{}.pkl".format(
+                OpenScenarioSchema._get_xsd_hash()[:16], xmlschema.__version__))
+            OpenScenarioSchema._schema = OpenScenarioSchema._load_schema(filename)
+
+        if OpenScenarioSchema._schema is None:
+            OpenScenarioSchema._schema = xmlschema.XMLSchema(XSD_FILE)
+            if filename is not None:
+                OpenScenarioSchema._save_schema(OpenScenarioSchema._schema, filename)
+
+        return OpenScenarioSchema._schema
+
+    @staticmethod
+    def _load_schema(filename):
+        """
+        Load a schema pickled by _save_schema, or return None if there is no valid one
+        """
+        if not os.path.isfile(filename):
+            return None
+
+        try:
+            with open(filename, 'rb') as fd:
+                return pickle.load(fd)
+        except Exception as e:  # pylint: disable=broad-except
+            print("WARNING: Could not load the OpenSCENARIO schema from {}: {}".format(filename, e))
+            return None
+
+    @staticmethod
+    def _save_schema(schema, filename):
+        """
+        Pickle the compiled schema, through a temporary file so that other processes never read a partial one
+        """
+        try:
+            if not os.path.isdir(OpenScenarioSchema._cache_dir):
+                os.makedirs(OpenScenarioSchema._cache_dir)
+            temp_filename = "{}.tmp{}".format(filename, os.getpid())
+            with open(temp_filename, 'wb') as fd:
+                pickle.dump(schema, fd, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_filename, filename)
+        except (OSError, pickle.PicklingError) as e:
+            print("WARNING: Could not save the OpenSCENARIO schema to {}: {}".format(filename, e))
+
+    @staticmethod
+    def _get_validated():
+        """
+        Returns the set with the hashes of the validated files, read from the cache directory if set
+        """
+        validated = OpenScenarioSchema._validated
+        if validated is None:
+            validated = set()
+            cache_dir = OpenScenarioSchema._cache_dir
+            if cache_dir and os.path.isfile(os.path.join(cache_dir, VALIDATED_FILE)):
+                with open(os.path.join(cache_dir, VALIDATED_FILE), 'r', encoding='utf-8') as fd:
+                    validated.update(line.strip() for line in fd)
+            OpenScenarioSchema._validated = validated
+        return validated
+
+    @staticmethod
+    def _add_validated(file_hash):
+        """
+        Remember that a file was validated, in the cache directory too if set
+        """
+        OpenScenarioSchema._get_validated().add(file_hash)
+        cache_dir = OpenScenarioSchema._cache_dir
+        if cache_dir:
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                with open(os.path.join(cache_dir, VALIDATED_FILE), 'a', encoding='utf-8') as fd:
+                    fd.write(file_hash + '\n')
+            except OSError as e:
+                print("WARNING: Could not save the validated OpenSCENARIO files to {}: {}".format(cache_dir, e))
+
+    @staticmethod
+    def validate(xml_tree, filename):
+        """
+        Validate the parsed OpenSCENARIO file against the 1.0 XSD, according to the validation mode.
+        With VALIDATE_ONCE, a file is skipped if its content was already validated against the same XSD
+
+        Note: This will throw if the file is not valid
+        """
+        if OpenScenarioSchema._validation_mode == VALIDATE_SKIP:
+            return
+
+        file_hash = None
+        if OpenScenarioSchema._validation_mode == VALIDATE_ONCE:
+            file_hash = hashlib.sha1(OpenScenarioSchema._get_xsd_hash().encode('utf-8'))
+            with open(filename, 'rb') as fd:
+                file_hash.update(fd.read())
+            file_hash = file_hash.hexdigest()
+            if file_hash in OpenScenarioSchema._get_validated():
+                return
+
+        OpenScenarioSchema.get_schema().validate(xml_tree)
+
+        if file_hash is not None:
+            OpenScenarioSchema._add_validated(file_hash)
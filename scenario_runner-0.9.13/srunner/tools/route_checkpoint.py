@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the RouteCheckpoint, which keeps track of the progress of a route
+evaluation so that an interrupted run can be resumed
+"""
+
+from __future__ import print_function
+
+import json
+import os
+
+
+class RouteCheckpoint(object):
+
+    """
+    Results of the (route id, repetition) jobs of a route file, saved to disk after each job.
+
+    The file is replaced atomically, so that a crash while writing it never loses the
+    progress made so far. Jobs that could not be executed are kept with the results,
+    but are not considered finished, so that resuming runs them again.
+
+    Args:
+        filename (str): path of the checkpoint file
+        routes_file (str): route file being evaluated
+        resume (bool): if True, load the results of a previous run of the same route file
+        scenario_file (str): scenario file the routes are evaluated with
+        repetitions (int): number of repetitions of each route
+    """
+
+    def __init__(self, filename, routes_file, resume=False, scenario_file=None, repetitions=None):
+        self.filename = filename
+        self.routes_file = routes_file
+        self.scenario_file = scenario_file
+        self.repetitions = repetitions
+        self._records = {}
+
+        if resume:
+            self._load()
+
+    def _load(self):
+        """
+        Load the results of a previous run, if it evaluated the same route file,
+        with the same scenario file and number of repetitions
+        """
+        if not os.path.isfile(self.filename):
+            print("No checkpoint found at {}, starting from the first route".format(self.filename))
+            return
+
+        with open(self.filename, 'r', encoding='utf-8') as fd:
+            checkpoint = json.load(fd)
+
+        if checkpoint.get("routes_file") != self.routes_file:
+            print("WARNING: Ignoring checkpoint {}, it belongs to the route file {}".format(
+                self.filename, checkpoint.get("routes_file")))
+            return
+
+        for key in ("scenario_file", "repetitions"):
+            if checkpoint.get(key) != getattr(self, key):
+                print("WARNING: Ignoring checkpoint {}, it was run with {} {} instead of {}".format(
+                    self.filename, key, checkpoint.get(key), getattr(self, key)))
+                return
+
+        for record in checkpoint.get("results", []):
+            self._records[(record["route_id"], record["repetition"])] = record
+
+        print("Resuming from {}: {} route jobs already finished".format(
+            self.filename, sum(1 for record in self._records.values() if record["executed"])))
+
+    def is_finished(self, route_id, repetition):
+        """
+        Returns whether that repetition of the route was already executed
+        """
+        record = self._records.get((route_id, repetition))
+        return record is not None and record["executed"]
+
+    def get_record(self, route_id, repetition):
+        """
+        Returns the results of that repetition of the route, or None if it has not been run
+        """
+        return self._records.get((route_id, repetition))
+
+    def add(self, record):
+        """
+        Store the results of a route job and save the checkpoint
+        """
+        self._records[(record["route_id"], record["repetition"])] = record
+        self.save()
+
+    def save(self):
+        """
+        Write the checkpoint to a temporary file, which then replaces the previous one
+        """
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        checkpoint = {
+            "routes_file": self.routes_file,
+            "scenario_file": self.scenario_file,
+            "repetitions": self.repetitions,
+            "results": sorted(self._records.values(), key=lambda r: (str(r["route_id"]), r["repetition"]))
+        }
+
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as fd:
+            json.dump(checkpoint, fd, indent=4, default=str)
+            fd.flush()
+            os.fsync(fd.fileno())
+        os.replace(temp_filename, self.filename)
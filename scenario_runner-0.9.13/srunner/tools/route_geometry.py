@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the RouteGeometry, a vectorized representation of a route
+meant to be shared by all the criteria and conditions locating actors along it
+"""
+
+import numpy as np
+
+
+class RouteGeometry(object):
+
+    """
+    Points, headings and cumulative length of a route, stored as NumPy arrays.
+
+    The route is preprocessed once, so that locating an actor along it is a matter
+    of a few vectorized operations over a window of route points.
+
+    Args:
+        route (list [(carla.Transform or carla.Location, RoadOption)]): series of route points.
+            If they are transforms, their rotation gives the heading of the route.
+            Otherwise, the heading is the direction towards the next point
+
+    Attributes:
+        points (np.ndarray): (N, 3) x, y and z of the route points
+        forward (np.ndarray): (N, 3) unit forward vectors of the route points
+        yaw (np.ndarray): (N,) yaw of the route points, in degrees
+        accum_meters (np.ndarray): (N,) distance along the route from its start to each point
+        segments (np.ndarray): (N-1, 3) vectors going from each route point to the next one
+        segment_lengths (np.ndarray): (N-1,) lengths of the segments
+    """
+
+    def __init__(self, route):
+        positions = [position for position, _ in route]
+        if not positions:
+            raise ValueError("RouteGeometry needs a route with at least one point")
+
+        if all(hasattr(position, 'rotation') for position in positions):
+            self.points = np.array([(p.location.x, p.location.y, p.location.z) for p in positions], dtype=float)
+            pitch = np.radians([p.rotation.pitch for p in positions])
+            yaw = np.radians([p.rotation.yaw for p in positions])
+            self.forward = np.stack((np.cos(pitch) * np.cos(yaw),
+                                     np.cos(pitch) * np.sin(yaw),
+                                     np.sin(pitch)), axis=1)
+        else:
+            self.points = np.array([(p.x, p.y, p.z) for p in positions], dtype=float)
+            directions = np.diff(self.points, axis=0)
+            if len(directions) == 0:
+                directions = np.array([[1.0, 0.0, 0.0]])
+            directions = np.vstack((directions, directions[-1:]))
+            norms = np.linalg.norm(directions, axis=1)
+            norms[norms == 0] = 1.0
+            self.forward = directions / norms[:, np.newaxis]
+
+        self.yaw = np.degrees(np.arctan2(self.forward[:, 1], self.forward[:, 0]))
+
+        self.segments = np.diff(self.points, axis=0)
+        self.segment_lengths = np.linalg.norm(self.segments, axis=1)
+        self.accum_meters = np.concatenate(([0.0], np.cumsum(self.segment_lengths)))
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def length(self):
+        """
+        Total length of the route, in meters
+        """
+        return float(self.accum_meters[-1])
+
+    def _window(self, start, end, size):
+        """
+        Clamp a [start, end) window to the valid indices of an array of the given size
+        """
+        start = max(0, start)
+        end = size if end is None else min(end, size)
+        return start, end
+
+    def get_distance(self, index_from, index_to):
+        """
+        Straight line distance between two route points
+        """
+        return float(np.linalg.norm(self.points[index_to] - self.points[index_from]))
+
+    def closest_index(self, location, start=0, end=None):
+        """
+        Returns the index of the route point in [start, end) closest to the location, and the
+        planar distance to it. With several points at the same distance, the last one is returned
+        """
+        start, end = self._window(start, end, len(self.points))
+        if start >= end:
+            return -1, float('inf')
+
+        window = self.points[start:end, :2]
+        distances = np.hypot(window[:, 0] - location.x, window[:, 1] - location.y)
+        last = len(distances) - 1 - int(np.argmin(distances[::-1]))
+        return start + last, float(distances[last])
+
+    def passed_indices(self, location, start=0, end=None):
+        """
+        Returns the indices of the route points in [start, end) that are behind the location,
+        according to their heading
+        """
+        start, end = self._window(start, end, len(self.points))
+        if start >= end:
+            return np.zeros(0, dtype=int)
+
+        offsets = np.array((location.x, location.y, location.z)) - self.points[start:end]
+        dots = np.einsum('ij,ij->i', offsets, self.forward[start:end])
+        return start + np.flatnonzero(dots > 0)
+
+    def project_segments(self, location, segment_indices):
+        """
+        Projects the location onto each of the given segments, using their x and y
+
+        returns:
+            arrays with the distances from the location to the projected points,
+            the signed lateral offsets (positive to the right of the route) and
+            the distances along the route of the projected points
+        """
+        point = np.array((location.x, location.y))
+        segments = self.segments[segment_indices, :2]
+        offsets = point - self.points[segment_indices, :2]
+        squared_lengths = np.einsum('ij,ij->i', segments, segments)
+        safe_lengths = np.where(squared_lengths > 0, squared_lengths, 1.0)
+        ratios = np.clip(np.einsum('ij,ij->i', offsets, segments) / safe_lengths, 0.0, 1.0)
+        ratios[squared_lengths == 0] = 0.0
+
+        distances = np.linalg.norm(offsets - ratios[:, np.newaxis] * segments, axis=1)
+        cross = segments[:, 0] * offsets[:, 1] - segments[:, 1] * offsets[:, 0]
+        lateral_offsets = np.where(cross >= 0, distances, -distances)
+        arc_lengths = self.accum_meters[segment_indices] + ratios * self.segment_lengths[segment_indices]
+
+        return distances, lateral_offsets, arc_lengths
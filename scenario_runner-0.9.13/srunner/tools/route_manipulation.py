@@ -13,10 +13,14 @@ It also contains functions to convert the CARLA world location do GPS coordinate
 import math
 import xml.etree.ElementTree as ET
 
-from agents.navigation.global_route_planner import GlobalRoutePlanner
-
 from agents.navigation.local_planner import RoadOption
 
+from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
+from srunner.tools.route_tracer import trace_route
+
+# Geo reference of each OpenDRIVE, by its hash
+_latlon_refs = {}
+
 
 def _location_to_gps(lat_ref, lon_ref, location):
     """
@@ -58,12 +62,18 @@ def location_route_to_gps(route, lat_ref, lon_ref):
     return gps_route
 
 
-def _get_latlon_ref(world):
+def _get_latlon_ref(world_map, map_hash):
     """
     Convert from waypoints world coordinates to CARLA GPS coordinates
+    :param world_map: map of the world
+    :param map_hash: hash of the OpenDRIVE of the map
     :return: tuple with lat and lon coordinates
     """
-    xodr = world.get_map().to_opendrive()
+    if map_hash in _latlon_refs:
+        return _latlon_refs[map_hash]
+
+    xodr = world_map.to_opendrive()
+
     tree = ET.ElementTree(ET.fromstring(xodr))
 
     # default reference
@@ -80,6 +90,8 @@ def _get_latlon_ref(world):
                             lat_ref = float(item.split('=')[1])
                         if '+lon_0' in item:
                             lon_ref = float(item.split('=')[1])
+
+    _latlon_refs[map_hash] = (lat_ref, lon_ref)
     return lat_ref, lon_ref
 
 
@@ -138,19 +150,18 @@ def interpolate_trajectory(world, waypoints_trajectory, hop_resolution=1.0):
     :return: the full interpolated route both in GPS coordinates and also in its original form.
     """
 
-    grp = GlobalRoutePlanner(world.get_map(), hop_resolution)
-    # Obtain route plan
-    route = []
-    for i in range(len(waypoints_trajectory) - 1):   # Goes until the one before the last.
+    # The map of the CarlaDataProvider world and the hash of its OpenDRIVE are only fetched once
+    if world is CarlaDataProvider.get_world():
+        world_map = CarlaDataProvider.get_map()
+    else:
+        world_map = world.get_map()
+    map_hash = CarlaDataProvider.get_map_hash(world_map)
 
-        waypoint = waypoints_trajectory[i]
-        waypoint_next = waypoints_trajectory[i + 1]
-        interpolated_trace = grp.trace_route(waypoint, waypoint_next)
-        for wp_tuple in interpolated_trace:
-            route.append((wp_tuple[0].transform, wp_tuple[1]))
+    # Obtain route plan, with all its legs traced at once
+    route = trace_route(world_map, waypoints_trajectory, hop_resolution, map_hash)
 
     # Increase the route position to avoid fails
 
-    lat_ref, lon_ref = _get_latlon_ref(world)
+    lat_ref, lon_ref = _get_latlon_ref(world_map, map_hash)
 
     return location_route_to_gps(route, lat_ref, lon_ref), route
@@ -63,6 +63,7 @@ class RouteParser(object):
 
             new_config = RouteScenarioConfiguration()
             new_config.town = route.attrib['town']
+            new_config.route_id = route_id
             new_config.name = "RouteScenario_{}".format(route_id)
             new_config.weather = RouteParser.parse_weather(route)
             new_config.scenario_file = scenario_file
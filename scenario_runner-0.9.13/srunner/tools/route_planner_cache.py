@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides a cache of GlobalRoutePlanners, so that the topology graph of
+a town is only built once per process, and optionally once per machine through a pickle file
+"""
+
+from __future__ import print_function
+
+import hashlib
+import os
+import pickle
+
+import networkx as nx
+
+from agents.navigation.global_route_planner import GlobalRoutePlanner
+from agents.navigation.local_planner import RoadOption
+
+# Version of the pickle files, to be increased when their content changes
+CACHE_VERSION = 2
+
+# Edge attributes of the planner graph holding a single carla.Waypoint
+WAYPOINT_ATTRIBUTES = ('entry_waypoint', 'exit_waypoint', 'change_waypoint')
+
+class RoutePlannerCache(object):
+
+    """
+    This class provides a process wide cache of GlobalRoutePlanners, keyed by get_map_key().
+
+    The planners are optionally pickled to a cache directory, so that they are shared by processes too.
+    """
+
+    _planners = {}
+    _cache_dir = None
+
+    @staticmethod
+    def set_cache_dir(cache_dir):
+        """
+        Set the directory where the route planners are pickled. None disables the on-disk cache
+        """
+        RoutePlannerCache._cache_dir = cache_dir
+
+    @staticmethod
+    def get_cache_dir():
+        """
+        Returns the directory where the route planners are pickled, or None
+        """
+        return RoutePlannerCache._cache_dir
+
+    @staticmethod
+    def get_map_key(world_map, hop_resolution, map_hash=None):
+        """
+        Returns the key identifying the route planner of a map: the hash of its OpenDRIVE
+        and the hop resolution. The name isn't part of it, as the same map is named differently
+        when loaded by the server and when built from its OpenDRIVE.
+        The hash is only computed if it isn't given
+        """
+        if map_hash is None:
+            map_hash = hashlib.sha1(world_map.to_opendrive().encode('utf-8')).hexdigest()
+        return map_hash, float(hop_resolution)
+
+    @staticmethod
+    def get_route_planner(world_map, hop_resolution, key=None):
+        """
+        Returns the GlobalRoutePlanner of the map with the given hop resolution, only building it
+        if there isn't one already in memory, or in the on-disk cache if set_cache_dir() was used.
+        The key can be given if get_map_key() was already called for this map.
+
+        The planner is shared, so its turn decision state is reset to that of a new planner
+        """
+        if key is None:
+            key = RoutePlannerCache.get_map_key(world_map, hop_resolution)
+
+        planner = RoutePlannerCache._planners.get(key)
+        if planner is None:
+            filename = None
+            if RoutePlannerCache._cache_dir:
+                filename = os.path.join(RoutePlannerCache._cache_dir, "RoutePlanner_{}_{}.pkl".format(*key))
+                planner = _load_planner(world_map, key, filename)
+
+            if planner is None:
+                planner = GlobalRoutePlanner(world_map, hop_resolution)
+                if filename is not None:
+                    _save_planner(planner, key, filename)
+
+            RoutePlannerCache._planners[key] = planner
+
+        # pylint: disable=protected-access
+        planner._intersection_end_node = -1
+        planner._previous_decision = RoadOption.VOID
+        return planner
+
+
+def _save_planner(planner, key, filename):
+    """
+    Pickle the graph of the planner, with its waypoints replaced by their OpenDRIVE positions
+    """
+    # pylint: disable=protected-access
+    def to_xodr(waypoint):
+        return (waypoint.road_id, waypoint.lane_id, waypoint.s)
+
+    edges = []
+    for n1, n2, data in planner._graph.edges(data=True):
+        data = dict(data)
+        for attribute in WAYPOINT_ATTRIBUTES:
+            if attribute in data:
+                data[attribute] = to_xodr(data[attribute])
+        data['path'] = [to_xodr(waypoint) for waypoint in data['path']]
+        edges.append((n1, n2, data))
+
+    state = {
+        'version': CACHE_VERSION,
+        'key': key,
+        'nodes': list(planner._graph.nodes(data=True)),
+        'edges': edges,
+        'id_map': planner._id_map,
+        'road_id_to_edge': planner._road_id_to_edge
+    }
+
+    try:
+        if not os.path.isdir(os.path.dirname(filename) or '.'):
+            os.makedirs(os.path.dirname(filename))
+        temp_filename = "{}.tmp{}".format(filename, os.getpid())
+        with open(temp_filename, 'wb') as fd:
+            pickle.dump(state, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+    except (OSError, pickle.PicklingError) as e:
+        print("WARNING: Could not save the route planner to {}: {}".format(filename, e))
+
+
+def _load_planner(world_map, key, filename):
+    """
+    Load a planner pickled by _save_planner, or return None if there is no valid one.
+    Its waypoints are fetched from the map by their OpenDRIVE positions, each of them once
+    """
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        with open(filename, 'rb') as fd:
+            state = pickle.load(fd)
+    except Exception as e:  # pylint: disable=broad-except
+        print("WARNING: Could not load the route planner from {}: {}".format(filename, e))
+        return None
+
+    if state.get('version') != CACHE_VERSION or state.get('key') != key:
+        return None
+
+    waypoints = {}
+
+    def to_waypoint(xodr_position):
+        waypoint = waypoints.get(xodr_position)
+        if waypoint is None:
+            waypoint = world_map.get_waypoint_xodr(*xodr_position)
+            if waypoint is None:
+                raise RuntimeError("The route planner of {} has a waypoint at road {}, lane {}, s {}, "
+                                   "which isn't part of the map".format(filename, *xodr_position))
+            waypoints[xodr_position] = waypoint
+        return waypoint
+
+    graph = nx.DiGraph()
+    graph.add_nodes_from(state['nodes'])
+    for n1, n2, data in state['edges']:
+        for attribute in WAYPOINT_ATTRIBUTES:
+            if attribute in data:
+                data[attribute] = to_waypoint(data[attribute])
+        data['path'] = [to_waypoint(xodr_position) for xodr_position in data['path']]
+        graph.add_edge(n1, n2, **data)
+
+    # pylint: disable=protected-access
+    planner = GlobalRoutePlanner.__new__(GlobalRoutePlanner)
+    planner._sampling_resolution = key[1]
+    planner._wmap = world_map
+    planner._topology = None
+    planner._graph = graph
+    planner._id_map = state['id_map']
+    planner._road_id_to_edge = state['road_id_to_edge']
+    planner._intersection_end_node = -1
+    planner._previous_decision = RoadOption.VOID
+    return planner
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2021 Intel Corporation
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+This module provides the RouteTracer, which traces all the legs of a route with the cached
+GlobalRoutePlanner of its town, and the functions to trace the routes of a whole routes file
+in parallel, before they are run
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import networkx as nx
+import numpy as np
+
+import carla
+from agents.navigation.local_planner import RoadOption
+
+from srunner.tools.route_planner_cache import RoutePlannerCache
+
+# Routes traced by pre_trace_routes(), by OpenDRIVE hash, hop resolution and keypoints
+_traced_routes = {}
+_tracers = {}
+
+
+def _get_keypoints_key(keypoints):
+    """
+    Returns the keypoints of a route as a hashable tuple, rounded to the millimeter
+    """
+    return tuple((round(location.x, 3), round(location.y, 3), round(location.z, 3)) for location in keypoints)
+
+
+class RouteTracer(object):
+
+    """
+    Traces routes through several keypoints with a GlobalRoutePlanner.
+
+    All the keypoints are localized once, and the shortest paths between their road segments are
+    searched before building the trace of each leg. The searches use a heuristic precomputed for each
+    target node, and their paths are kept, so that legs shared by several routes are only searched once.
+    The trace itself is built by the planner, leg after leg, so the routes are the same as those of
+    consecutive GlobalRoutePlanner.trace_route() calls.
+
+    Args:
+        planner (GlobalRoutePlanner): planner of the town, which must not be used by anything else
+    """
+
+    def __init__(self, planner):
+        # pylint: disable=protected-access
+        self.planner = planner
+        graph = planner._graph
+
+        nodes = list(graph.nodes)
+        self._node_index = dict((node, i) for i, node in enumerate(nodes))
+        self._vertices = np.array([graph.nodes[node]['vertex'] for node in nodes], dtype=np.float64).reshape(-1, 3)
+        self._heuristics = {}
+        self._node_paths = {}
+        self._segments = {}
+
+        # The planner searches its paths through the tracer
+        planner._path_search = self._path_search
+
+    def _get_heuristic(self, target):
+        """
+        Returns the A* heuristic towards a node, with the distances of all the nodes to it precomputed
+        """
+        heuristic = self._heuristics.get(target)
+        if heuristic is None:
+            distances = np.linalg.norm(self._vertices - self._vertices[self._node_index[target]], axis=1).tolist()
+            node_index = self._node_index
+
+            def heuristic(node, _):
+                return distances[node_index[node]]
+
+            self._heuristics[target] = heuristic
+        return heuristic
+
+    def _get_node_path(self, source, target):
+        """
+        Returns the shortest path between two nodes of the graph
+        """
+        key = (source, target)
+        node_path = self._node_paths.get(key)
+        if node_path is None:
+            graph = self.planner._graph  # pylint: disable=protected-access
+            node_path = nx.astar_path(graph, source=source, target=target,
+                                      heuristic=self._get_heuristic(target), weight='length')
+            self._node_paths[key] = node_path
+        return node_path
+
+    def _localize(self, location):
+        """
+        Returns the road segment of a location, only asking the planner once per route
+        """
+        key = (location.x, location.y, location.z)
+        if key not in self._segments:
+            self._segments[key] = self.planner._localize(location)  # pylint: disable=protected-access
+        return self._segments[key]
+
+    def _path_search(self, origin, destination):
+        """
+        Replacement of GlobalRoutePlanner._path_search()
+        """
+        start, end = self._localize(origin), self._localize(destination)
+        return self._get_node_path(start[0], end[0]) + [end[1]]
+
+    def trace_route(self, keypoints):
+        """
+        Returns the route through all the keypoints (carla.Location),
+        as a list of (carla.Waypoint, RoadOption)
+        """
+        # pylint: disable=protected-access
+        self.planner._intersection_end_node = -1
+        self.planner._previous_decision = RoadOption.VOID
+
+        self._segments = {}
+        segments = [self._localize(location) for location in keypoints]
+        for start, end in zip(segments[:-1], segments[1:]):
+            self._get_node_path(start[0], end[0])
+
+        route = []
+        for origin, destination in zip(keypoints[:-1], keypoints[1:]):
+            route.extend(self.planner.trace_route(origin, destination))
+        return route
+
+
+def get_route_tracer(world_map, hop_resolution, key=None):
+    """
+    Returns the RouteTracer of the map, built on the shared route planner of the RoutePlannerCache
+    """
+    planner = RoutePlannerCache.get_route_planner(world_map, hop_resolution, key)
+    tracer = _tracers.get(id(planner))
+    if tracer is None or tracer.planner is not planner:
+        tracer = RouteTracer(planner)
+        _tracers[id(planner)] = tracer
+    return tracer
+
+
+def trace_route(world_map, keypoints, hop_resolution=1.0, map_hash=None):
+    """
+    Returns the route through all the keypoints (carla.Location), as a list of (carla.Transform, RoadOption).
+    Routes already traced by pre_trace_routes() are taken from memory.
+    The hash of the OpenDRIVE of the map can be given if it is already known
+    """
+    key = RoutePlannerCache.get_map_key(world_map, hop_resolution, map_hash)
+    traced_route = _traced_routes.get(key + (_get_keypoints_key(keypoints),))
+    if traced_route is not None:
+        return [(carla.Transform(carla.Location(*location),
+                                 carla.Rotation(pitch=rotation[0], yaw=rotation[1], roll=rotation[2])), road_option)
+                for location, rotation, road_option in traced_route]
+
+    tracer = get_route_tracer(world_map, hop_resolution, key)
+    return [(waypoint.transform, road_option) for waypoint, road_option in tracer.trace_route(keypoints)]
+
+
+def get_traced_routes():
+    """
+    Returns the routes traced by pre_trace_routes(), to be given to other processes through add_traced_routes()
+    """
+    return dict(_traced_routes)
+
+
+def add_traced_routes(traced_routes):
+    """
+    Add routes traced by pre_trace_routes() in another process, as returned by get_traced_routes()
+    """
+    _traced_routes.update(traced_routes)
+
+
+def pre_trace_routes(route_configurations, xodr_dir, hop_resolution=1.0, processes=None):
+    """
+    Trace the routes of the configurations with a pool of processes, so that trace_route() takes them
+    from memory afterwards. The maps are read from the <town>.xodr files of xodr_dir, and the routes
+    of towns without one are left to be traced when they are run.
+
+    The routes of a town are split between several processes if there are less towns than processes.
+    Its planner is then built once and pickled to the route planner cache directory, or a temporary one,
+    so that the other processes only load it.
+
+    Returns the number of traced routes
+    """
+    processes = processes or multiprocessing.cpu_count()
+
+    keypoints_by_town = {}
+    for config in route_configurations:
+        keypoints_key = _get_keypoints_key(config.trajectory)
+        keypoints_by_town.setdefault(config.town, set()).add(keypoints_key)
+
+    towns = []
+    for town, town_keypoints in sorted(keypoints_by_town.items()):
+        xodr_file = os.path.join(xodr_dir, "{}.xodr".format(town))
+        if not os.path.isfile(xodr_file):
+            print("WARNING: No OpenDRIVE file found for {} at {}, its routes aren't pre-traced".format(town, xodr_dir))
+            continue
+        towns.append((town, xodr_file, sorted(town_keypoints)))
+
+    if not towns:
+        return 0
+
+    cache_dir = RoutePlannerCache.get_cache_dir()
+    temp_dir = None
+
+    split_towns = []
+    tasks = []
+    for town, xodr_file, town_keypoints in towns:
+        chunks = min(len(town_keypoints), max(1, processes // len(towns)))
+        if chunks > 1:
+            if not cache_dir:
+                temp_dir = tempfile.mkdtemp(prefix='route_planners_')
+                cache_dir = temp_dir
+            split_towns.append((town, xodr_file, hop_resolution, cache_dir))
+        for i in range(chunks):
+            tasks.append((town, xodr_file, hop_resolution, cache_dir, town_keypoints[i::chunks]))
+
+    traced = 0
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(min(processes, len(tasks)))
+    try:
+        # The planners of the split towns are built before their routes are traced, so that they are built once
+        pool.map(_build_town_planner, split_towns)
+
+        for key, traced_routes in pool.imap_unordered(_trace_town_routes, tasks):
+            for keypoints_key, traced_route in traced_routes:
+                _traced_routes[key + (keypoints_key,)] = traced_route
+                traced += 1
+    finally:
+        pool.close()
+        pool.join()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return traced
+
+
+def _load_town_map(town, xodr_file):
+    """
+    Returns the map of a town, built from its OpenDRIVE file
+    """
+    with open(xodr_file, 'r', encoding='utf-8') as fd:
+        xodr = fd.read()
+    return carla.Map(town, xodr)
+
+
+def _build_town_planner(task):
+    """
+    Worker of pre_trace_routes(), which builds the route planner of a town and pickles it to the cache directory
+    """
+    town, xodr_file, hop_resolution, cache_dir = task
+    RoutePlannerCache.set_cache_dir(cache_dir)
+    RoutePlannerCache.get_route_planner(_load_town_map(town, xodr_file), hop_resolution)
+
+
+def _trace_town_routes(task):
+    """
+    Worker of pre_trace_routes(). The routes are returned by value, as waypoints can't leave their process
+    """
+    town, xodr_file, hop_resolution, cache_dir, town_keypoints = task
+    RoutePlannerCache.set_cache_dir(cache_dir)
+
+    world_map = _load_town_map(town, xodr_file)
+    key = RoutePlannerCache.get_map_key(world_map, hop_resolution)
+    tracer = get_route_tracer(world_map, hop_resolution, key)
+
+    traced_routes = []
+    for keypoints_key in town_keypoints:
+        keypoints = [carla.Location(*location) for location in keypoints_key]
+        traced_route = []
+        for waypoint, road_option in tracer.trace_route(keypoints):
+            transform = waypoint.transform
+            traced_route.append(((transform.location.x, transform.location.y, transform.location.z),
+                                 (transform.rotation.pitch, transform.rotation.yaw, transform.rotation.roll),
+                                 road_option))
+        traced_routes.append((keypoints_key, traced_route))
+
+    return key, traced_routes
@@ -19,7 +19,8 @@ import carla
 from agents.tools.misc import vector
 from agents.navigation.local_planner import RoadOption
 
-from srunner.scenariomanager.carla_data_provider import CarlaDataProvider
+from srunner.scenariomanager.carla_data_provider import CarlaDataProvider, ActorGridIndex
+from srunner.tools.route_geometry import RouteGeometry
 
 
 def get_distance_along_route(route, target_location):
@@ -118,6 +119,91 @@ def get_distance_along_route(route, target_location):
     return covered_distance, found
 
 
+class RouteDistanceIndex(object):
+
+    """
+    Precomputed version of get_distance_along_route, for conditions that locate
+    actors along the same route every tick.
+
+    The route is stored as a RouteGeometry and the middle points of its segments are
+    bucketed in a grid. Each query first projects the location onto the segments around
+    the last match, and only searches the grid if none of them is close enough.
+
+    Instead of checking road and lane ids, a segment only matches if it is driven
+    in the same direction as the lane of the location
+    """
+
+    MAX_LATERAL_DISTANCE = 10.0  # Locations further away from the route are not along it
+    SEARCH_WINDOW = 20           # Amount of segments checked at each side of the last match
+
+    def __init__(self, route):
+        self._geometry = RouteGeometry(route)
+        self._last_segment = None
+
+        segment_indices = np.arange(len(self._geometry.segments))
+        midpoints = self._geometry.points[:-1] + self._geometry.segments / 2.0
+        self._grid = ActorGridIndex(cell_size=2 * self.MAX_LATERAL_DISTANCE)
+        self._grid.build(segment_indices, midpoints)
+
+        max_segment_length = self._geometry.segment_lengths.max() if len(segment_indices) > 0 else 0.0
+        self._search_radius = max_segment_length / 2.0 + self.MAX_LATERAL_DISTANCE
+
+    def _match(self, location, direction, segment_indices):
+        """
+        Returns the closest valid segment and the distance along the route of the projected location,
+        or None if no segment is valid
+        """
+        if len(segment_indices) == 0:
+            return None
+
+        distances, _, arc_lengths = self._geometry.project_segments(location, segment_indices)
+        valid = distances <= self.MAX_LATERAL_DISTANCE
+        if direction is not None:
+            segments = self._geometry.segments[segment_indices]
+            valid &= segments[:, 0] * direction.x + segments[:, 1] * direction.y >= 0
+
+        if not np.any(valid):
+            return None
+
+        # Among equally close segments, take the first one along the route
+        candidates = np.flatnonzero(valid)
+        best = candidates[np.lexsort((segment_indices[candidates], distances[candidates]))[0]]
+        return int(segment_indices[best]), float(arc_lengths[best])
+
+    def get_distance(self, target_location):
+        """
+        Calculate the distance of the given location along the route
+
+        Note: If the location is not along the route, the route length will be returned
+
+        returns:
+            covered distance and whether or not the location was found along the route
+        """
+        waypoint = CarlaDataProvider.get_waypoint(target_location)
+        if waypoint is not None:
+            location = waypoint.transform.location
+            direction = waypoint.transform.get_forward_vector()
+        else:
+            location = target_location
+            direction = None
+
+        match = None
+        if self._last_segment is not None:
+            window = np.arange(max(0, self._last_segment - self.SEARCH_WINDOW),
+                               min(len(self._geometry.segments), self._last_segment + self.SEARCH_WINDOW + 1))
+            match = self._match(location, direction, window)
+
+        if match is None:
+            segment_indices = self._grid.query_radius((location.x, location.y, location.z), self._search_radius)
+            match = self._match(location, direction, np.sort(segment_indices))
+
+        if match is None:
+            return self._geometry.length, False
+
+        self._last_segment, covered_distance = match
+        return covered_distance, True
+
+
 def get_crossing_point(actor):
     """
     Get the next crossing point location in front of the ego vehicle
@@ -176,7 +262,7 @@ def get_location_in_distance(actor, distance):
 
     @return obtained location and the traveled distance
     """
-    waypoint = CarlaDataProvider.get_map().get_waypoint(actor.get_location())
+    waypoint = CarlaDataProvider.get_waypoint(actor.get_location())
     traveled_distance = 0
     while not waypoint.is_intersection and traveled_distance < distance:
         waypoint_new = waypoint.next(1.0)[-1]
@@ -574,8 +660,8 @@ def get_distance_between_actors(current, target, distance_type="euclidianDistanc
 
     target_transform = CarlaDataProvider.get_transform(target)
     current_transform = CarlaDataProvider.get_transform(current)
-    target_wp = CarlaDataProvider.get_map().get_waypoint(target_transform.location)
-    current_wp = CarlaDataProvider.get_map().get_waypoint(current_transform.location)
+    target_wp = CarlaDataProvider.get_waypoint(target_transform.location)
+    current_wp = CarlaDataProvider.get_waypoint(current_transform.location)
 
     extent_sum_x, extent_sum_y = 0, 0
     if freespace: